@@ -0,0 +1,210 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from price_store import as_naive_utc, period_start
+from recovery import DAY, RangeMax, buffer_append
+
+DEFAULT_WINDOWS = (5, 21, 63)
+
+
+class DrawdownStats:
+    """Per-bar drawdown and recovery statistics for one ticker.
+
+    Columns:
+
+    - ``peak``: running maximum close
+    - ``drawdown``: close / peak - 1
+    - ``max_drawdown``: worst drawdown so far
+    - ``days_under_water``: calendar days since the last close at the peak
+    - ``days_to_recover``: calendar days until the close next regains the
+      running peak (0 at a peak, NaN while still under water)
+    - ``worst_{k}d``: close relative to the highest close of the trailing
+      ``k`` bars, i.e. the drop into this bar over that window
+
+    Everything is computed in one vectorized pass. ``update`` appends new or
+    revised bars by recomputing only from the last peak on, and range
+    queries such as the worst 21-day drop in a period go through sparse-table
+    indexes that are extended rather than rebuilt.
+    """
+
+    def __init__(self, dates: np.ndarray, prices: np.ndarray, windows: Sequence[int] = DEFAULT_WINDOWS):
+        self.windows = tuple(windows)
+        # Columns live in buffers that grow by doubling so appending a bar doesn't copy the history
+        self._n = 0
+        self._dates = np.array([], dtype='datetime64[ns]')
+        self._buffers: Dict[str, np.ndarray] = {name: np.array([]) for name in self.names()}
+        # Position of the last bar at the running peak, as of each bar
+        self._last_peak_at = np.array([], dtype=np.int64)
+        self._price_max = RangeMax(np.array([]))
+        self._indexes: Dict[Tuple[str, bool], RangeMax] = {}
+        self.update(dates, prices)
+
+    def names(self) -> Tuple[str, ...]:
+        return ('close', 'peak', 'drawdown', 'max_drawdown', 'days_under_water',
+                'days_to_recover') + tuple(f'worst_{k}d' for k in self.windows)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[:self._n]
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: buffer[:self._n] for name, buffer in self._buffers.items()}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._buffers[name][:self._n]
+
+    def update(self, dates: np.ndarray, prices: np.ndarray):
+        """Add bars; ones dated at or before the current last bar replace it and what follows."""
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        prices = np.asarray(prices, dtype=float)
+        keep = ~np.isnan(prices)
+        dates, prices = dates[keep], prices[keep]
+        if not len(dates):
+            return
+        start = int(np.searchsorted(self.dates, dates[0]))
+        # Bars from the last peak on are the only ones whose stats can change
+        redo = int(self._last_peak_at[start - 1]) if start else 0
+
+        self._dates = buffer_append(self._dates, start, dates)
+        self._buffers['close'] = buffer_append(self._buffers['close'], start, prices)
+        self._n = n = start + len(dates)
+        all_dates, close = self._dates[:n], self._buffers['close'][:n]
+        self._price_max.truncate(start)
+        self._price_max.extend(prices)
+
+        idx = np.arange(redo, n)
+        peak = np.fmax.accumulate(close[redo:])
+        if redo:
+            peak = np.fmax(peak, self._buffers['peak'][redo - 1])
+        drawdown = close[redo:] / peak - 1
+        max_drawdown = np.fmin.accumulate(drawdown)
+        if redo:
+            max_drawdown = np.fmin(max_drawdown, self._buffers['max_drawdown'][redo - 1])
+        at_peak = close[redo:] >= peak
+        at_peak[0] = True
+        last_peak = np.maximum.accumulate(np.where(at_peak, idx, redo))
+        next_peak = np.minimum.accumulate(np.where(at_peak, idx, n)[::-1])[::-1]
+        days_to_recover = np.full(len(idx), np.nan)
+        known = next_peak < n
+        days_to_recover[known] = (all_dates[next_peak[known]] - all_dates[idx[known]]) / DAY
+
+        fresh = {
+            'peak': peak,
+            'drawdown': drawdown,
+            'max_drawdown': max_drawdown,
+            'days_under_water': (all_dates[redo:] - all_dates[last_peak]) / DAY,
+            'days_to_recover': days_to_recover,
+        }
+        for k in self.windows:
+            window_max = self._price_max.query(np.maximum(idx - k, 0), idx + 1)
+            fresh[f'worst_{k}d'] = close[redo:] / window_max - 1
+
+        for name, values in fresh.items():
+            self._buffers[name] = buffer_append(self._buffers[name], redo, values)
+        self._last_peak_at = buffer_append(self._last_peak_at, redo, last_peak)
+        for (name, lowest), index in self._indexes.items():
+            values = self[name][redo:]
+            index.truncate(redo)
+            index.extend(-values if lowest else values)
+
+    def _index(self, name: str, lowest: bool) -> RangeMax:
+        key = (name, lowest)
+        if key not in self._indexes:
+            values = self[name]
+            self._indexes[key] = RangeMax(-values if lowest else values)
+        return self._indexes[key]
+
+    def extreme(self, name: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                lowest: bool = True) -> Tuple[Optional[pd.Timestamp], float]:
+        """(date, value) of the smallest (or largest) ``name`` between ``start`` and ``end``."""
+        lo = np.searchsorted(self.dates, as_naive_utc(start), side='left') if start is not None else 0
+        hi = np.searchsorted(self.dates, as_naive_utc(end), side='right') if end is not None else len(self)
+        index = self._index(name, lowest)
+        best = index.query(np.array([lo]), np.array([hi]))[0]
+        if not np.isfinite(best):
+            return None, np.nan
+        position = index.first_at_or_above(np.array([lo]), np.array([hi]), best)[0]
+        return pd.Timestamp(self.dates[position]), float(-best if lowest else best)
+
+    def worst_drop(self, window: int = 21, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> Tuple[Optional[pd.Timestamp], float]:
+        return self.extreme(f'worst_{window}d', start, end)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns, index=pd.DatetimeIndex(self.dates, name='Date'))
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, windows: Sequence[int] = DEFAULT_WINDOWS) -> 'DrawdownStats':
+        stats = cls(np.array([], dtype='datetime64[ns]'), np.array([]), windows)
+        stats._dates = frame.index.values.astype('datetime64[ns]')
+        stats._buffers = {name: frame[name].to_numpy(dtype=float, copy=True) for name in stats.names()}
+        stats._n = len(stats._dates)
+        close, peak = stats['close'], stats['peak']
+        stats._last_peak_at = np.maximum.accumulate(np.where(close >= peak, np.arange(stats._n), 0))
+        stats._price_max = RangeMax(close)
+        return stats
+
+
+class DrawdownAnalytics:
+    """``DrawdownStats`` per ticker, kept next to the fetcher's price store.
+
+    Stats are saved as ``<ticker>.stats.parquet`` beside the price data and
+    brought up to date incrementally whenever the store has newer bars.
+    """
+
+    def __init__(self, fetcher, windows: Sequence[int] = DEFAULT_WINDOWS):
+        self.fetcher = fetcher
+        self.windows = tuple(windows)
+        self._stats: Dict[str, DrawdownStats] = {}
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.fetcher.store.root, f"{ticker}.stats.parquet")
+
+    def _cached(self, ticker: str) -> Optional[DrawdownStats]:
+        stats = self._stats.get(ticker)
+        if stats is None and os.path.exists(self._path(ticker)):
+            frame = pd.read_parquet(self._path(ticker))
+            if all(f'worst_{k}d' in frame for k in self.windows):
+                stats = DrawdownStats.from_frame(frame, self.windows)
+        return stats
+
+    def stats(self, ticker: str, period: str = 'max') -> DrawdownStats:
+        """Stats over everything the store holds for ``ticker`` (at least ``period``)."""
+        history = self.fetcher.store.get_history(ticker, period)
+        if history.empty:
+            return DrawdownStats(np.array([], dtype='datetime64[ns]'), np.array([]), self.windows)
+        history = self.fetcher.store.load(ticker)
+        dates = pd.to_datetime(history.index).values.astype('datetime64[ns]')
+        closes = history['Close'].to_numpy(dtype=float)
+
+        stats = self._cached(ticker)
+        # Length of the leading run of bars the cached stats already saw unchanged
+        m = min(len(stats), len(dates)) if stats is not None else 0
+        same = (stats.dates[:m] == dates[:m]) & (stats['close'][:m] == closes[:m]) if m else np.array([True])
+        first = m if same.all() else int(np.argmin(same))
+        if stats is None or first == 0 or len(dates) < len(stats):
+            stats = DrawdownStats(dates, closes, self.windows)
+        elif first == len(dates) == len(stats):
+            self._stats[ticker] = stats
+            return stats
+        else:
+            stats.update(dates[first:], closes[first:])
+        stats.to_frame().to_parquet(self._path(ticker))
+        self._stats[ticker] = stats
+        return stats
+
+    def worst_drop(self, ticker: str, window: int = 21,
+                   period: str = '10y') -> Tuple[Optional[pd.Timestamp], float]:
+        """Worst ``window``-bar drop over ``period``, e.g. the worst 21-day drop in 10 years."""
+        return self.stats(ticker, period).worst_drop(window, start=period_start(period))
+
+    def frame(self, ticker: str, period: str = '1y') -> pd.DataFrame:
+        frame = self.stats(ticker, period).to_frame()
+        start = period_start(period)
+        return frame if start is None else frame[frame.index >= start]
@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from etf_data_fetcher import ETFDataFetcher
 from etf_analyzer import ETFAnalyzer
+from events import RecoveryEvents
+from instrumentation import metrics, timed
+from panel import align_closes
+from sweep import sweep_recoveries
 import plotly.graph_objects as go
 
+PERIOD = "2y"
+DROP_THRESHOLD = -0.05
+RECOVERY_PARAMS = dict(drop_threshold=-0.10, recovery_threshold=0.15, min_days=182, max_days=365)
+SWEEP_DROPS = [-0.05, -0.075, -0.10, -0.15, -0.20, -0.25, -0.30]
+SWEEP_RECOVERIES = [0.05, 0.10, 0.15, 0.20, 0.25, 0.30]
+SWEEP_WINDOWS = [(0, 91), (0, 182), (91, 365), (182, 365), (0, 365)]
+
 st.set_page_config(
     page_title="ETF Recovery Analyzer",
     page_icon="📈",
@@ -17,12 +29,139 @@ This application analyzes the top 10 ETFs by market capitalization and identifie
 - ETFs that recovered 15% or more within 6-12 months after the drop
 """)
 
-@st.cache_data(ttl=3600)
-def run_analysis():
-    fetcher = ETFDataFetcher()
+@st.cache_resource
+def get_fetcher() -> ETFDataFetcher:
+    return ETFDataFetcher()
+
+def data_version(fetcher: ETFDataFetcher, ticker: str) -> str:
+    # Last stored bar, its close and the bar count: changes only when new data arrives for the
+    # ticker, including a partial intraday bar overwritten in place
+    data = fetcher.store.load(ticker)
+    return "" if data.empty else f"{data.index[-1].isoformat()}:{len(data)}:{data['Close'].iloc[-1]!r}"
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def detect_stage(ticker: str, period: str, threshold: float, version: str):
+    return get_fetcher().drop_events(ticker, threshold=threshold, period=period)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def recover_stage(ticker: str, period: str, threshold: float, version: str,
+                  drop_threshold: float, recovery_threshold: float,
+                  min_days: int, max_days: int):
+    drops = detect_stage(ticker, period, threshold, version)
+    if not drops:
+        return RecoveryEvents.empty([ticker])
+    return get_fetcher().recovery_events(ticker, drops, drop_threshold, recovery_threshold,
+                                         min_days, max_days, period=period)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+@timed('sweep.grid')
+def sweep_stage(versions: tuple):
+    # versions is ((ticker, data_version), ...) so the cube is rebuilt only when data changes
+    store = get_fetcher().store
+    closes = align_closes({ticker: store.get_history(ticker, PERIOD) for ticker, _ in versions})
+    return sweep_recoveries(closes.index.values, closes.to_numpy(dtype=float),
+                            SWEEP_DROPS, SWEEP_RECOVERIES, SWEEP_WINDOWS)
+
+def format_results(results_df: pd.DataFrame) -> pd.DataFrame:
+    display_df = results_df.copy()
+    display_df['market_cap_billions'] = display_df['market_cap'] / 1e9
+    display_df['drop_date'] = pd.to_datetime(display_df['drop_date']).dt.date
+    display_df['recovery_date'] = pd.to_datetime(display_df['recovery_date']).dt.date
+    
+    display_columns = [
+        'ticker', 'drop_date', 'recovery_date', 
+        'original_drop_percentage', 'recovery_percentage',
+        'days_to_recover', 'bottom_price', 'recovery_price',
+        'market_cap_billions'
+    ]
+    
+    formatted_df = display_df[display_columns].round(2)
+    formatted_df.columns = [
+        'ETF', 'Drop Date', 'Recovery Date',
+        'Drop %', 'Recovery %', 'Days to Recover',
+        'Bottom Price ($)', 'Recovery Price ($)', 'Market Cap (B$)'
+    ]
+    return formatted_df.sort_values('Recovery %', ascending=False)
+
+def run_analysis(placeholder, force_refresh: bool = False):
+    # Widget interactions rerun the whole script; keep this session's analysis until Refresh
+    if not force_refresh and 'analysis' in st.session_state:
+        return st.session_state['analysis']
+    
+    fetcher = get_fetcher()
     analyzer = ETFAnalyzer(fetcher)
-    results_df = analyzer.analyze_top_etfs()
-    return analyzer, results_df
+    top_etfs = fetcher.get_top_etfs_by_market_cap(10)
+    
+    tables = []
+    market_caps = dict(top_etfs)
+    results = pd.DataFrame()
+    progress = st.progress(0.0, text="Fetching price data...")
+    # Downloads run concurrently; each ticker's cached stages run as soon as its data lands.
+    # A forced refresh only fetches new bars, so tickers without them keep their cached results.
+    with ThreadPoolExecutor(max_workers=fetcher.max_workers) as pool:
+        futures = {
+            pool.submit(fetcher.store.refresh, ticker, PERIOD, force_refresh): ticker
+            for ticker in market_caps
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            ticker = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                st.warning(f"Could not refresh {ticker}: {e}")
+                continue
+            
+            version = data_version(fetcher, ticker)
+            analyzer.price_history[ticker] = fetcher.store.get_history(ticker, PERIOD)['Close']
+            recoveries = recover_stage(ticker, PERIOD, DROP_THRESHOLD, version, **RECOVERY_PARAMS)
+            if recoveries:
+                tables.append(recoveries)
+                results = RecoveryEvents.concat(tables).to_frame()
+                results['market_cap'] = results['ticker'].map(market_caps).astype(float)
+            
+            progress.progress(done / len(futures), text=f"Analyzed {ticker} ({done}/{len(futures)})")
+            if not results.empty:
+                placeholder.dataframe(format_results(results),
+                                      use_container_width=True, hide_index=True)
+    progress.empty()
+    
+    analyzer.analysis_results = results
+    st.session_state['analysis'] = analyzer, analyzer.results
+    return st.session_state['analysis']
+
+def show_diagnostics(profile_mode):
+    st.header("Diagnostics")
+    st.caption("Timings and counters since the server started or was last reset. "
+               "Cached stages only show up when they actually run.")
+    if st.button("Reset counters"):
+        metrics.reset()
+    
+    snapshot = metrics.snapshot()
+    counters = snapshot['counters']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Network calls", counters.get('network.history', 0) + counters.get('network.info', 0))
+    with col2:
+        hits = counters.get('store.hit', 0) + counters.get('metadata.hit', 0)
+        misses = (counters.get('store.full', 0) + counters.get('store.delta', 0)
+                  + counters.get('metadata.miss', 0))
+        st.metric("Cache hit rate", f"{hits / (hits + misses):.0%}" if hits + misses else "-")
+    with col3:
+        st.metric("Retries", counters.get('batch.retries', 0))
+    with col4:
+        st.metric("Downloaded", f"{sum(snapshot['bytes'].values()) / 2 ** 20:.1f} MB")
+    
+    st.subheader("Stages")
+    st.dataframe(metrics.stage_frame().round(4), use_container_width=True, hide_index=True)
+    st.subheader("Slowest tickers")
+    st.dataframe(metrics.ticker_frame().head(50).round(4), use_container_width=True, hide_index=True)
+    st.subheader("Counters")
+    st.json({'counters': counters, 'bytes': snapshot['bytes']})
+    
+    if profile_mode and metrics.profiles:
+        mode, report = metrics.profiles[-1]
+        with st.expander(f"Profile of this run ({mode})", expanded=True):
+            st.text(report)
 
 def main():
     with st.sidebar:
@@ -35,56 +174,38 @@ def main():
         - Lookback Period: 2 years
         """)
         
-        if st.button("🔄 Refresh Analysis", type="primary"):
-            st.cache_data.clear()
-            st.rerun()
+        force_refresh = st.button("🔄 Refresh Analysis", type="primary")
+        
+        profile_mode = st.selectbox("Profile this run", [None, "cprofile", "tracemalloc"],
+                                    format_func=lambda m: m or "Off")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Analysis Results", "📈 Charts", "📄 Report", "ℹ️ About"])
+    tab1, tab2, tab3, tab5, tab6, tab4 = st.tabs(["📊 Analysis Results", "📈 Charts", "📄 Report",
+                                                  "🧪 Parameter Sweep", "🩺 Diagnostics", "ℹ️ About"])
     
     with tab1:
         st.header("Analysis Results")
         
-        with st.spinner("Analyzing ETFs... This may take a minute..."):
-            analyzer, results_df = run_analysis()
+        metrics_area = st.container()
+        st.subheader("Detailed Results")
+        table = st.empty()
+        with metrics.timer('app.analysis'), metrics.profile(profile_mode):
+            analyzer, results_df = run_analysis(table, force_refresh)
         
         if not results_df.empty:
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("Qualifying ETFs", results_df['ticker'].nunique())
-            with col2:
-                st.metric("Recovery Events", len(results_df))
-            with col3:
-                st.metric("Avg Recovery %", f"{results_df['recovery_percentage'].mean():.2f}%")
-            with col4:
-                st.metric("Avg Days to Recovery", f"{results_df['days_to_recover'].mean():.0f}")
-            
-            st.subheader("Detailed Results")
-            
-            display_df = results_df.copy()
-            display_df['market_cap_billions'] = display_df['market_cap'] / 1e9
-            display_df['drop_date'] = pd.to_datetime(display_df['drop_date']).dt.date
-            display_df['recovery_date'] = pd.to_datetime(display_df['recovery_date']).dt.date
-            
-            display_columns = [
-                'ticker', 'drop_date', 'recovery_date', 
-                'original_drop_percentage', 'recovery_percentage',
-                'days_to_recover', 'bottom_price', 'recovery_price',
-                'market_cap_billions'
-            ]
+            with metrics_area:
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    st.metric("Qualifying ETFs", results_df['ticker'].nunique())
+                with col2:
+                    st.metric("Recovery Events", len(results_df))
+                with col3:
+                    st.metric("Avg Recovery %", f"{results_df['recovery_percentage'].mean():.2f}%")
+                with col4:
+                    st.metric("Avg Days to Recovery", f"{results_df['days_to_recover'].mean():.0f}")
             
-            formatted_df = display_df[display_columns].round(2)
-            formatted_df.columns = [
-                'ETF', 'Drop Date', 'Recovery Date',
-                'Drop %', 'Recovery %', 'Days to Recover',
-                'Bottom Price ($)', 'Recovery Price ($)', 'Market Cap (B$)'
-            ]
-            
-            st.dataframe(
-                formatted_df.sort_values('Recovery %', ascending=False),
-                use_container_width=True,
-                hide_index=True
-            )
+            formatted_df = format_results(results_df)
+            table.dataframe(formatted_df, use_container_width=True, hide_index=True)
             
             csv = formatted_df.to_csv(index=False)
             st.download_button(
@@ -109,7 +230,13 @@ def main():
             selected_ticker = st.selectbox("Select ETF to visualize:", unique_tickers)
             
             if selected_ticker:
-                etf_fig = analyzer.create_recovery_chart(selected_ticker)
+                closes = analyzer.price_history.get(selected_ticker)
+                start = end = None
+                if closes is not None and len(closes) > 1:
+                    first, last = closes.index[0].date(), closes.index[-1].date()
+                    start, end = st.slider("Zoom", min_value=first, max_value=last,
+                                           value=(first, last), key=f"zoom_{selected_ticker}")
+                etf_fig = analyzer.create_recovery_chart(selected_ticker, start=start, end=end)
                 st.plotly_chart(etf_fig, use_container_width=True)
         else:
             st.info("Run the analysis first to see visualizations.")
@@ -130,6 +257,57 @@ def main():
         else:
             st.info("Run the analysis first to generate a report.")
     
+    with tab5:
+        st.header("Parameter Sweep")
+        st.caption("Every combination is precomputed once per data refresh. Drops are measured "
+                   "peak to trough and do not require a detected daily or weekly drop.")
+        
+        if analyzer.price_history:
+            fetcher = get_fetcher()
+            versions = tuple((t, data_version(fetcher, t)) for t in sorted(analyzer.price_history))
+            with st.spinner("Evaluating parameter grid..."):
+                cube = sweep_stage(versions)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                drop = st.select_slider("Drop threshold", SWEEP_DROPS, value=-0.10,
+                                        format_func=lambda v: f"{v:.1%}")
+            with col2:
+                recovery = st.select_slider("Recovery threshold", SWEEP_RECOVERIES, value=0.15,
+                                            format_func=lambda v: f"+{v:.0%}")
+            with col3:
+                window = st.selectbox("Recovery window (days after trough)", SWEEP_WINDOWS,
+                                      index=SWEEP_WINDOWS.index((182, 365)),
+                                      format_func=lambda w: f"{w[0]}-{w[1]} days")
+            
+            point = cube.point(drop, recovery, window)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Recovery Events", int(point['events']))
+            with col2:
+                st.metric("ETFs", int(point['tickers']))
+            with col3:
+                st.metric("Avg Recovery %", f"{point['mean_recovery_percentage']:.2f}%"
+                          if point['events'] else "-")
+            with col4:
+                st.metric("Avg Days to Recovery", f"{point['mean_days_to_recover']:.0f}"
+                          if point['events'] else "-")
+            
+            w = SWEEP_WINDOWS.index(window)
+            heatmap = go.Figure(go.Heatmap(
+                z=cube['events'][:, :, w],
+                x=[f"+{r:.0%}" for r in SWEEP_RECOVERIES],
+                y=[f"{d:.1%}" for d in SWEEP_DROPS],
+                colorscale='Greens',
+                colorbar=dict(title='Events')
+            ))
+            heatmap.update_layout(title=f"Recovery events, {window[0]}-{window[1]} day window",
+                                  xaxis_title="Recovery threshold", yaxis_title="Drop threshold",
+                                  height=500)
+            st.plotly_chart(heatmap, use_container_width=True)
+        else:
+            st.info("Run the analysis first to explore parameters.")
+    
     with tab4:
         st.header("About This Application")
         
@@ -162,6 +340,10 @@ def main():
         This tool is for educational and informational purposes only. It should not be considered as financial advice.
         Always consult with a qualified financial advisor before making investment decisions.
         """)
+    
+    # Rendered last so it includes the charts and report built above
+    with tab6:
+        show_diagnostics(profile_mode)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from price_store import DEFAULT_CACHE_DIR, as_naive_utc
+
+DEFAULT_AUM_PATH = os.path.join(DEFAULT_CACHE_DIR, 'aum.parquet')
+
+
+def month_ends(start, end) -> pd.DatetimeIndex:
+    """Last business day of every month between ``start`` and ``end``."""
+    return pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=pd.offsets.BMonthEnd())
+
+
+class AUMSnapshots:
+    """Assets under management per ticker per snapshot date.
+
+    A dates x tickers float matrix (NaN where a ticker had no snapshot),
+    stored as a long Date/Ticker/AUM Parquet file and loaded in one pass.
+    Queries are point in time: a date sees the latest snapshot on or before
+    it, never a later one, so rebalanced backtests rank each period from the
+    table instead of refetching metadata.
+    """
+
+    def __init__(self, dates: np.ndarray, tickers: Sequence[str], values: np.ndarray):
+        dates = as_naive_utc(dates) if len(dates) else np.array([], dtype='datetime64[ns]')
+        order = np.argsort(dates, kind='stable')
+        self.dates = dates[order]
+        self.tickers: List[str] = list(tickers)
+        self.values = np.asarray(values, dtype=float).reshape(len(self.dates), len(self.tickers))[order]
+        self._columns = {t: i for i, t in enumerate(self.tickers)}
+        self._last_seen: Optional[np.ndarray] = None
+
+    @classmethod
+    def empty(cls) -> 'AUMSnapshots':
+        return cls(np.array([], dtype='datetime64[ns]'), [], np.empty((0, 0)))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'AUMSnapshots':
+        """From a long Date/Ticker/AUM frame; a repeated (date, ticker) keeps its last value."""
+        dates, date_rows = np.unique(as_naive_utc(frame['Date']), return_inverse=True)
+        ticker_cols, tickers = pd.factorize(frame['Ticker'].astype(str))
+        values = np.full((len(dates), len(tickers)), np.nan)
+        values[date_rows, ticker_cols] = frame['AUM'].to_numpy(dtype=float)
+        return cls(dates, list(tickers), values)
+
+    @classmethod
+    def from_prices(cls, closes: pd.DataFrame, current: Dict[str, float]) -> 'AUMSnapshots':
+        """Back-fill from a dates x tickers close panel, scaling today's AUM by
+        each day's close over the last one. This assumes constant shares
+        outstanding (no flows) and is only a stand-in until real snapshots
+        have accumulated."""
+        tickers = [t for t in closes.columns if current.get(t, 0) > 0]
+        prices = closes[tickers].to_numpy(dtype=float)
+        last = pd.DataFrame(prices).ffill().to_numpy()[-1] if len(prices) else np.array([])
+        scale = np.array([current[t] for t in tickers]) / last
+        return cls(closes.index.values, tickers, prices * scale)
+
+    def to_frame(self) -> pd.DataFrame:
+        rows, cols = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame({
+            'Date': self.dates[rows],
+            'Ticker': pd.Categorical.from_codes(cols, self.tickers),
+            'AUM': self.values[rows, cols],
+        })
+
+    def save(self, path: str = DEFAULT_AUM_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.tmp"
+        self.to_frame().to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_AUM_PATH) -> 'AUMSnapshots':
+        if not os.path.exists(path):
+            return cls.empty()
+        return cls.from_frame(pd.read_parquet(path))
+
+    def record(self, date, aum: Dict[str, float]) -> 'AUMSnapshots':
+        """Snapshot with ``aum`` added as of ``date`` (replacing that date's values)."""
+        known = [t for t, value in aum.items() if value and value > 0]
+        frame = pd.concat([self.to_frame(), pd.DataFrame({
+            'Date': pd.Timestamp(as_naive_utc(date)), 'Ticker': known,
+            'AUM': [float(aum[t]) for t in known],
+        })], ignore_index=True)
+        frame['Ticker'] = frame['Ticker'].astype(str)
+        return AUMSnapshots.from_frame(frame)
+
+    def merge(self, other: 'AUMSnapshots') -> 'AUMSnapshots':
+        """Both tables combined; ``other`` wins where they overlap."""
+        frame = pd.concat([self.to_frame(), other.to_frame()], ignore_index=True)
+        frame['Ticker'] = frame['Ticker'].astype(str)
+        return AUMSnapshots.from_frame(frame)
+
+    def _last_rows(self) -> np.ndarray:
+        # Per ticker, the row of the latest snapshot at or before each row (-1 if none)
+        if self._last_seen is None:
+            rows = np.where(np.isnan(self.values), -1, np.arange(len(self.dates))[:, None])
+            self._last_seen = np.maximum.accumulate(rows, axis=0) if len(rows) else rows
+        return self._last_seen
+
+    def as_of(self, dates, max_age: Optional[pd.Timedelta] = None) -> np.ndarray:
+        """len(dates) x tickers AUM as known on each date. Snapshots older than
+        ``max_age`` (e.g. a delisted fund) count as missing."""
+        dates = np.atleast_1d(as_naive_utc(dates))
+        if not len(self.dates):
+            return np.full((len(dates), len(self.tickers)), np.nan)
+        at = np.searchsorted(self.dates, dates, side='right') - 1
+        rows = np.where(at[:, None] >= 0, self._last_rows()[at.clip(0)], -1)
+        cols = np.broadcast_to(np.arange(len(self.tickers)), rows.shape)
+        values = np.where(rows >= 0, self.values[rows.clip(0), cols], np.nan)
+        if max_age is not None:
+            age = dates[:, None] - self.dates[rows.clip(0)]
+            values[age > np.timedelta64(pd.Timedelta(max_age))] = np.nan
+        return values
+
+    def top_k(self, k: int, dates, tickers: Optional[Iterable[str]] = None,
+              max_age: Optional[pd.Timedelta] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The ``k`` largest funds on each date as (column positions, AUM),
+        both len(dates) x k, largest first. Positions are -1 (and AUM NaN)
+        where fewer than ``k`` funds had a snapshot.
+
+        Each row is partitioned with ``np.argpartition`` in O(tickers) and
+        only the ``k`` winners are sorted, rather than sorting every row.
+        """
+        values = self.as_of(dates, max_age)
+        if tickers is not None:
+            allowed = np.zeros(len(self.tickers), dtype=bool)
+            allowed[[self._columns[t] for t in tickers if t in self._columns]] = True
+            values[:, ~allowed] = np.nan
+        scores = np.where(np.isnan(values), -np.inf, values)
+        n = scores.shape[1]
+        k = min(k, n)
+        if k == 0:
+            return np.empty((len(scores), 0), dtype=np.int64), np.empty((len(scores), 0))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(scores), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        missing = np.isneginf(top_scores)
+        return np.where(missing, -1, top), np.where(missing, np.nan, top_scores)
+
+    def rankings(self, k: int, dates, tickers: Optional[Iterable[str]] = None,
+                 max_age: Optional[pd.Timedelta] = None) -> pd.DataFrame:
+        """Long date/rank/ticker/aum table of the top ``k`` on each date."""
+        dates = np.atleast_1d(as_naive_utc(dates))
+        top, aum = self.top_k(k, dates, tickers, max_age)
+        rows, ranks = np.nonzero(top >= 0)
+        return pd.DataFrame({
+            'date': dates[rows],
+            'rank': ranks + 1,
+            'ticker': pd.Categorical.from_codes(top[rows, ranks], self.tickers),
+            'aum': aum[rows, ranks],
+        })
+
+    def members(self, k: int, dates, tickers: Optional[Iterable[str]] = None,
+                max_age: Optional[pd.Timedelta] = None) -> pd.DataFrame:
+        """Boolean dates x tickers frame: whether each fund was in the top ``k`` that day."""
+        dates = np.atleast_1d(as_naive_utc(dates))
+        top, _ = self.top_k(k, dates, tickers, max_age)
+        # Missing slots (-1) land in a spare last column that is dropped
+        mask = np.zeros((len(dates), len(self.tickers) + 1), dtype=bool)
+        mask[np.arange(len(dates))[:, None], top] = True
+        return pd.DataFrame(mask[:, :-1], index=pd.DatetimeIndex(dates, name='Date'), columns=self.tickers)
+
+    def universe(self, k: int, date: Union[str, datetime], tickers: Optional[Iterable[str]] = None,
+                 max_age: Optional[pd.Timedelta] = None) -> List[Tuple[str, float]]:
+        """(ticker, AUM) of the top ``k`` on ``date``, like ``get_top_etfs_by_market_cap``."""
+        top, aum = self.top_k(k, [date], tickers, max_age)
+        return [(self.tickers[i], float(a)) for i, a in zip(top[0], aum[0]) if i >= 0]
+
+
+def snapshot_aum(fetcher, tickers: Iterable[str], snapshots: Optional[AUMSnapshots] = None,
+                 date: Optional[datetime] = None, path: Optional[str] = None,
+                 aum: Optional[Dict[str, float]] = None) -> AUMSnapshots:
+    """Record ``totalAssets`` for ``tickers`` as of ``date`` (default today)
+    and save the table if ``path`` is given.
+
+    Without ``aum`` the values are fetched concurrently through the
+    fetcher's metadata cache, which only knows today's figures, so a past
+    ``date`` needs its values passed in as ``aum``.
+    """
+    today = pd.Timestamp.now().normalize()
+    date = today if date is None else pd.Timestamp(as_naive_utc(date))
+    if aum is None:
+        if date.normalize() != today:
+            raise ValueError(f"Fetched AUM is as of {today.date()}; pass aum= to record {date.date()}")
+        infos = fetcher.fetch_info_many(list(tickers), ['totalAssets'])
+        aum = {t: info.get('totalAssets', 0) for t, info in infos.items()}
+    else:
+        aum = {t: aum.get(t, 0) for t in tickers}
+    snapshots = snapshots if snapshots is not None else (AUMSnapshots.load(path) if path else AUMSnapshots.empty())
+    snapshots = snapshots.record(date, aum)
+    if path:
+        snapshots.save(path)
+    return snapshots
@@ -0,0 +1,206 @@
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from events import DropEvents
+from panel import fill_listings
+from price_store import as_naive_utc
+from recovery import RangeMax
+
+
+class BacktestResult:
+    """Results cube over (entry threshold, holding period, stop-loss).
+
+    Every metric is an array shaped ``(len(entry_thresholds),
+    len(holding_periods), len(stop_losses))``. Returns and drawdowns are
+    percentages per trade; a trade's drawdown is its lowest close while held
+    relative to the entry price (0 if it never traded below it).
+    """
+
+    METRICS = ('trades', 'hit_rate', 'mean_return_percentage', 'worst_return_percentage',
+               'mean_drawdown_percentage', 'max_drawdown_percentage', 'stop_rate', 'mean_bars_held')
+
+    def __init__(self, entry_thresholds: Sequence[float], holding_periods: Sequence[int],
+                 stop_losses: Sequence[Optional[float]], metrics: Dict[str, np.ndarray]):
+        self.entry_thresholds = list(entry_thresholds)
+        self.holding_periods = list(holding_periods)
+        self.stop_losses = list(stop_losses)
+        self.metrics = metrics
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        return self.metrics[metric]
+
+    def point(self, entry_threshold: float, holding_period: int,
+              stop_loss: Optional[float] = None) -> Dict[str, float]:
+        key = (self.entry_thresholds.index(entry_threshold),
+               self.holding_periods.index(holding_period),
+               self.stop_losses.index(stop_loss))
+        return {name: values[key].item() for name, values in self.metrics.items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        index = pd.MultiIndex.from_product(
+            [self.entry_thresholds, self.holding_periods, self.stop_losses],
+            names=['entry_threshold', 'holding_period', 'stop_loss']
+        )
+        return pd.DataFrame({name: values.ravel() for name, values in self.metrics.items()},
+                            index=index)
+
+    def best(self, metric: str = 'mean_return_percentage', min_trades: int = 1) -> pd.Series:
+        """The variant with the highest ``metric`` among those with at least ``min_trades`` trades."""
+        frame = self.to_frame()
+        frame = frame[frame['trades'] >= min_trades]
+        return frame.loc[frame[metric].idxmax()]
+
+
+def _prepare(closes: pd.DataFrame, drops: DropEvents, entry_lag: int) -> Dict:
+    """Flatten the panel column by column and turn drop events into entries,
+    most severe drop first, so every entry threshold is a prefix."""
+    closes = fill_listings(closes)
+    dates = as_naive_utc(closes.index)
+    prices = closes.to_numpy(dtype=float)
+    n = len(prices)
+    flat = prices.ravel(order='F')
+    valid = ~np.isnan(prices)
+    last_row = np.where(valid.any(axis=0), n - 1 - np.argmax(valid[::-1], axis=0), -1)
+
+    columns = {t: i for i, t in enumerate(closes.columns)}
+    column_of = np.array([columns.get(t, -1) for t in drops.tickers] + [-1], dtype=np.int64)
+    col = column_of[drops.ticker_codes.astype(np.int64)] if len(drops) else np.array([], dtype=np.int64)
+    end = drops.dates('end_date')
+    row = np.searchsorted(dates, end)
+    entry_row = row + entry_lag
+    ok = (col >= 0) & (row < n)
+    ok[ok] &= dates[row[ok]] == end[ok]
+    ok[ok] &= entry_row[ok] <= last_row[col[ok]]
+    entry_flat = col[ok] * n + entry_row[ok]
+    drop = drops.drop_percentage[ok] / 100
+    keep = ~np.isnan(flat[entry_flat])
+    entry_flat, drop, col = entry_flat[keep], drop[keep], col[ok][keep]
+
+    # Drops over several horizons can end on the same bar; trade it once, at its worst drop
+    order = np.lexsort((drop, entry_flat))
+    first = np.unique(entry_flat[order], return_index=True)[1]
+    chosen = order[first]
+    chosen = chosen[np.argsort(drop[chosen], kind='stable')]
+    entry_flat = entry_flat[chosen]
+    return {
+        'flat': flat,
+        # Range minimum of the closes, as the range maximum of their negation
+        'range_min': RangeMax(-flat),
+        'drop': drop[chosen],
+        'column': col[chosen],
+        'entry_flat': entry_flat,
+        'entry_price': flat[entry_flat],
+        'last_flat': col[chosen] * n + last_row[col[chosen]],
+        'dates': dates,
+        'n': n,
+        'tickers': list(closes.columns),
+    }
+
+
+def _stops(state: Dict, stop_loss: Optional[float], max_holding: int) -> np.ndarray:
+    """Flat position of the first close at or below the stop within
+    ``max_holding`` bars of each entry, or -1."""
+    entry = state['entry_flat']
+    if stop_loss is None:
+        return np.full(len(entry), -1, dtype=np.int64)
+    hi = np.minimum(entry + max_holding, state['last_flat']) + 1
+    level = -state['entry_price'] * (1 + stop_loss)
+    return state['range_min'].first_at_or_above(entry + 1, hi, level)
+
+
+def _trades(state: Dict, stop_flat: np.ndarray, holding_period: int) -> Dict[str, np.ndarray]:
+    entry, price = state['entry_flat'], state['entry_price']
+    planned = np.minimum(entry + holding_period, state['last_flat'])
+    stopped = (stop_flat >= 0) & (stop_flat <= planned)
+    exit_flat = np.where(stopped, stop_flat, planned)
+    lowest = -state['range_min'].query(entry, exit_flat + 1)
+    return {
+        'exit_flat': exit_flat,
+        'returns': state['flat'][exit_flat] / price - 1,
+        'drawdown': np.minimum(lowest / price - 1, 0),
+        'stopped': stopped,
+        'bars': exit_flat - entry,
+    }
+
+
+def _aggregate(counts: np.ndarray, trades: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Metrics for every entry threshold from prefix sums over the severity-ordered trades."""
+    def prefix_sum(values):
+        return np.concatenate(([0.0], np.cumsum(values, dtype=float)))[counts]
+
+    def prefix_min(values):
+        running = np.concatenate(([np.nan], np.minimum.accumulate(values))) if len(values) else np.array([np.nan])
+        return running[counts]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'trades': counts,
+            'hit_rate': prefix_sum(trades['returns'] > 0) / counts * 100,
+            'mean_return_percentage': prefix_sum(trades['returns']) / counts * 100,
+            'worst_return_percentage': prefix_min(trades['returns']) * 100,
+            'mean_drawdown_percentage': prefix_sum(trades['drawdown']) / counts * 100,
+            'max_drawdown_percentage': prefix_min(trades['drawdown']) * 100,
+            'stop_rate': prefix_sum(trades['stopped']) / counts * 100,
+            'mean_bars_held': prefix_sum(trades['bars']) / counts,
+        }
+
+
+def backtest_drops(closes: pd.DataFrame, drops: DropEvents, entry_thresholds: Sequence[float],
+                   holding_periods: Sequence[int], stop_losses: Sequence[Optional[float]] = (None,),
+                   entry_lag: int = 1) -> BacktestResult:
+    """Simulate buying after every detected drop, for every strategy variant.
+
+    ``closes`` is the aligned date x ticker panel the ``drops`` were found
+    in. A variant buys ``entry_lag`` bars after each drop at or below its
+    entry threshold (a fraction, e.g. -0.05) and sells at the close
+    ``holding_period`` bars later, or at the first close at or below its
+    stop-loss (a fraction of the entry price, ``None`` for no stop),
+    whichever comes first; trades still open at the end of a listing exit
+    on its last bar. Every drop is an independent trade.
+
+    Stop searches run once per stop-loss over all trades; holding periods
+    are arithmetic on those results and entry thresholds are prefixes of
+    the trades sorted by severity, so the cost grows with the number of
+    trades times stop-losses times holding periods, not with the grid size
+    times each trade's length.
+    """
+    holding_periods = [int(h) for h in holding_periods]
+    if min(holding_periods) < 1:
+        raise ValueError("Holding periods must be at least one bar")
+    state = _prepare(closes, drops, entry_lag)
+    thresholds = np.asarray(entry_thresholds, dtype=float)
+    counts = np.searchsorted(state['drop'], thresholds, side='right')
+
+    shape = (len(thresholds), len(holding_periods), len(stop_losses))
+    metrics = {name: np.empty(shape, dtype=np.int64 if name == 'trades' else float)
+               for name in BacktestResult.METRICS}
+    for s, stop_loss in enumerate(stop_losses):
+        stop_flat = _stops(state, stop_loss, max(holding_periods))
+        for h, holding_period in enumerate(holding_periods):
+            for name, values in _aggregate(counts, _trades(state, stop_flat, holding_period)).items():
+                metrics[name][:, h, s] = values
+    return BacktestResult(entry_thresholds, holding_periods, stop_losses, metrics)
+
+
+def backtest_trades(closes: pd.DataFrame, drops: DropEvents, entry_threshold: float,
+                    holding_period: int, stop_loss: Optional[float] = None,
+                    entry_lag: int = 1) -> pd.DataFrame:
+    """The individual trades of one ``backtest_drops`` variant, in entry order."""
+    state = _prepare(closes, drops, entry_lag)
+    trades = _trades(state, _stops(state, stop_loss, holding_period), holding_period)
+    taken = state['drop'] <= entry_threshold
+    n = state['n']
+    entry, exit_flat = state['entry_flat'][taken], trades['exit_flat'][taken]
+    ledger = pd.DataFrame({
+        'ticker': pd.Categorical.from_codes(state['column'][taken], state['tickers']),
+        'drop_percentage': state['drop'][taken] * 100,
+        'entry_date': state['dates'][entry % n],
+        'exit_date': state['dates'][exit_flat % n],
+        'entry_price': state['entry_price'][taken],
+        'exit_price': state['flat'][exit_flat],
+        'return_percentage': trades['returns'][taken] * 100,
+        'drawdown_percentage': trades['drawdown'][taken] * 100,
+        'stopped': trades['stopped'][taken],
+        'bars_held': trades['bars'][taken],
+    })
+    return ledger.sort_values(['entry_date', 'ticker'], ignore_index=True)
@@ -0,0 +1,202 @@
+"""Offline benchmarks for the analysis hot paths on synthetic data.
+
+    python benchmark.py --scale 20x1 --scale 200x10 --save baseline.json
+    python benchmark.py --scale 20x1 --compare baseline.json
+    python benchmark.py --scale 2000x20 --executor processes --no-memory
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from backtest import backtest_drops
+from etf_analyzer import ETFAnalyzer
+from etf_data_fetcher import ETFDataFetcher
+from execution import EXECUTORS, analyze_universe, history_series
+from metadata_cache import MetadataCache
+from price_store import PriceStore
+from recovery import find_recovery_events
+from synthetic import SyntheticDataSource
+
+# name -> (tickers, years)
+SCALES = {
+    '20x1': (20, 1),
+    '200x10': (200, 10),
+    '500x20': (500, 20),
+    '2000x20': (2000, 20),
+    '2000x30': (2000, 30),
+}
+
+
+def parse_scale(text: str) -> Tuple[int, int]:
+    if text in SCALES:
+        return SCALES[text]
+    tickers, years = text.lower().split('x')
+    return int(tickers), int(years)
+
+
+def measure(fn: Callable, repeat: int = 1, memory: bool = True) -> Dict[str, float]:
+    """Best wall time over ``repeat`` runs plus, optionally, peak traced memory of one run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    result = {'seconds': min(timings)}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_scale(n_tickers: int, years: int, repeat: int = 1, memory: bool = True,
+              chart_tickers: int = 5, executor: str = 'serial',
+              workers: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as root:
+        source = SyntheticDataSource(years=years)
+        fetcher = ETFDataFetcher(data_source=source,
+                                 store=PriceStore(source, root=f"{root}/prices"),
+                                 metadata=MetadataCache(source, root=f"{root}/metadata"))
+        tickers = [f"SYN{i:04d}" for i in range(n_tickers)]
+        for ticker in tickers:
+            fetcher.store.refresh(ticker, 'max')
+
+        dates = fetcher.store.load(tickers[0]).index
+        closes = np.column_stack([fetcher.store.load(t)['Close'].to_numpy() for t in tickers])
+        bars = closes.size
+        results = {}
+
+        def drops():
+            for ticker in tickers:
+                fetcher.find_price_drops(ticker, period='max')
+        results['find_price_drops'] = dict(measure(drops, repeat, memory), items=bars, unit='bars')
+
+        series = history_series({t: fetcher.store.load(t) for t in tickers})
+
+        def scan():
+            analyze_universe(series, executor, workers)
+        results['universe_scan'] = dict(measure(scan, repeat, memory), items=bars, unit='bars')
+
+        scanned, _ = analyze_universe(series)
+        panel = pd.DataFrame(closes, index=dates, columns=tickers)
+        grid = (np.linspace(-0.15, -0.05, 10), list(range(1, 253, 21)), [None, -0.05, -0.1, -0.2, -0.3])
+
+        def backtest():
+            backtest_drops(panel, scanned, *grid)
+        results['backtest'] = dict(measure(backtest, repeat, memory),
+                                   items=len(grid[0]) * len(grid[1]) * len(grid[2]), unit='variants')
+
+        events = {}
+
+        def recoveries():
+            events.update(find_recovery_events(dates.values, closes))
+        results['recovery_engine'] = dict(measure(recoveries, repeat, memory), items=bars, unit='bars')
+
+        analyzer = ETFAnalyzer(fetcher)
+        col = events['column']
+        analyzer.analysis_results = pd.DataFrame({
+            'ticker': np.asarray(tickers)[col],
+            'drop_date': dates.values[events['trough_idx']],
+            'recovery_date': dates.values[events['recovery_idx']],
+            'bottom_price': closes[events['trough_idx'], col],
+            'recovery_price': closes[events['recovery_idx'], col],
+            'original_drop_percentage': events['drawdown'] * 100,
+            'recovery_percentage': events['recovery_return'] * 100,
+            'days_to_recover': events['recovery_idx'] - events['trough_idx'],
+            'market_cap': [source.info(tickers[c])['totalAssets'] for c in col],
+        })
+        n_events = len(col)
+        results['generate_report'] = dict(measure(analyzer.generate_report, repeat, memory),
+                                          items=n_events, unit='events')
+
+        busiest = pd.Series(col).value_counts().index[:chart_tickers]
+        analyzer.price_history = {tickers[c]: fetcher.store.load(tickers[c])['Close'] for c in busiest}
+
+        def charts():
+            analyzer.create_summary_chart()
+            for c in busiest:
+                analyzer.create_recovery_chart(tickers[c])
+        chart_bars = sum(len(analyzer.price_history[tickers[c]]) for c in busiest)
+        results['charts'] = dict(measure(charts, repeat, memory), items=chart_bars + n_events,
+                                 unit='points')
+
+    for stage in results.values():
+        stage['throughput'] = stage['items'] / stage['seconds'] if stage['seconds'] else float('inf')
+    return results
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.25) -> List[str]:
+    """Stages that got slower than ``baseline`` by more than ``tolerance``."""
+    regressions = []
+    for scale, stages in current.get('scales', {}).items():
+        for stage, result in stages.items():
+            base = baseline.get('scales', {}).get(scale, {}).get(stage)
+            if base and result['seconds'] > base['seconds'] * (1 + tolerance):
+                regressions.append(f"{scale} {stage}: {result['seconds']:.3f}s vs "
+                                   f"baseline {base['seconds']:.3f}s")
+    return regressions
+
+
+def format_results(results: Dict) -> str:
+    lines = [f"{'scale':<10} {'stage':<18} {'seconds':>9} {'throughput':>22} {'peak MB':>9}"]
+    for scale, stages in results['scales'].items():
+        for stage, r in stages.items():
+            peak = f"{r['peak_mb']:.1f}" if 'peak_mb' in r else '-'
+            lines.append(f"{scale:<10} {stage:<18} {r['seconds']:>9.3f} "
+                         f"{r['throughput']:>14,.0f} {r['unit'] + '/s':<7} {peak:>9}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', action='append',
+                        help=f"TICKERSxYEARS, e.g. 20x1 (presets: {', '.join(SCALES)})")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--executor', choices=EXECUTORS, default='serial',
+                        help="backend for the universe_scan stage")
+    parser.add_argument('--workers', type=int, help="workers for threads/processes (default: all cores)")
+    parser.add_argument('--save', help="write results as a JSON baseline")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown versus the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+        },
+        'scales': {},
+    }
+    for scale in args.scale or ['20x1']:
+        n_tickers, years = parse_scale(scale)
+        results['scales'][scale] = run_scale(n_tickers, years, args.repeat, not args.no_memory,
+                                             executor=args.executor, workers=args.workers)
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Headless batch runner: scan a universe and export events and the report.
+
+    python cli.py --top 10 --out results
+    python cli.py --tickers SPY QQQ IWM --period 5y --executor processes --workers 4 --format csv
+    python cli.py --archive prices/ --out results --charts
+
+Writes drops.<fmt> and recoveries.<fmt> (Parquet or CSV, chunk by chunk),
+report.txt and, with --charts, HTML charts under charts/. Plotting modules
+are only imported when charts are requested.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from aum import AUMSnapshots
+from etf_analyzer import ETFAnalyzer, write_frame
+from etf_data_fetcher import ETFDataFetcher
+from execution import EXECUTORS
+from instrumentation import metrics
+from metadata_cache import MetadataCache
+from price_store import PriceStore, YahooDataSource
+
+SOURCES = ('yahoo', 'synthetic')
+FORMATS = ('parquet', 'csv')
+
+# plotly resolves its trace classes with lazy imports that are not safe to
+# race, so charts render one at a time alongside the table writers
+_chart_lock = threading.Lock()
+
+
+def build_fetcher(source: str = 'yahoo', cache_dir: Optional[str] = None,
+                  max_workers: int = 8) -> ETFDataFetcher:
+    if source == 'synthetic':
+        from synthetic import SyntheticDataSource
+        data_source = SyntheticDataSource()
+    else:
+        data_source = YahooDataSource()
+    return ETFDataFetcher(
+        data_source=data_source,
+        store=PriceStore(data_source, root=os.path.join(cache_dir, 'prices') if cache_dir else None),
+        metadata=MetadataCache(data_source, root=os.path.join(cache_dir, 'metadata') if cache_dir else None),
+        max_workers=max_workers,
+    )
+
+
+def read_tickers(path: str) -> List[str]:
+    """One ticker per line (or comma separated); blank lines and # comments are skipped."""
+    tickers = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            tickers.extend(t.strip().upper() for t in line.split(',') if t.strip())
+    return tickers
+
+
+def export(analyzer: ETFAnalyzer, out: str, fmt: str = 'parquet', chunk_size: int = 10000,
+           report: bool = True, charts: bool = False, workers: int = 4) -> List[str]:
+    """Write every output of ``analyzer``'s last scan to ``out`` concurrently; returns the paths."""
+    os.makedirs(out, exist_ok=True)
+    jobs: Dict[str, Callable[[str], None]] = {
+        os.path.join(out, f'drops.{fmt}'):
+            lambda path: write_frame(analyzer.drops.to_frame(), path, fmt, chunk_size),
+        os.path.join(out, f'recoveries.{fmt}'):
+            lambda path: analyzer.write_report(path, fmt, chunk_size),
+    }
+    if report:
+        jobs[os.path.join(out, 'report.txt')] = lambda path: analyzer.write_report(path, 'text', chunk_size)
+    if charts:
+        chart_dir = os.path.join(out, 'charts')
+        os.makedirs(chart_dir, exist_ok=True)
+
+        def chart(build):
+            def write(path):
+                with _chart_lock:
+                    build().write_html(path, include_plotlyjs='cdn')
+            return write
+
+        jobs[os.path.join(chart_dir, 'summary.html')] = chart(analyzer.create_summary_chart)
+        for ticker in analyzer.results['ticker'].unique() if not analyzer.results.empty else []:
+            jobs[os.path.join(chart_dir, f'{ticker}.html')] = \
+                chart(lambda ticker=ticker: analyzer.create_recovery_chart(ticker))
+
+    # The writers are file and Arrow I/O, so threads overlap them well
+    with metrics.timer('export'), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(write, path) for path, write in jobs.items()]
+        for future in futures:
+            future.result()
+    return list(jobs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    universe = parser.add_mutually_exclusive_group()
+    universe.add_argument('--tickers', nargs='+', help="tickers to scan")
+    universe.add_argument('--tickers-file', help="file listing the tickers to scan")
+    universe.add_argument('--top', type=int, default=10, help="scan the N largest ETFs (default)")
+    parser.add_argument('--archive', help="scan closes from a PriceArchive directory instead of the store")
+    parser.add_argument('--aum', help="AUM snapshot file giving --archive scans their market caps "
+                                      "(archive scans make no metadata lookups)")
+    parser.add_argument('--period', help="history to scan (default: 2y, or max with --archive)")
+    parser.add_argument('--threshold', type=float, default=-0.05, help="drop threshold, e.g. -0.05")
+    parser.add_argument('--drop-threshold', type=float, default=-0.10)
+    parser.add_argument('--recovery-threshold', type=float, default=0.15)
+    parser.add_argument('--min-days', type=int, default=182)
+    parser.add_argument('--max-days', type=int, default=365)
+    parser.add_argument('--executor', choices=EXECUTORS, default='serial',
+                        help="how per-ticker detection is parallelised")
+    parser.add_argument('--workers', type=int, help="workers for threads/processes (default: all cores)")
+    parser.add_argument('--fetch-workers', type=int, default=8, help="concurrent downloads")
+    parser.add_argument('--source', choices=SOURCES, default='yahoo',
+                        help="price source; synthetic runs offline")
+    parser.add_argument('--cache-dir', help="price and metadata cache (default: ETF_CACHE_DIR)")
+    parser.add_argument('--out', default='.', help="output directory")
+    parser.add_argument('--format', choices=FORMATS, default='parquet', help="format of the event tables")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="rows written per chunk")
+    parser.add_argument('--no-report', action='store_true', help="skip report.txt")
+    parser.add_argument('--charts', action='store_true', help="also write HTML charts (loads plotly)")
+    parser.add_argument('--metrics', action='store_true', help="write metrics.json with stage timings")
+    args = parser.parse_args(argv)
+
+    fetcher = build_fetcher(args.source, args.cache_dir, args.fetch_workers)
+    analyzer = ETFAnalyzer(fetcher, executor=args.executor, workers=args.workers)
+    params = dict(threshold=args.threshold, drop_threshold=args.drop_threshold,
+                  recovery_threshold=args.recovery_threshold, min_days=args.min_days,
+                  max_days=args.max_days)
+
+    if args.archive:
+        from price_archive import PriceArchive
+        archive = PriceArchive(args.archive)
+        tickers = args.tickers or (read_tickers(args.tickers_file) if args.tickers_file else None)
+        market_caps = AUMSnapshots.load(args.aum) if args.aum else None
+        analyzer.scan_archive(archive, tickers, period=args.period or 'max',
+                              market_caps=market_caps, **params)
+    else:
+        if args.tickers:
+            universe = [t.upper() for t in args.tickers]
+        elif args.tickers_file:
+            universe = read_tickers(args.tickers_file)
+        else:
+            universe = dict(fetcher.get_top_etfs_by_market_cap(args.top))
+        if not universe:
+            print("No tickers to scan")
+            return 1
+        analyzer.scan(universe, period=args.period or '2y', **params)
+        if not analyzer.price_history:
+            print("No price data could be fetched")
+            return 1
+
+    paths = export(analyzer, args.out, args.format, args.chunk_size,
+                   report=not args.no_report, charts=args.charts)
+    if args.metrics:
+        path = os.path.join(args.out, 'metrics.json')
+        with open(path, 'w') as f:
+            json.dump(metrics.snapshot(), f, indent=2)
+        paths.append(path)
+    print(f"{len(analyzer.drops)} drops, {len(analyzer.results)} recoveries")
+    for path in paths:
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
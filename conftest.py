@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from etf_data_fetcher import ETFDataFetcher
+from metadata_cache import MetadataCache
+from price_store import PriceStore, YahooDataSource, period_start
+
+
+class FakeTicker:
+    """Stand-in for yf.Ticker serving a fixed daily series and logging requests."""
+
+    def __init__(self, ticker, frame, calls, info=None):
+        self.ticker = ticker
+        self.frame = frame
+        self.calls = calls
+        self._info = info if info is not None else {'totalAssets': 1e9}
+
+    @property
+    def info(self):
+        self.calls.append((self.ticker, 'info', None))
+        return self._info
+
+    def history(self, period=None, start=None):
+        self.calls.append((self.ticker, period, start))
+        if start is not None:
+            return self.frame[self.frame.index >= pd.Timestamp(start)]
+        since = period_start(period)
+        return self.frame if since is None else self.frame[self.frame.index >= since]
+
+
+def make_source(frames, calls, infos=None):
+    """Fake YahooDataSource; ``frames`` is one frame for every ticker or a per-ticker dict."""
+    def factory(ticker):
+        frame = frames[ticker] if isinstance(frames, dict) else frames
+        info = infos.get(ticker) if infos is not None else None
+        return FakeTicker(ticker, frame, calls, info)
+    return YahooDataSource(factory)
+
+
+def make_frame(end, days=1000, close=None):
+    dates = pd.bdate_range(end=pd.Timestamp(end).normalize(), periods=days, name='Date')
+    close = 100 + np.arange(days, dtype=float) if close is None else np.asarray(close, dtype=float)
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close,
+                         'Close': close, 'Volume': 1000}, index=dates)
+
+
+def random_walk(days, seed=0, crashes=5):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0004, 0.012, days)
+    returns[rng.choice(days, crashes, replace=False)] = rng.uniform(-0.12, -0.05, crashes)
+    return 100 * np.cumprod(1 + returns)
+
+
+# Short recovery windows, so the small universes below yield plenty of events
+PARAMS = dict(drop_threshold=-0.05, recovery_threshold=0.05, min_days=0, max_days=120)
+
+
+def make_universe(end=None):
+    """Three crash-prone tickers; CCC is listed later than the others."""
+    end = pd.Timestamp.now() if end is None else end
+    return {
+        'AAA': make_frame(end, days=520, close=random_walk(520, seed=3, crashes=15)),
+        'BBB': make_frame(end, days=520, close=random_walk(520, seed=4, crashes=15)),
+        'CCC': make_frame(end, days=300, close=random_walk(300, seed=5, crashes=10)),
+    }
+
+
+@pytest.fixture
+def offline_fetcher(tmp_path):
+    def build(frames, calls=None, infos=None):
+        calls = [] if calls is None else calls
+        source = make_source(frames, calls, infos)
+        return ETFDataFetcher(
+            data_source=source,
+            store=PriceStore(source, root=str(tmp_path / 'prices')),
+            metadata=MetadataCache(source, root=str(tmp_path / 'metadata')),
+        )
+    return build
@@ -0,0 +1,155 @@
+import zlib
+from typing import List, Optional
+import numpy as np
+
+# Points per price trace; about one per horizontal pixel of a wide chart
+DEFAULT_MAX_POINTS = 2000
+# Traces with more points than this are drawn with WebGL (Scattergl)
+WEBGL_POINTS = 1000
+
+
+def _with_kept(indices: np.ndarray, keep: Optional[np.ndarray], lo: int, hi: int) -> np.ndarray:
+    parts = [np.asarray(indices, dtype=np.int64), np.array([lo, hi - 1], dtype=np.int64)]
+    if keep is not None:
+        keep = np.asarray(keep, dtype=np.int64)
+        parts.append(keep[(keep >= lo) & (keep < hi)])
+    return np.unique(np.concatenate(parts))
+
+
+def _bucket_extremes(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Positions of the first minimum and first maximum of each bucket that
+    begins at ``starts`` (the last bucket runs to the end)."""
+    sizes = np.diff(np.append(starts, len(values)))
+    bucket = np.repeat(np.arange(len(starts)), sizes)
+    found = []
+    for reduce in (np.minimum, np.maximum):
+        hits = np.flatnonzero(values == np.repeat(reduce.reduceat(values, starts), sizes))
+        _, first = np.unique(bucket[hits], return_index=True)
+        found.append(hits[first])
+    return np.concatenate(found)
+
+
+def minmax_indices(values: np.ndarray, max_points: int = DEFAULT_MAX_POINTS,
+                   keep: Optional[np.ndarray] = None) -> np.ndarray:
+    """Sorted positions of the low and high of ``max_points // 2`` equal
+    buckets, plus the end points and ``keep``. Every local extreme wider than
+    a bucket survives, so drawn drops are never shallower than the data."""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    starts = np.unique(np.linspace(0, n, max(max_points // 2, 1), endpoint=False).astype(np.int64))
+    return _with_kept(_bucket_extremes(values, starts), keep, 0, n)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int = DEFAULT_MAX_POINTS,
+                 keep: Optional[np.ndarray] = None) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: from each bucket, the point forming the
+    largest triangle with the point chosen before it and the next bucket's
+    mean. Keeps the visual shape with fewer points than min/max; ``keep``
+    positions are added on top."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    edges = np.unique(np.linspace(1, n - 1, max_points - 1).astype(np.int64))
+    sizes = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / sizes, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / sizes, y[-1])
+    chosen = np.empty(len(sizes) + 2, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for b in range(len(sizes)):
+        lo, hi = edges[b], edges[b + 1]
+        cx, cy = mean_x[b + 1], mean_y[b + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        chosen[b + 1] = a
+    return _with_kept(chosen, keep, 0, n)
+
+
+def signature(dates: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Identifies the series a pyramid was built from."""
+    dates = np.ascontiguousarray(np.asarray(dates, dtype='datetime64[ns]')).view(np.int64)
+    values = np.ascontiguousarray(values, dtype=float)
+    return np.array([len(values), zlib.crc32(dates.tobytes()), zlib.crc32(values.tobytes())],
+                    dtype=np.int64)
+
+
+class ZoomPyramid:
+    """Min/max pyramid over a price series for zoomable charts.
+
+    Level ``k`` holds, for every run of ``2 ** k`` bars, the positions of its
+    low and high, each level built from the one below in O(n). ``select``
+    answers any zoom window from the coarsest level that still fills the
+    point budget, so a pan or zoom costs O(budget) instead of a pass over
+    the history. Saved as ``.npz`` next to the price data and reused while
+    the series is unchanged.
+    """
+
+    def __init__(self, values: np.ndarray, mins: List[np.ndarray], maxs: List[np.ndarray],
+                 signature: Optional[np.ndarray] = None):
+        self.values = np.asarray(values, dtype=float)
+        self.mins = mins
+        self.maxs = maxs
+        self.signature = signature
+
+    @classmethod
+    def build(cls, dates: np.ndarray, values: np.ndarray) -> 'ZoomPyramid':
+        values = np.asarray(values, dtype=float)
+        level = np.arange(len(values), dtype=np.int64)
+        mins, maxs = [level], [level]
+        while len(mins[-1]) > 1:
+            lows, highs = mins[-1], maxs[-1]
+            if len(lows) % 2:
+                lows, highs = np.append(lows, lows[-1]), np.append(highs, highs[-1])
+            a, b = lows[0::2], lows[1::2]
+            mins.append(np.where(values[b] < values[a], b, a))
+            a, b = highs[0::2], highs[1::2]
+            maxs.append(np.where(values[b] > values[a], b, a))
+        return cls(values, mins, maxs, signature(dates, values))
+
+    def matches(self, dates: np.ndarray, values: np.ndarray) -> bool:
+        return self.signature is not None and np.array_equal(self.signature, signature(dates, values))
+
+    def save(self, path: str):
+        arrays = {'values': self.values, 'signature': self.signature}
+        for k, (lows, highs) in enumerate(zip(self.mins, self.maxs)):
+            if k:
+                arrays[f'min{k}'] = lows
+                arrays[f'max{k}'] = highs
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'ZoomPyramid':
+        with np.load(path) as data:
+            values = data['values']
+            mins, maxs = [np.arange(len(values), dtype=np.int64)], [np.arange(len(values), dtype=np.int64)]
+            k = 1
+            while f'min{k}' in data:
+                mins.append(data[f'min{k}'])
+                maxs.append(data[f'max{k}'])
+                k += 1
+            return cls(values, mins, maxs, data['signature'])
+
+    def select(self, lo: int = 0, hi: Optional[int] = None, max_points: int = DEFAULT_MAX_POINTS,
+               keep: Optional[np.ndarray] = None) -> np.ndarray:
+        """Sorted positions to draw for bars ``lo:hi``: about ``max_points``
+        lows and highs, the window's end points and ``keep``."""
+        hi = len(self.values) if hi is None else min(hi, len(self.values))
+        lo = max(lo, 0)
+        if hi <= lo:
+            return np.array([], dtype=np.int64)
+        if hi - lo <= max_points:
+            return np.arange(lo, hi)
+        # Smallest run length giving at most max_points / 2 runs in the window
+        k = min(int(np.ceil(np.log2((hi - lo) / max(max_points // 2, 1)))), len(self.mins) - 1)
+        width = 1 << k
+        first, last = -(-lo // width), hi // width
+        parts = [self.mins[k][first:last], self.maxs[k][first:last]]
+        # Partial runs at the window edges are scanned directly; each is under one run long
+        for a, b in ((lo, min(first * width, hi)), (max(last * width, lo), hi)):
+            if b > a:
+                parts.append(a + np.array([np.argmin(self.values[a:b]), np.argmax(self.values[a:b])]))
+        return _with_kept(np.concatenate(parts), keep, lo, hi)
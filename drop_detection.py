@@ -0,0 +1,62 @@
+from typing import Dict, Sequence, Tuple
+import numpy as np
+
+DEFAULT_HORIZONS = (1, 5)
+HORIZON_NAMES = {1: 'Daily', 5: 'Weekly', 21: 'Monthly', 63: 'Quarterly'}
+
+
+def windowed_returns(prices: np.ndarray, k: int) -> np.ndarray:
+    """k-bar simple returns ending at each bar (along axis 0); the first k rows are NaN."""
+    prices = np.asarray(prices, dtype=float)
+    returns = np.full(prices.shape, np.nan)
+    if len(prices) > k:
+        returns[k:] = (prices[k:] - prices[:-k]) / prices[:-k]
+    return returns
+
+
+def _recent_any(flags: np.ndarray, k: int) -> np.ndarray:
+    # Rolling max of a boolean mask over the trailing k bars, via a running count
+    counts = np.cumsum(flags, axis=0)
+    counts = np.concatenate((np.zeros((1,) + counts.shape[1:], dtype=counts.dtype), counts))
+    start = np.maximum(np.arange(1, len(flags) + 1) - k, 0)
+    return counts[1:] - counts[start] > 0
+
+
+def detect_drops(prices: np.ndarray, threshold: float = -0.05,
+                 horizons: Sequence[int] = DEFAULT_HORIZONS) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Find bars whose k-bar return is at or below ``threshold`` for every horizon k.
+
+    Returns ``{k: (end_indices, returns)}``. Multi-bar drops whose window
+    already contains a single-day drop are suppressed, so a crash day is
+    only reported once as a daily event.
+    """
+    events = {}
+    for k, (hits, returns) in _drop_masks(prices, threshold, horizons):
+        idx = np.flatnonzero(hits)
+        events[k] = (idx, returns[idx])
+    return events
+
+
+def detect_drops_panel(prices: np.ndarray, threshold: float = -0.05,
+                       horizons: Sequence[int] = DEFAULT_HORIZONS) -> Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """``detect_drops`` over every column of a date x ticker panel at once.
+
+    Returns ``{k: (rows, columns, returns)}`` ordered by column, then row.
+    """
+    events = {}
+    for k, (hits, returns) in _drop_masks(prices, threshold, horizons):
+        cols, rows = np.nonzero(hits.T)
+        events[k] = (rows, cols, returns[rows, cols])
+    return events
+
+
+def _drop_masks(prices: np.ndarray, threshold: float, horizons: Sequence[int]):
+    prices = np.asarray(prices, dtype=float)
+    daily = windowed_returns(prices, 1)
+    daily_hits = daily <= threshold
+    for k in horizons:
+        returns = daily if k == 1 else windowed_returns(prices, k)
+        hits = returns <= threshold
+        if k > 1:
+            hits &= ~_recent_any(daily_hits, k)
+        yield k, (hits, returns)
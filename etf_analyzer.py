@@ -1,84 +1,281 @@
+import os
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from typing import List, Dict
-import yfinance as yf
+from concurrent.futures import Executor
+from typing import IO, TYPE_CHECKING, Iterator, List, Dict, Optional, Sequence, Union
 from datetime import datetime
+from aum import AUMSnapshots
+from backtest import BacktestResult, backtest_drops
+from downsample import DEFAULT_MAX_POINTS, WEBGL_POINTS, ZoomPyramid, lttb_indices
+from drop_detection import DEFAULT_HORIZONS
+from events import DropEvents, RecoveryEvents
+from execution import analyze_archive, analyze_universe, history_series
+from instrumentation import metrics, timed
+from panel import align_closes, analyze_closes, same_day_drop_counts
+from price_archive import PriceArchive
+from price_store import as_naive_utc, period_start
+from sweep import SweepResult, sweep_recoveries
+
+if TYPE_CHECKING:
+    # plotly is imported by the chart methods only, so headless runs never load it
+    import plotly.graph_objects as go
 
 class ETFAnalyzer:
-    def __init__(self, fetcher):
+    def __init__(self, fetcher, executor: Union[str, Executor] = 'serial',
+                 workers: Optional[int] = None):
         self.fetcher = fetcher
+        # How per-ticker detection is spread out; see execution.analyze_universe
+        self.executor = executor
+        self.workers = workers
         self.analysis_results = []
+        self.drops = DropEvents.empty()
+        self.price_history: Dict[str, pd.Series] = {}
+        self._pyramids: Dict[str, ZoomPyramid] = {}
+        self.price_panel = pd.DataFrame()
+        self.panel_drops = pd.DataFrame()
+        
+    @property
+    def analysis_results(self) -> pd.DataFrame:
+        return self.results
+    
+    @analysis_results.setter
+    def analysis_results(self, results: Union[pd.DataFrame, List[Dict]]):
+        # The one place results become a frame; charts and reports all read self.results
+        self.results = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+        self._events_by_ticker: Dict[str, np.ndarray] = (
+            self.results.groupby('ticker', observed=True, sort=False).indices
+            if not self.results.empty else {}
+        )
+    
+    def events_for(self, ticker: str) -> pd.DataFrame:
+        positions = self._events_by_ticker.get(ticker)
+        if positions is None:
+            return self.results.iloc[:0]
+        return self.results.iloc[positions]
         
     def analyze_top_etfs(self) -> pd.DataFrame:
         print("Fetching top 10 ETFs by market cap...")
         top_etfs = self.fetcher.get_top_etfs_by_market_cap(10)
+        return self.scan(dict(top_etfs), period="2y")
+    
+    def scan(self, tickers: Union[Sequence[str], Dict[str, float]], period: str = "2y",
+             threshold: float = -0.05, horizons: Sequence[int] = DEFAULT_HORIZONS,
+             drop_threshold: float = -0.10, recovery_threshold: float = 0.15,
+             min_days: int = 182, max_days: int = 365) -> pd.DataFrame:
+        """Per-ticker drop and recovery detection over ``tickers`` (or a
+        ticker -> market cap dict), run on the analyzer's executor."""
+        market_caps = tickers if isinstance(tickers, dict) else self._market_caps(tickers)
         
-        results = []
-        for ticker, market_cap in top_etfs:
-            print(f"Analyzing {ticker}...")
-            
-            drops = self.fetcher.find_price_drops(ticker)
-            
-            if drops:
-                recoveries = self.fetcher.find_recoveries(ticker, drops)
-                
-                if recoveries:
-                    for recovery in recoveries:
-                        recovery['market_cap'] = market_cap
-                        results.append(recovery)
+        # Downloads are I/O-bound and stay on the fetcher's thread pool
+        with metrics.timer('fetch'):
+            histories = self.fetcher.fetch_many(list(market_caps), period=period)
+        self.price_history = {ticker: hist['Close'] for ticker, hist in histories.items()}
         
+        print(f"Analyzing {len(histories)} ETFs...")
+        with metrics.timer('analyze'):
+            self.drops, recoveries = analyze_universe(
+                history_series(histories), self.executor, self.workers, threshold=threshold,
+                horizons=horizons, drop_threshold=drop_threshold,
+                recovery_threshold=recovery_threshold, min_days=min_days, max_days=max_days
+            )
+        return self._set_recoveries(recoveries, market_caps)
+    
+    def scan_archive(self, archive: PriceArchive, tickers: Optional[Sequence[str]] = None,
+                     period: str = "max", threshold: float = -0.05,
+                     horizons: Sequence[int] = DEFAULT_HORIZONS, drop_threshold: float = -0.10,
+                     recovery_threshold: float = 0.15, min_days: int = 182, max_days: int = 365,
+                     market_caps: Optional[Union[Dict[str, float], AUMSnapshots]] = None) -> pd.DataFrame:
+        """``scan`` over closes read straight from a memory-mapped ``PriceArchive``.
+
+        Archive scans stay offline: ``market_cap`` comes from ``market_caps``
+        (a ticker -> market cap dict, or an ``AUMSnapshots`` table read as of
+        the archive's last date) and is left empty without one.
+        """
+        tickers = list(tickers) if tickers is not None else archive.tickers
+        if isinstance(market_caps, AUMSnapshots):
+            aum = market_caps.as_of(archive.dates[-1:])[0] if len(archive.dates) else []
+            market_caps = {t: a for t, a in zip(market_caps.tickers, aum) if not np.isnan(a)}
+        start = period_start(period)
+        # Charts and backtests read the scanned closes, never the store
+        self.price_history = {}
+        for ticker in tickers:
+            dates, closes = archive.series(ticker, start=start)
+            if len(closes):
+                self.price_history[ticker] = pd.Series(closes, index=pd.DatetimeIndex(dates, name='Date'),
+                                                       name='Close')
+        with metrics.timer('analyze'):
+            self.drops, recoveries = analyze_archive(
+                archive, tickers, self.executor, self.workers, start=start,
+                threshold=threshold, horizons=horizons, drop_threshold=drop_threshold,
+                recovery_threshold=recovery_threshold, min_days=min_days, max_days=max_days
+            )
+        return self._set_recoveries(recoveries, market_caps or {})
+    
+    def _market_caps(self, tickers: Sequence[str]) -> Dict[str, float]:
+        infos = self.fetcher.fetch_info_many(tickers, ['totalAssets'])
+        return {t: infos.get(t, {}).get('totalAssets', 0) for t in tickers}
+    
+    def _set_recoveries(self, recoveries: RecoveryEvents, market_caps: Dict[str, float]) -> pd.DataFrame:
+        results = recoveries.to_frame()
+        results['market_cap'] = results['ticker'].map(market_caps).astype(float)
         self.analysis_results = results
-        return pd.DataFrame(results)
+        return self.results
     
-    def create_recovery_chart(self, ticker: str) -> go.Figure:
-        etf = yf.Ticker(ticker)
-        hist = etf.history(period="2y")
+    @timed('panel')
+    def analyze_panel(self, tickers: Optional[Sequence[str]] = None, period: str = "2y",
+                      threshold: float = -0.05, horizons: Sequence[int] = DEFAULT_HORIZONS,
+                      drop_threshold: float = -0.10, recovery_threshold: float = 0.15,
+                      min_days: int = 182, max_days: int = 365) -> pd.DataFrame:
+        if tickers is None:
+            market_caps = dict(self.fetcher.get_top_etfs_by_market_cap(10))
+        else:
+            market_caps = self._market_caps(tickers)
+        
+        histories = self.fetcher.fetch_many(list(market_caps), period=period)
+        self.price_panel = align_closes(histories)
+        self.price_history = {ticker: hist['Close'] for ticker, hist in histories.items()}
+        if self.price_panel.empty:
+            self.panel_drops = pd.DataFrame()
+            self.analysis_results = []
+            return pd.DataFrame()
+        
+        self.panel_drops, results = analyze_closes(
+            self.price_panel, threshold, horizons, drop_threshold,
+            recovery_threshold, min_days, max_days
+        )
+        results['market_cap'] = results['ticker'].map(market_caps).astype(float)
+        self.analysis_results = results
+        return results
+    
+    def same_day_drops(self, threshold: float = -0.05) -> pd.Series:
+        return same_day_drop_counts(self.price_panel, threshold)
+    
+    @timed('sweep')
+    def sweep(self, drop_thresholds: Sequence[float], recovery_thresholds: Sequence[float],
+              windows: Sequence[tuple], processes: Optional[int] = None) -> SweepResult:
+        panel = self.price_panel
+        if panel.empty:
+            panel = align_closes({t: closes.to_frame('Close') for t, closes in self.price_history.items()})
+        return sweep_recoveries(panel.index.values, panel.to_numpy(dtype=float),
+                                drop_thresholds, recovery_thresholds, windows, processes)
+    
+    @timed('backtest')
+    def backtest(self, entry_thresholds: Sequence[float], holding_periods: Sequence[int],
+                 stop_losses: Sequence[Optional[float]] = (None,), entry_lag: int = 1) -> BacktestResult:
+        """Buy-the-drop variants over the drops and closes of the last ``scan``;
+        see ``backtest.backtest_drops``."""
+        if len(self.drops) and not self.price_history:
+            raise ValueError("No closes loaded for the scanned drops; run scan or scan_archive first")
+        closes = pd.DataFrame(self.price_history).sort_index()
+        return backtest_drops(closes, self.drops, entry_thresholds, holding_periods,
+                              stop_losses, entry_lag)
+    
+    def _closes(self, ticker: str) -> pd.Series:
+        closes = self.price_history.get(ticker)
+        if closes is None:
+            # Served from the local price store; only a cold store touches the network
+            hist = self.fetcher.store.get_history(ticker, "2y")
+            closes = hist['Close'] if not hist.empty else pd.Series(dtype=float)
+            self.price_history[ticker] = closes
+        return closes
+    
+    def _pyramid(self, ticker: str, dates: np.ndarray, values: np.ndarray) -> ZoomPyramid:
+        """Zoom pyramid for the charted closes, kept as ``<ticker>.lod.npz``
+        beside the price data and rebuilt only when the closes change."""
+        pyramid = self._pyramids.get(ticker)
+        if pyramid is None or not pyramid.matches(dates, values):
+            path = os.path.join(self.fetcher.store.root, f"{ticker}.lod.npz")
+            pyramid = ZoomPyramid.load(path) if os.path.exists(path) else None
+            if pyramid is None or not pyramid.matches(dates, values):
+                pyramid = ZoomPyramid.build(dates, values)
+                pyramid.save(path)
+            self._pyramids[ticker] = pyramid
+        return pyramid
+    
+    def _event_positions(self, ticker: str, dates: np.ndarray) -> np.ndarray:
+        # Bars a drop or recovery starts or ends on; downsampling always keeps them
+        events = self.events_for(ticker)
+        marks = [events[col].to_numpy(dtype='datetime64[ns]')
+                 for col in ('peak_date', 'drop_date', 'recovery_date') if col in events]
+        drops = self.drops.for_ticker(ticker)
+        marks += [drops.dates('start_date'), drops.dates('end_date')]
+        marks = np.concatenate(marks).astype('datetime64[ns]')
+        positions = np.searchsorted(dates, marks).clip(0, max(len(dates) - 1, 0))
+        return positions[dates[positions] == marks] if len(dates) else positions[:0]
+    
+    @timed('chart.recovery', ticker_arg=1)
+    def create_recovery_chart(self, ticker: str, max_points: int = DEFAULT_MAX_POINTS,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              method: str = "minmax") -> 'go.Figure':
+        """Price chart with drop -> recovery segments. The closes between
+        ``start`` and ``end`` are reduced to about ``max_points`` with a
+        min/max zoom pyramid (``method="minmax"``) or LTTB (``"lttb"``);
+        every drop and recovery bar is kept either way."""
+        import plotly.graph_objects as go
+        
+        closes = self._closes(ticker)
+        dates = pd.DatetimeIndex(closes.index).values
+        values = closes.to_numpy(dtype=float)
+        lo = int(np.searchsorted(dates, as_naive_utc(start))) if start is not None else 0
+        hi = int(np.searchsorted(dates, as_naive_utc(end), side='right')) if end is not None else len(dates)
+        keep = self._event_positions(ticker, dates)
+        if method == "lttb":
+            shown = lo + lttb_indices(dates[lo:hi].view(np.int64), values[lo:hi], max_points, keep - lo)
+        elif method == "minmax":
+            shown = self._pyramid(ticker, dates, values).select(lo, hi, max_points, keep)
+        else:
+            raise ValueError(f"Unknown downsampling method: {method}")
+        closes = closes.iloc[shown]
         
         fig = go.Figure()
         
-        fig.add_trace(go.Scatter(
-            x=hist.index,
-            y=hist['Close'],
+        line = go.Scattergl if len(closes) > WEBGL_POINTS else go.Scatter
+        fig.add_trace(line(
+            x=closes.index,
+            y=closes.values,
             mode='lines',
             name=f'{ticker} Price',
             line=dict(color='blue', width=2)
         ))
         
-        recoveries = [r for r in self.analysis_results if r['ticker'] == ticker]
+        recoveries = self.events_for(ticker)
         
-        for recovery in recoveries:
-            fig.add_trace(go.Scatter(
-                x=[recovery['drop_date'], recovery['recovery_date']],
-                y=[recovery['bottom_price'], recovery['recovery_price']],
-                mode='markers+lines',
-                name=f"Recovery: {recovery['recovery_percentage']:.1f}%",
+        if not recoveries.empty:
+            # One trace for every drop->recovery segment, split by None gaps
+            n = len(recoveries)
+            gap = np.full(n, None, dtype=object)
+            x = np.column_stack([recoveries['drop_date'].to_numpy(dtype=object),
+                                 recoveries['recovery_date'].to_numpy(dtype=object), gap]).ravel()
+            y = np.column_stack([recoveries['bottom_price'].to_numpy(dtype=object),
+                                 recoveries['recovery_price'].to_numpy(dtype=object), gap]).ravel()
+            labels = np.column_stack([
+                "Drop: " + recoveries['original_drop_percentage'].map('{:.1f}%'.format),
+                "Recovery: " + recoveries['recovery_percentage'].map('{:.1f}%'.format),
+                np.full(n, ''),
+            ]).ravel()
+            colors = np.tile(['red', 'green', 'green'], n)
+            # Past the WebGL threshold the labels move to the hover text
+            large = len(x) > WEBGL_POINTS
+            
+            fig.add_trace((go.Scattergl if large else go.Scatter)(
+                x=x,
+                y=y,
+                mode='markers+lines' if large else 'markers+lines+text',
+                name='Recoveries',
+                text=labels,
+                textposition='top center',
                 line=dict(color='green', width=2, dash='dash'),
-                marker=dict(size=10, color=['red', 'green'])
+                marker=dict(size=10, color=colors),
+                connectgaps=False
             ))
-            
-            fig.add_annotation(
-                x=recovery['drop_date'],
-                y=recovery['bottom_price'],
-                text=f"Drop: {recovery['original_drop_percentage']:.1f}%",
-                showarrow=True,
-                arrowhead=2,
-                ax=0,
-                ay=-40
-            )
-            
-            fig.add_annotation(
-                x=recovery['recovery_date'],
-                y=recovery['recovery_price'],
-                text=f"Recovery: {recovery['recovery_percentage']:.1f}%",
-                showarrow=True,
-                arrowhead=2,
-                ax=0,
-                ay=-40
-            )
         
+        if len(closes) and (start is not None or end is not None):
+            fig.update_xaxes(range=[closes.index[0], closes.index[-1]])
+        
+        # The span actually drawn: a scan period, the whole archive or a zoom window
+        span = f" ({closes.index[0]:%Y-%m-%d} to {closes.index[-1]:%Y-%m-%d})" if len(closes) else ""
         fig.update_layout(
-            title=f'{ticker} - Price Drops and Recoveries (2 Years)',
+            title=f'{ticker} - Price Drops and Recoveries{span}',
             xaxis_title='Date',
             yaxis_title='Price ($)',
             height=600,
@@ -87,8 +284,12 @@ class ETFAnalyzer:
         
         return fig
     
-    def create_summary_chart(self) -> go.Figure:
-        df = pd.DataFrame(self.analysis_results)
+    @timed('chart.summary')
+    def create_summary_chart(self) -> 'go.Figure':
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
+        df = self.results
         
         if df.empty:
             return go.Figure()
@@ -108,14 +309,21 @@ class ETFAnalyzer:
             row=1, col=1
         )
         
-        fig.add_trace(
-            go.Box(y=df['days_to_recover'], name='Days to Recovery',
-                  marker_color='blue'),
-            row=1, col=2
-        )
+        # Many events: send the box statistics instead of every point, and draw scatters with WebGL
+        large = len(df) > WEBGL_POINTS
+        if large:
+            days = df['days_to_recover'].to_numpy(dtype=float)
+            q1, median, q3 = np.percentile(days, [25, 50, 75])
+            box = go.Box(q1=[q1], median=[median], q3=[q3], mean=[days.mean()],
+                         lowerfence=[days.min()], upperfence=[days.max()], x=['Days to Recovery'],
+                         name='Days to Recovery', marker_color='blue', boxpoints=False)
+        else:
+            box = go.Box(y=df['days_to_recover'], name='Days to Recovery', marker_color='blue')
+        fig.add_trace(box, row=1, col=2)
         
+        scatter = go.Scattergl if large else go.Scatter
         fig.add_trace(
-            go.Scatter(x=df['original_drop_percentage'], y=df['recovery_percentage'],
+            scatter(x=df['original_drop_percentage'], y=df['recovery_percentage'],
                       mode='markers', text=df['ticker'],
                       marker=dict(size=10, color='purple'),
                       name='Drop vs Recovery'),
@@ -123,7 +331,7 @@ class ETFAnalyzer:
         )
         
         fig.add_trace(
-            go.Scatter(x=df['market_cap']/1e9, y=df['recovery_percentage'],
+            scatter(x=df['market_cap']/1e9, y=df['recovery_percentage'],
                       mode='markers', text=df['ticker'],
                       marker=dict(size=10, color='orange'),
                       name='Market Cap vs Recovery'),
@@ -146,12 +354,7 @@ class ETFAnalyzer:
         
         return fig
     
-    def generate_report(self) -> str:
-        df = pd.DataFrame(self.analysis_results)
-        
-        if df.empty:
-            return "No ETFs found matching the criteria."
-        
+    def _report_header(self, df: pd.DataFrame) -> List[str]:
         report = []
         report.append("=" * 80)
         report.append("ETF RECOVERY ANALYSIS REPORT")
@@ -173,29 +376,104 @@ class ETFAnalyzer:
         report.append("")
         
         report.append("TOP PERFORMERS (by average recovery percentage):")
-        top_performers = df.groupby('ticker').agg({
+        top_performers = df.groupby('ticker', observed=True).agg({
             'recovery_percentage': 'mean',
             'days_to_recover': 'mean',
             'market_cap': 'first'
         }).sort_values('recovery_percentage', ascending=False).head(5)
         
         for ticker, row in top_performers.iterrows():
+            market_cap = f"${row['market_cap']/1e9:.1f}B" if pd.notna(row['market_cap']) else "n/a"
             report.append(f"  {ticker}: {row['recovery_percentage']:.2f}% recovery "
                          f"in {row['days_to_recover']:.0f} days "
-                         f"(Market Cap: ${row['market_cap']/1e9:.1f}B)")
+                         f"(Market Cap: {market_cap})")
         
         report.append("")
         report.append("DETAILED RECOVERY EVENTS:")
         report.append("-" * 80)
+        return report
+    
+    @staticmethod
+    def _format_events(df: pd.DataFrame) -> pd.Series:
+        # Whole-column formatting: one text block per event, no per-row Python loop
+        def dates(col):
+            return pd.Series(pd.to_datetime(df[col]).values.astype('datetime64[D]').astype(str),
+                             index=df.index)
+        
+        def fixed(col):
+            return df[col].map('{:.2f}'.format)
         
-        for _, row in df.sort_values('recovery_percentage', ascending=False).iterrows():
-            report.append(f"\n{row['ticker']}:")
-            report.append(f"  Drop Date: {row['drop_date'].strftime('%Y-%m-%d')}")
-            report.append(f"  Recovery Date: {row['recovery_date'].strftime('%Y-%m-%d')}")
-            report.append(f"  Original Drop: {row['original_drop_percentage']:.2f}%")
-            report.append(f"  Recovery: {row['recovery_percentage']:.2f}%")
-            report.append(f"  Days to Recover: {row['days_to_recover']} days")
-            report.append(f"  Bottom Price: ${row['bottom_price']:.2f}")
-            report.append(f"  Recovery Price: ${row['recovery_price']:.2f}")
-        
-        return "\n".join(report)
\ No newline at end of file
+        return ("\n" + df['ticker'].astype(str) + ":"
+                + "\n  Drop Date: " + dates('drop_date')
+                + "\n  Recovery Date: " + dates('recovery_date')
+                + "\n  Original Drop: " + fixed('original_drop_percentage') + "%"
+                + "\n  Recovery: " + fixed('recovery_percentage') + "%"
+                + "\n  Days to Recover: " + df['days_to_recover'].astype(str) + " days"
+                + "\n  Bottom Price: $" + fixed('bottom_price')
+                + "\n  Recovery Price: $" + fixed('recovery_price'))
+    
+    def iter_report(self, chunk_size: int = 10000) -> Iterator[str]:
+        df = self.results
+        
+        if df.empty:
+            yield "No ETFs found matching the criteria."
+            return
+        
+        yield "\n".join(self._report_header(df))
+        ordered = df.sort_values('recovery_percentage', ascending=False)
+        for start in range(0, len(ordered), chunk_size):
+            yield "\n" + "\n".join(self._format_events(ordered.iloc[start:start + chunk_size]))
+    
+    @timed('report')
+    def generate_report(self) -> str:
+        return "".join(self.iter_report())
+    
+    @timed('report.write')
+    def write_report(self, target: Union[str, IO], fmt: str = "text", chunk_size: int = 10000):
+        """Write the report (``text``) or the events table (``csv``/``parquet``)
+        to a path or open file, ``chunk_size`` events at a time."""
+        if fmt not in ("text", "csv", "parquet"):
+            raise ValueError(f"Unsupported report format: {fmt}")
+        
+        if fmt == "text":
+            f = open(target, "w", newline="") if isinstance(target, str) else target
+            try:
+                for piece in self.iter_report(chunk_size):
+                    f.write(piece)
+            finally:
+                if isinstance(target, str):
+                    f.close()
+        else:
+            write_frame(self.results, target, fmt, chunk_size)
+
+
+def write_frame(frame: pd.DataFrame, target: Union[str, IO], fmt: str = "csv",
+                chunk_size: int = 10000):
+    """Write ``frame`` as ``csv`` or ``parquet`` to a path or open file,
+    ``chunk_size`` rows at a time."""
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        writer = None
+        try:
+            for start in range(0, max(len(frame), 1), chunk_size):
+                table = pa.Table.from_pandas(frame.iloc[start:start + chunk_size], preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(target, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+    
+    if fmt != "csv":
+        raise ValueError(f"Unsupported format: {fmt}")
+    
+    f = open(target, "w", newline="") if isinstance(target, str) else target
+    try:
+        for start in range(0, max(len(frame), 1), chunk_size):
+            frame.iloc[start:start + chunk_size].to_csv(f, header=start == 0, index=False)
+    finally:
+        if isinstance(target, str):
+            f.close()
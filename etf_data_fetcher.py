@@ -1,8 +1,112 @@
-import yfinance as yf
+import heapq
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Optional, Union
 import numpy as np
+from drop_detection import DEFAULT_HORIZONS, detect_drops
+from events import DropEvents, RecoveryEvents
+from instrumentation import metrics
+from metadata_cache import MetadataCache
+from recovery import find_recovery_events
+from price_store import DataSource, PriceStore, YahooDataSource, as_naive_utc
+
+
+def run_batch(fn: Callable, items: Iterable[str], max_workers: int = 8,
+              timeout: Optional[float] = 30.0, retries: int = 3,
+              backoff: float = 0.5) -> Dict[str, object]:
+    """Call ``fn(item)`` for every item on a bounded thread pool.
+
+    Each attempt gets ``timeout`` seconds from when it starts running;
+    failed or timed-out attempts are retried up to ``retries`` times in
+    total with exponential backoff. A timed-out call cannot be interrupted,
+    so its thread keeps counting against ``max_workers`` until it returns.
+    While every worker is stuck that way, each further ``timeout`` counts as
+    a failed attempt for the items still waiting.
+    Results keep the order of ``items``; items that never succeed are left out.
+    """
+    results = {}
+    order = list(dict.fromkeys(items))
+    waiting = [(0.0, item, 0) for item in order]
+    running = {}
+    abandoned = set()
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def attempt(item, started):
+        started.append(time.monotonic())
+        return fn(item)
+
+    def deadline_of(started):
+        if timeout is None:
+            return float('inf')
+        # Not picked up by a thread yet: check back within one timeout
+        return started[0] + timeout if started else time.monotonic() + timeout
+
+    try:
+        while waiting or running:
+            now = time.monotonic()
+            abandoned = {future for future in abandoned if not future.done()}
+            waiting.sort(key=lambda entry: entry[0])
+            while waiting and waiting[0][0] <= now and len(running) + len(abandoned) < max_workers:
+                _, item, attempt_no = waiting.pop(0)
+                started = []
+                running[pool.submit(attempt, item, started)] = (item, attempt_no, started)
+
+            if waiting and not running and len(abandoned) >= max_workers:
+                # Every thread is stuck in a timed-out call. Each further timeout without
+                # one returning costs the waiting items an attempt, so the batch cannot hang
+                done, _ = wait(list(abandoned), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    stalled, waiting = waiting, []
+                    for _, item, attempt_no in stalled:
+                        if attempt_no + 1 < retries:
+                            waiting.append((time.monotonic(), item, attempt_no + 1))
+                        else:
+                            metrics.count('batch.failures')
+                            print(f"Error fetching {item} after {attempt_no + 1} attempts: "
+                                  f"all {max_workers} workers are stuck in timed-out calls")
+                continue
+
+            wake_times = [deadline_of(started) for _, _, started in running.values()]
+            if waiting and len(running) + len(abandoned) < max_workers:
+                wake_times.append(waiting[0][0])
+            wake_at = min(wake_times, default=float('inf'))
+            wait_for = max(wake_at - now, 0) if wake_at != float('inf') else None
+            if running or abandoned:
+                # A returning abandoned call frees a slot, so wake for those too
+                wait(list(running) + list(abandoned), timeout=wait_for, return_when=FIRST_COMPLETED)
+            elif wait_for:
+                time.sleep(wait_for)
+
+            now = time.monotonic()
+            for future, (item, attempt_no, started) in list(running.items()):
+                if future.done():
+                    error = future.exception()
+                    if error is None:
+                        results[item] = future.result()
+                        del running[future]
+                        continue
+                elif started and now >= deadline_of(started):
+                    # The worker thread cannot be interrupted; abandon its result
+                    error = TimeoutError(f"timed out after {timeout}s")
+                    metrics.count('batch.timeouts')
+                    abandoned.add(future)
+                else:
+                    continue
+
+                del running[future]
+                if attempt_no + 1 < retries:
+                    metrics.count('batch.retries')
+                    waiting.append((now + backoff * 2 ** attempt_no, item, attempt_no + 1))
+                else:
+                    metrics.count('batch.failures')
+                    print(f"Error fetching {item} after {attempt_no + 1} attempts: {error}")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    # Completion order is arbitrary; hand results back in request order
+    return {item: results[item] for item in order if item in results}
+
 
 class ETFDataFetcher:
     TOP_ETFS = [
@@ -12,92 +116,162 @@ class ETFDataFetcher:
         'VTV', 'VO', 'VB', 'VNQ', 'VXUS'
     ]
     
-    def __init__(self):
+    def __init__(self, data_source: Optional[DataSource] = None,
+                 store: Optional[PriceStore] = None,
+                 metadata: Optional[MetadataCache] = None, max_workers: int = 8,
+                 timeout: Optional[float] = 30.0, retries: int = 3, backoff: float = 0.5):
         self.etf_data = {}
+        self.data_source = data_source or YahooDataSource()
+        self.store = store or PriceStore(self.data_source)
+        self.metadata = metadata or MetadataCache(self.data_source)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        
+    def _load_history(self, ticker: str, period: str) -> pd.DataFrame:
+        hist = self.store.get_history(ticker, period).copy()
+        
+        if not hist.empty:
+            hist['Ticker'] = ticker
+        return hist
         
     def fetch_etf_data(self, ticker: str, period: str = "1y") -> pd.DataFrame:
         try:
-            etf = yf.Ticker(ticker)
-            hist = etf.history(period=period)
-            info = etf.info
-            
+            hist = self._load_history(ticker, period)
             if not hist.empty:
-                hist['Ticker'] = ticker
-                hist['MarketCap'] = info.get('totalAssets', 0)
                 return hist
         except Exception as e:
+            metrics.count('errors.fetch')
             print(f"Error fetching data for {ticker}: {e}")
         return pd.DataFrame()
     
-    def get_top_etfs_by_market_cap(self, n: int = 10) -> List[Tuple[str, float]]:
+    def _batch(self, fn: Callable, tickers: Iterable[str], max_workers: Optional[int],
+               timeout: Optional[float]) -> Dict[str, object]:
+        return run_batch(fn, tickers, max_workers=max_workers or self.max_workers,
+                         timeout=timeout if timeout is not None else self.timeout,
+                         retries=self.retries, backoff=self.backoff)
+    
+    def fetch_many(self, tickers: Iterable[str], period: str = "1y",
+                   max_workers: Optional[int] = None,
+                   timeout: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+        histories = self._batch(lambda t: self._load_history(t, period), tickers,
+                                max_workers, timeout)
+        return {t: hist for t, hist in histories.items() if not hist.empty}
+    
+    def refresh_many(self, tickers: Iterable[str], period: str = "1y", force: bool = False,
+                     max_workers: Optional[int] = None,
+                     timeout: Optional[float] = None) -> Dict[str, pd.DataFrame]:
+        """``store.refresh`` for every ticker on the fetcher's thread pool;
+        ``force`` downloads new bars even when the store looks up to date."""
+        return self._batch(lambda t: self.store.refresh(t, period, force=force), tickers,
+                           max_workers, timeout)
+    
+    def get_info(self, ticker: str, fields: Optional[Iterable[str]] = None) -> Dict:
+        return self.metadata.get(ticker, fields)
+    
+    def get_market_cap(self, ticker: str) -> float:
+        return self.get_info(ticker, ['totalAssets']).get('totalAssets', 0)
+    
+    def fetch_info_many(self, tickers: Iterable[str], fields: Optional[Iterable[str]] = None,
+                        max_workers: Optional[int] = None,
+                        timeout: Optional[float] = None) -> Dict[str, Dict]:
+        fields = list(fields) if fields is not None else None
+        return self._batch(lambda t: self.get_info(t, fields), tickers, max_workers, timeout)
+    
+    def get_top_etfs_by_market_cap(self, n: int = 10,
+                                   universe: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Current top ``n`` of ``universe`` (default ``TOP_ETFS``) by total
+        assets; see ``aum.AUMSnapshots`` for point-in-time rankings."""
         market_caps = []
         
-        for ticker in self.TOP_ETFS:
-            try:
-                etf = yf.Ticker(ticker)
-                info = etf.info
-                market_cap = info.get('totalAssets', 0)
-                if market_cap > 0:
-                    market_caps.append((ticker, market_cap))
-            except Exception as e:
-                print(f"Error getting market cap for {ticker}: {e}")
-                
-        market_caps.sort(key=lambda x: x[1], reverse=True)
-        return market_caps[:n]
-    
-    def find_price_drops(self, ticker: str, threshold: float = -0.05) -> List[Dict]:
-        drops = []
+        infos = self.fetch_info_many(self.TOP_ETFS if universe is None else universe, ['totalAssets'])
+        for ticker, info in infos.items():
+            market_cap = info.get('totalAssets', 0)
+            if market_cap > 0:
+                market_caps.append((ticker, market_cap))
         
+        # A heap keeps this O(len(universe) log n) for large universes
+        return heapq.nlargest(n, market_caps, key=lambda x: x[1])
+    
+    def _closes(self, ticker: str, period: str) -> Tuple[np.ndarray, np.ndarray]:
+        data = self.fetch_etf_data(ticker, period=period)
+        if data.empty:
+            return np.array([], dtype='datetime64[ns]'), np.array([])
+        data = data.reset_index()
+        return pd.to_datetime(data['Date']).values, data['Close'].to_numpy(dtype=float)
+    
+    def drop_events(self, ticker: str, threshold: float = -0.05, period: str = "1y",
+                    horizons: Sequence[int] = DEFAULT_HORIZONS) -> DropEvents:
         try:
-            data = self.fetch_etf_data(ticker, period="1y")
-            if data.empty:
-                return drops
-                
-            data = data.reset_index()
-            prices = data['Close'].values
-            dates = pd.to_datetime(data['Date']).values
-            
-            # Find daily drops (5%+ in a single day)
-            for i in range(1, len(prices)):
-                daily_change = (prices[i] - prices[i-1]) / prices[i-1]
-                
-                if daily_change <= threshold:
-                    drops.append({
-                        'ticker': ticker,
-                        'type': 'Daily',
-                        'drop_date': pd.Timestamp(dates[i]),
-                        'previous_close': prices[i-1],
-                        'current_close': prices[i],
-                        'drop_percentage': daily_change * 100,
-                        'day_of_week': pd.Timestamp(dates[i]).strftime('%A')
-                    })
-            
-            # Find weekly drops (5%+ in a week)
-            for i in range(5, len(prices)):
-                weekly_change = (prices[i] - prices[i-5]) / prices[i-5]
-                
-                if weekly_change <= threshold:
-                    # Check if this isn't already captured as daily drops
-                    is_daily_drop = False
-                    for j in range(i-4, i+1):
-                        if j > 0 and (prices[j] - prices[j-1]) / prices[j-1] <= threshold:
-                            is_daily_drop = True
-                            break
-                    
-                    if not is_daily_drop:
-                        drops.append({
-                            'ticker': ticker,
-                            'type': 'Weekly',
-                            'drop_start_date': pd.Timestamp(dates[i-5]),
-                            'drop_end_date': pd.Timestamp(dates[i]),
-                            'start_price': prices[i-5],
-                            'end_price': prices[i],
-                            'drop_percentage': weekly_change * 100
-                        })
-            
+            dates, prices = self._closes(ticker, period)
+            with metrics.timer('detect', ticker):
+                return DropEvents.from_detection([ticker], dates, prices,
+                                                 detect_drops(prices, threshold, horizons))
         except Exception as e:
+            metrics.count('errors.detect')
             print(f"Error finding drops for {ticker}: {e}")
-            
+        return DropEvents.empty([ticker])
+    
+    def recovery_events(self, ticker: str, drops: Union[DropEvents, List[Dict]],
+                        drop_threshold: float = -0.10, recovery_threshold: float = 0.15,
+                        min_days: int = 182, max_days: int = 365,
+                        period: str = "2y") -> RecoveryEvents:
+        try:
+            dates, prices = self._closes(ticker, period)
+            if len(dates) and len(drops):
+                # Anchor the search on the drawdown episodes that contain a detected drop
+                if isinstance(drops, DropEvents):
+                    drop_dates = drops.dates('end_date')
+                else:
+                    drop_dates = as_naive_utc([d.get('drop_date', d.get('drop_end_date')) for d in drops])
+                anchors = np.searchsorted(dates, drop_dates)
+                # Drops outside the loaded window (or on a missing bar) anchor nothing
+                found = anchors < len(dates)
+                found[found] = dates[anchors[found]] == drop_dates[found]
+                anchors = anchors[found]
+                
+                with metrics.timer('recover', ticker):
+                    events = find_recovery_events(dates, prices, drop_threshold, recovery_threshold,
+                                                  min_days, max_days, anchors=anchors)
+                    return RecoveryEvents.from_engine([ticker], dates, prices, events)
+        except Exception as e:
+            metrics.count('errors.recover')
+            print(f"Error finding recoveries for {ticker}: {e}")
+        return RecoveryEvents.empty([ticker])
+    
+    def find_price_drops(self, ticker: str, threshold: float = -0.05, period: str = "1y",
+                         horizons: Sequence[int] = DEFAULT_HORIZONS) -> List[Dict]:
+        """Per-event dicts in the original layout; ``drop_events`` is the compact form."""
+        drops = []
+        for event in self.drop_events(ticker, threshold, period, horizons):
+            if event.horizon == 1:
+                # Daily drops (5%+ in a single day)
+                drops.append({
+                    'ticker': ticker,
+                    'type': 'Daily',
+                    'drop_date': event.end_date,
+                    'previous_close': event.start_price,
+                    'current_close': event.end_price,
+                    'drop_percentage': event.drop_percentage,
+                    'day_of_week': event.end_date.day_name()
+                })
+            else:
+                # Multi-day drops not already captured as daily drops
+                drops.append({
+                    'ticker': ticker,
+                    'type': event.type,
+                    'drop_start_date': event.start_date,
+                    'drop_end_date': event.end_date,
+                    'start_price': event.start_price,
+                    'end_price': event.end_price,
+                    'drop_percentage': event.drop_percentage
+                })
         return drops
     
-    # Recovery analysis removed - focusing on drop detection only
\ No newline at end of file
+    def find_recoveries(self, ticker: str, drops: Union[DropEvents, List[Dict]],
+                        drop_threshold: float = -0.10, recovery_threshold: float = 0.15,
+                        min_days: int = 182, max_days: int = 365, period: str = "2y") -> List[Dict]:
+        """Per-event dicts; ``recovery_events`` is the compact form."""
+        return self.recovery_events(ticker, drops, drop_threshold, recovery_threshold,
+                                    min_days, max_days, period).to_dicts()
@@ -0,0 +1,239 @@
+from typing import Dict, Iterator, List, Sequence
+import numpy as np
+import pandas as pd
+from drop_detection import HORIZON_NAMES
+
+
+def _code_dtype(n_categories: int) -> np.dtype:
+    # The smallest code type pandas would pick, so Categorical.from_codes never recasts
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def horizon_name(k: int) -> str:
+    return HORIZON_NAMES.get(k, f'{k}-Day')
+
+
+class EventRecord:
+    """Read-only view of one row of an ``EventTable``."""
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: 'EventTable', row: int):
+        self._table = table
+        self._row = row
+
+    def __getattr__(self, name: str):
+        # Private and dunder lookups (copy, pickle) happen before the slots are set
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._table.value(name, self._row)
+
+    def as_dict(self) -> Dict:
+        return {name: self._table.value(name, self._row) for name in self._table.names()}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items())
+        return f"{type(self._table).__name__[:-1]}({fields})"
+
+
+class EventTable:
+    """Struct-of-arrays event store.
+
+    Every field is one NumPy column. Dates are int64 nanoseconds since the
+    epoch (naive UTC) and tickers are categorical codes into ``tickers``, so
+    an event costs a few dozen bytes. ``to_frame`` and ``to_arrow`` wrap the
+    columns without copying them.
+    """
+
+    FIELDS: Dict[str, str] = {}
+    DATE_FIELDS: Sequence[str] = ()
+
+    def __init__(self, tickers: Sequence[str], ticker_codes: np.ndarray, **columns: np.ndarray):
+        self.tickers = list(tickers)
+        self.ticker_codes = np.asarray(ticker_codes, dtype=_code_dtype(len(self.tickers)))
+        self.columns = {}
+        for name, dtype in self.FIELDS.items():
+            values = np.asarray(columns[name])
+            if name in self.DATE_FIELDS and values.dtype.kind == 'M':
+                values = values.astype('datetime64[ns]').view(np.int64)
+            self.columns[name] = np.asarray(values, dtype=dtype)
+
+    @classmethod
+    def empty(cls, tickers: Sequence[str] = ()) -> 'EventTable':
+        return cls(tickers, np.array([], dtype=np.int64),
+                   **{name: np.array([], dtype=dtype) for name, dtype in cls.FIELDS.items()})
+
+    @classmethod
+    def concat(cls, tables: Sequence['EventTable']) -> 'EventTable':
+        """Stack tables, merging their ticker categories."""
+        tables = list(tables)
+        if not tables:
+            return cls.empty()
+        tickers = list(dict.fromkeys(t for table in tables for t in table.tickers))
+        position = {t: i for i, t in enumerate(tickers)}
+        codes = [np.array([position[t] for t in table.tickers], dtype=np.int64)[table.ticker_codes]
+                 if table.tickers else table.ticker_codes for table in tables]
+        return cls(tickers, np.concatenate(codes),
+                   **{name: np.concatenate([table.columns[name] for table in tables])
+                      for name in cls.FIELDS})
+
+    def __len__(self) -> int:
+        return len(self.ticker_codes)
+
+    def __getitem__(self, row: int) -> EventRecord:
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return EventRecord(self, row % len(self))
+
+    def __iter__(self) -> Iterator[EventRecord]:
+        return (EventRecord(self, row) for row in range(len(self)))
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        try:
+            return self.__dict__['columns'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def names(self) -> List[str]:
+        return ['ticker'] + list(self.FIELDS)
+
+    def value(self, name: str, row: int):
+        if name == 'ticker':
+            return self.tickers[self.ticker_codes[row]]
+        if name in self.DATE_FIELDS:
+            return pd.Timestamp(int(self.columns[name][row]))
+        if name not in self.columns:
+            raise AttributeError(name)
+        return self.columns[name][row].item()
+
+    def dates(self, name: str) -> np.ndarray:
+        return self.columns[name].view('datetime64[ns]')
+
+    def for_ticker(self, ticker: str) -> 'EventTable':
+        if ticker not in self.tickers:
+            return self.empty([ticker])
+        keep = self.ticker_codes == self.tickers.index(ticker)
+        return type(self)(self.tickers, self.ticker_codes[keep],
+                          **{name: values[keep] for name, values in self.columns.items()})
+
+    @property
+    def nbytes(self) -> int:
+        return self.ticker_codes.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    def _frame_columns(self) -> Dict[str, object]:
+        columns = {'ticker': pd.Categorical.from_codes(self.ticker_codes, self.tickers)}
+        for name in self.FIELDS:
+            columns[name] = self.dates(name) if name in self.DATE_FIELDS else self.columns[name]
+        return columns
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self._frame_columns(), copy=False)
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        arrays = {'ticker': pa.DictionaryArray.from_arrays(pa.array(self.ticker_codes),
+                                                           pa.array(self.tickers, pa.string()))}
+        for name, values in self.columns.items():
+            if name in self.DATE_FIELDS:
+                arrays[name] = pa.Array.from_buffers(pa.timestamp('ns'), len(values),
+                                                     [None, pa.py_buffer(values)])
+            else:
+                arrays[name] = pa.array(values)
+        return pa.table(arrays)
+
+    def to_dicts(self) -> List[Dict]:
+        return [record.as_dict() for record in self]
+
+
+class DropEvents(EventTable):
+    """k-bar drops: the close fell by ``drop_percentage`` from ``start_date`` to ``end_date``."""
+
+    FIELDS = {
+        'horizon': 'int16',
+        'start_date': 'int64',
+        'end_date': 'int64',
+        'start_price': 'float64',
+        'end_price': 'float64',
+        'drop_percentage': 'float64',
+    }
+    DATE_FIELDS = ('start_date', 'end_date')
+
+    @classmethod
+    def from_detection(cls, tickers: Sequence[str], dates: np.ndarray, prices: np.ndarray,
+                       events: Dict[int, tuple]) -> 'DropEvents':
+        """Build from ``detect_drops_panel`` output (or ``detect_drops`` output for
+        a single ticker, whose values have no column array)."""
+        prices = np.asarray(prices, dtype=float)
+        if prices.ndim == 1:
+            prices = prices[:, None]
+        parts = []
+        for k, event in events.items():
+            rows, cols, returns = event if len(event) == 3 else (event[0], np.zeros_like(event[0]), event[1])
+            parts.append(cls(tickers, cols, horizon=np.full(len(rows), k),
+                             start_date=dates[rows - k], end_date=dates[rows],
+                             start_price=prices[rows - k, cols], end_price=prices[rows, cols],
+                             drop_percentage=returns * 100))
+        return cls.concat(parts) if parts else cls.empty(tickers)
+
+    @property
+    def type(self) -> np.ndarray:
+        return np.array([horizon_name(k) for k in self.columns['horizon']], dtype=object)
+
+    def value(self, name: str, row: int):
+        if name == 'type':
+            return horizon_name(int(self.columns['horizon'][row]))
+        return super().value(name, row)
+
+    def names(self) -> List[str]:
+        return ['ticker', 'type'] + list(self.FIELDS)
+
+    def _frame_columns(self) -> Dict[str, object]:
+        columns = super()._frame_columns()
+        horizons, codes = np.unique(self.columns['horizon'], return_inverse=True)
+        columns = dict(ticker=columns.pop('ticker'),
+                       type=pd.Categorical.from_codes(codes, [horizon_name(k) for k in horizons]),
+                       **columns)
+        return columns
+
+
+class RecoveryEvents(EventTable):
+    """Drawdown troughs followed by a qualifying rebound."""
+
+    FIELDS = {
+        'peak_date': 'int64',
+        'drop_date': 'int64',
+        'recovery_date': 'int64',
+        'peak_price': 'float64',
+        'bottom_price': 'float64',
+        'recovery_price': 'float64',
+        'original_drop_percentage': 'float64',
+        'recovery_percentage': 'float64',
+        'days_to_recover': 'int64',
+    }
+    DATE_FIELDS = ('peak_date', 'drop_date', 'recovery_date')
+
+    @classmethod
+    def from_engine(cls, tickers: Sequence[str], dates: np.ndarray, prices: np.ndarray,
+                    events: Dict[str, np.ndarray]) -> 'RecoveryEvents':
+        """Build from ``find_recovery_events`` output."""
+        prices = np.asarray(prices, dtype=float)
+        if prices.ndim == 1:
+            prices = prices[:, None]
+        col = events['column']
+        return cls(tickers, col,
+                   peak_date=dates[events['peak_idx']],
+                   drop_date=dates[events['trough_idx']],
+                   recovery_date=dates[events['recovery_idx']],
+                   peak_price=prices[events['peak_idx'], col],
+                   bottom_price=prices[events['trough_idx'], col],
+                   recovery_price=prices[events['recovery_idx'], col],
+                   original_drop_percentage=events['drawdown'] * 100,
+                   recovery_percentage=events['recovery_return'] * 100,
+                   days_to_recover=events['recovery_idx'] - events['trough_idx'])
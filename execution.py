@@ -0,0 +1,170 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from drop_detection import DEFAULT_HORIZONS, detect_drops
+from events import DropEvents, RecoveryEvents
+from instrumentation import metrics
+from price_archive import PriceArchive
+from recovery import find_recovery_events
+
+EXECUTORS = ('serial', 'threads', 'processes')
+
+# ticker -> (datetime64[ns] dates, float64 closes)
+Series = Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+def analyze_series(ticker: str, dates: np.ndarray, prices: np.ndarray, threshold: float = -0.05,
+                   horizons: Sequence[int] = DEFAULT_HORIZONS, drop_threshold: float = -0.10,
+                   recovery_threshold: float = 0.15, min_days: int = 182,
+                   max_days: int = 365) -> Tuple[DropEvents, RecoveryEvents]:
+    """Drops and drop-anchored recoveries for one ticker, as ``ETFDataFetcher``
+    computes them from ``drop_events`` and ``recovery_events``."""
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    prices = np.asarray(prices, dtype=float)
+    with metrics.timer('detect', ticker):
+        found = detect_drops(prices, threshold, horizons)
+        drops = DropEvents.from_detection([ticker], dates, prices, found)
+    if not drops:
+        return drops, RecoveryEvents.empty([ticker])
+    with metrics.timer('recover', ticker):
+        anchors = np.concatenate([idx for idx, _ in found.values()])
+        events = find_recovery_events(dates, prices, drop_threshold, recovery_threshold,
+                                      min_days, max_days, anchors=anchors)
+        return drops, RecoveryEvents.from_engine([ticker], dates, prices, events)
+
+
+def _analyze_each(series: Iterable[Tuple[str, np.ndarray, np.ndarray]],
+                  params: Dict) -> Tuple[DropEvents, RecoveryEvents]:
+    """``analyze_series`` over (ticker, dates, closes) triples, concatenated."""
+    drops, recoveries = [], []
+    for ticker, dates, prices in series:
+        d, r = analyze_series(ticker, dates, prices, **params)
+        drops.append(d)
+        recoveries.append(r)
+    return DropEvents.concat(drops), RecoveryEvents.concat(recoveries)
+
+
+def _concat(results: List[Tuple[DropEvents, RecoveryEvents]]) -> Tuple[DropEvents, RecoveryEvents]:
+    return (DropEvents.concat([drops for drops, _ in results]),
+            RecoveryEvents.concat([recoveries for _, recoveries in results]))
+
+
+def _analyze_shard(tickers: Sequence[str], offsets: np.ndarray, dates: np.ndarray,
+                   prices: np.ndarray, params: Dict) -> Tuple[DropEvents, RecoveryEvents]:
+    return _analyze_each(((ticker, dates[lo:hi], prices[lo:hi])
+                          for ticker, lo, hi in zip(tickers, offsets[:-1], offsets[1:])), params)
+
+
+def _analyze_mapped(root: str, tickers: Sequence[str], offsets: np.ndarray,
+                    params: Dict) -> Tuple[DropEvents, RecoveryEvents]:
+    # Runs in a worker process: the arrays are paged in from the parent's files, not pickled
+    dates = np.load(os.path.join(root, 'dates.npy'), mmap_mode='r').view('datetime64[ns]')
+    prices = np.load(os.path.join(root, 'closes.npy'), mmap_mode='r')
+    return _analyze_shard(tickers, offsets, dates, prices, params)
+
+
+def _shards(sizes: np.ndarray, n_shards: int) -> List[Tuple[int, int]]:
+    """Split tickers into contiguous runs holding roughly equal numbers of bars."""
+    if not len(sizes):
+        return []
+    bounds = np.searchsorted(np.cumsum(sizes), np.linspace(0, sizes.sum(), n_shards + 1)[1:-1],
+                             side='right')
+    edges = np.unique(np.concatenate(([0], bounds, [len(sizes)])))
+    return list(zip(edges[:-1], edges[1:]))
+
+
+@contextmanager
+def _pool(executor: Union[str, Executor], workers: int) -> Iterator[Executor]:
+    """The ``Executor`` named by ``executor`` (or ``executor`` itself); pools
+    created here are shut down on exit, passed-in ones are left running."""
+    if isinstance(executor, Executor):
+        yield executor
+        return
+    if executor == 'threads':
+        pool = ThreadPoolExecutor(max_workers=workers)
+    elif executor == 'processes':
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        raise ValueError(f"Unknown executor: {executor}")
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+
+
+def analyze_universe(series: Series, executor: Union[str, Executor] = 'serial',
+                     workers: Optional[int] = None, **params) -> Tuple[DropEvents, RecoveryEvents]:
+    """``analyze_series`` for every ticker, sharded over ``executor``.
+
+    ``executor`` is ``'serial'``, ``'threads'``, ``'processes'`` or an
+    ``Executor`` instance. Process workers read prices from memory-mapped
+    files written once by the caller, so the OS shares the pages between
+    them instead of pickling a frame per ticker; each shard returns its
+    events as compact arrays.
+    """
+    tickers = list(series)
+    sizes = np.array([len(series[t][1]) for t in tickers], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    dates = np.concatenate([np.asarray(series[t][0], dtype='datetime64[ns]') for t in tickers]
+                           or [np.array([], dtype='datetime64[ns]')])
+    prices = np.concatenate([np.asarray(series[t][1], dtype=float) for t in tickers]
+                            or [np.array([])])
+
+    if executor == 'serial' or not tickers:
+        return _analyze_shard(tickers, offsets, dates, prices, params)
+
+    workers = workers or os.cpu_count() or 1
+    # A few shards per worker so one slow shard doesn't idle the rest
+    shards = _shards(sizes, workers * 4)
+    # The pool shuts down before the shard files are removed
+    with tempfile.TemporaryDirectory(prefix='etf-shards-') as root, _pool(executor, workers) as pool:
+        use_files = isinstance(pool, ProcessPoolExecutor)
+        if use_files:
+            np.save(os.path.join(root, 'dates.npy'), dates.view(np.int64))
+            np.save(os.path.join(root, 'closes.npy'), prices)
+        futures = []
+        for lo, hi in shards:
+            shard_offsets = offsets[lo:hi + 1]
+            if use_files:
+                futures.append(pool.submit(_analyze_mapped, root, tickers[lo:hi],
+                                           shard_offsets, params))
+            else:
+                futures.append(pool.submit(_analyze_shard, tickers[lo:hi], shard_offsets,
+                                           dates, prices, params))
+        return _concat([future.result() for future in futures])
+
+
+def _analyze_archived(archive: Union[str, PriceArchive], tickers: Sequence[str],
+                      start: Optional[datetime], params: Dict) -> Tuple[DropEvents, RecoveryEvents]:
+    if isinstance(archive, str):
+        # Worker processes open the archive themselves; only its path is pickled
+        archive = PriceArchive(archive)
+    return _analyze_each(((ticker, *archive.series(ticker, start=start)) for ticker in tickers), params)
+
+
+def analyze_archive(archive: PriceArchive, tickers: Optional[Sequence[str]] = None,
+                    executor: Union[str, Executor] = 'serial', workers: Optional[int] = None,
+                    start: Optional[datetime] = None, **params) -> Tuple[DropEvents, RecoveryEvents]:
+    """``analyze_universe`` over tickers of a ``PriceArchive``; workers map the
+    archive's own files, so nothing is copied up front."""
+    tickers = list(tickers) if tickers is not None else archive.tickers
+    if executor == 'serial' or not tickers:
+        return _analyze_archived(archive, tickers, start, params)
+
+    workers = workers or os.cpu_count() or 1
+    sizes = np.array([hi - lo for lo, hi in map(archive.listing, tickers)], dtype=np.int64)
+    with _pool(executor, workers) as pool:
+        source = archive.root if isinstance(pool, ProcessPoolExecutor) else archive
+        futures = [pool.submit(_analyze_archived, source, tickers[lo:hi], start, params)
+                   for lo, hi in _shards(sizes, workers * 4)]
+        return _concat([future.result() for future in futures])
+
+
+def history_series(histories: Dict[str, pd.DataFrame]) -> Series:
+    return {ticker: (pd.to_datetime(hist.index).values, hist['Close'].to_numpy(dtype=float))
+            for ticker, hist in histories.items() if not hist.empty}
@@ -0,0 +1,144 @@
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+
+
+class Metrics:
+    """Thread-safe stage timers, counters and byte totals.
+
+    Stages are timed overall and, when a ticker is given, per ticker.
+    Work done in worker processes is recorded in those processes and is not
+    merged back. Only the last ``MAX_PROFILES`` profiler reports are kept.
+    """
+
+    MAX_PROFILES = 20
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # stage -> [calls, total seconds, max seconds]
+            self.stages: Dict[str, List[float]] = {}
+            # (stage, ticker) -> [calls, total seconds]
+            self.tickers: Dict[Tuple[str, str], List[float]] = {}
+            self.counters: Dict[str, int] = {}
+            self.bytes: Dict[str, int] = {}
+            self.profiles: Deque[Tuple[str, str]] = deque(maxlen=self.MAX_PROFILES)
+
+    def record(self, stage: str, seconds: float, ticker: Optional[str] = None):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            if ticker is not None:
+                per_ticker = self.tickers.setdefault((stage, ticker), [0, 0.0])
+                per_ticker[0] += 1
+                per_ticker[1] += seconds
+
+    @contextmanager
+    def timer(self, stage: str, ticker: Optional[str] = None) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, ticker)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_bytes(self, name: str, n: int):
+        with self._lock:
+            self.bytes[name] = self.bytes.get(name, 0) + int(n)
+
+    def stage_frame(self) -> pd.DataFrame:
+        with self._lock:
+            rows = [(stage, int(calls), total, total / calls, worst)
+                    for stage, (calls, total, worst) in self.stages.items()]
+        return pd.DataFrame(rows, columns=['stage', 'calls', 'total_s', 'mean_s', 'max_s']) \
+            .sort_values('total_s', ascending=False, ignore_index=True)
+
+    def ticker_frame(self) -> pd.DataFrame:
+        with self._lock:
+            rows = [(stage, ticker, int(calls), total)
+                    for (stage, ticker), (calls, total) in self.tickers.items()]
+        return pd.DataFrame(rows, columns=['stage', 'ticker', 'calls', 'total_s']) \
+            .sort_values('total_s', ascending=False, ignore_index=True)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'stages': {stage: {'calls': int(calls), 'total_s': total, 'max_s': worst}
+                           for stage, (calls, total, worst) in self.stages.items()},
+                'counters': dict(self.counters),
+                'bytes': dict(self.bytes),
+            }
+
+    def _add_profile(self, mode: str, report: str):
+        with self._lock:
+            self.profiles.append((mode, report))
+
+    @contextmanager
+    def profile(self, mode: Optional[str] = 'cprofile', top: int = 25) -> Iterator[None]:
+        """Profile the enclosed block with ``cprofile`` (calling thread only)
+        or ``tracemalloc``; the text report is added to ``profiles``.
+        ``mode=None`` turns the hook off."""
+        if mode is None:
+            yield
+            return
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+                self._add_profile(mode, out.getvalue())
+        elif mode == 'tracemalloc':
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            try:
+                yield
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if started:
+                    tracemalloc.stop()
+                lines = [f"Peak traced memory: {peak / 2 ** 20:.1f} MB"]
+                lines += [str(stat) for stat in snapshot.statistics('lineno')[:top]]
+                self._add_profile(mode, "\n".join(lines))
+        else:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+
+
+# Process-wide registry the fetcher, store, caches and analyzer report into
+metrics = Metrics()
+
+
+def timed(stage: str, ticker_arg: Optional[int] = None) -> Callable:
+    """Decorator timing every call as ``stage``; ``ticker_arg`` is the position
+    of the ticker among the positional arguments, for per-ticker timings."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            ticker = None
+            if ticker_arg is not None:
+                ticker = args[ticker_arg] if len(args) > ticker_arg else kwargs.get('ticker')
+            with metrics.timer(stage, ticker):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,126 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from instrumentation import metrics
+from price_store import DEFAULT_CACHE_DIR, DataSource
+
+# None means the field never goes stale once cached
+DEFAULT_FIELD_TTLS = {
+    'totalAssets': timedelta(days=1),
+    'navPrice': timedelta(days=1),
+    'longName': None,
+    'shortName': None,
+    'fundFamily': None,
+    'category': timedelta(days=30),
+}
+
+
+class MetadataCache:
+    """Ticker.info cache: in-memory LRU over per-ticker JSON files on disk.
+
+    Each field carries the time it was fetched and goes stale after its TTL
+    from ``field_ttls`` (``default_ttl`` otherwise). Concurrent misses for the
+    same ticker share a single upstream call.
+    """
+
+    def __init__(self, source: DataSource, root: Optional[str] = None,
+                 field_ttls: Optional[Dict[str, Optional[timedelta]]] = None,
+                 default_ttl: timedelta = timedelta(days=1), max_entries: int = 512):
+        self.source = source
+        self.root = root or os.path.join(DEFAULT_CACHE_DIR, 'metadata')
+        self.field_ttls = dict(DEFAULT_FIELD_TTLS, **(field_ttls or {}))
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._memory: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker}.json")
+
+    def _remember(self, ticker: str, entry: Dict):
+        with self._lock:
+            self._memory[ticker] = entry
+            self._memory.move_to_end(ticker)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, ticker: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(ticker)
+            if entry is not None:
+                self._memory.move_to_end(ticker)
+                return entry
+        try:
+            with open(self._path(ticker)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(ticker, entry)
+        return entry
+
+    def _is_fresh(self, entry: Dict, fields: Iterable[str], now: datetime) -> bool:
+        for field in fields:
+            if field not in entry:
+                return False
+            ttl = self.field_ttls.get(field, self.default_ttl)
+            if ttl is not None and now - datetime.fromisoformat(entry[field][1]) >= ttl:
+                return False
+        return True
+
+    def _fetch(self, ticker: str, fields: Iterable[str] = ()) -> Dict:
+        with self._lock:
+            future = self._inflight.get(ticker)
+            owner = future is None
+            if owner:
+                future = self._inflight[ticker] = Future()
+        if not owner:
+            metrics.count('metadata.shared')
+            return future.result()
+
+        try:
+            info = self.source.info(ticker) or {}
+            fetched_at = datetime.now().isoformat()
+            entry = {field: [value, fetched_at] for field, value in info.items()}
+            # Remember fields upstream doesn't have so they aren't refetched on every call
+            for field in fields:
+                entry.setdefault(field, [None, fetched_at])
+            with open(self._path(ticker), 'w') as f:
+                json.dump(entry, f, default=str)
+            self._remember(ticker, entry)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[ticker]
+
+    def get(self, ticker: str, fields: Optional[Iterable[str]] = None) -> Dict:
+        """Return ``fields`` (all cached fields if omitted) of ``ticker``'s info,
+        refreshing from upstream when any requested field is stale."""
+        entry = self._lookup(ticker)
+        fields = list(fields) if fields is not None else None
+        wanted = fields if fields is not None else list(entry or ())
+        if entry is None or not wanted or not self._is_fresh(entry, wanted, datetime.now()):
+            metrics.count('metadata.miss')
+            entry = self._fetch(ticker, wanted)
+        else:
+            metrics.count('metadata.hit')
+        keys = fields if fields is not None else entry.keys()
+        return {field: entry[field][0] for field in keys
+                if field in entry and entry[field][0] is not None}
+
+    def invalidate(self, ticker: str):
+        with self._lock:
+            self._memory.pop(ticker, None)
+        try:
+            os.remove(self._path(ticker))
+        except OSError:
+            pass
@@ -0,0 +1,58 @@
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from drop_detection import DEFAULT_HORIZONS, detect_drops_panel, windowed_returns
+from events import DropEvents, RecoveryEvents
+from recovery import find_recovery_events
+
+
+def align_closes(histories: Dict[str, pd.DataFrame], column: str = 'Close') -> pd.DataFrame:
+    """Align per-ticker histories into one date x ticker frame of closes."""
+    if not histories:
+        return pd.DataFrame()
+    closes = pd.concat({t: h[column] for t, h in histories.items()}, axis=1).sort_index()
+    return fill_listings(closes)
+
+
+def fill_listings(closes: pd.DataFrame) -> pd.DataFrame:
+    """Carry prices over exchange holidays inside each listing, but never
+    before a ticker's first bar or after its last one."""
+    return closes.ffill().where(closes.bfill().notna())
+
+
+def drop_events_table(closes: pd.DataFrame, events: Dict[int, tuple]) -> pd.DataFrame:
+    """Columnar table of ``detect_drops_panel`` output for ``closes``."""
+    return DropEvents.from_detection(list(closes.columns), closes.index.values,
+                                     closes.to_numpy(dtype=float), events).to_frame()
+
+
+def recovery_events_table(closes: pd.DataFrame, anchors: Optional[np.ndarray] = None,
+                          drop_threshold: float = -0.10, recovery_threshold: float = 0.15,
+                          min_days: int = 182, max_days: int = 365) -> pd.DataFrame:
+    """Recovery events for every column of ``closes``; ``anchors`` are flat
+    column-major bar positions (``column * len(closes) + row``)."""
+    dates = closes.index.values
+    prices = closes.to_numpy(dtype=float)
+    events = find_recovery_events(dates, prices, drop_threshold, recovery_threshold,
+                                  min_days, max_days, anchors=anchors)
+    return RecoveryEvents.from_engine(list(closes.columns), dates, prices, events).to_frame()
+
+
+def analyze_closes(closes: pd.DataFrame, threshold: float = -0.05,
+                   horizons: Sequence[int] = DEFAULT_HORIZONS, drop_threshold: float = -0.10,
+                   recovery_threshold: float = 0.15, min_days: int = 182,
+                   max_days: int = 365) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Drop and recovery events for a whole panel, anchored like ``find_recoveries``."""
+    events = detect_drops_panel(closes.to_numpy(dtype=float), threshold, horizons)
+    anchors = np.concatenate([cols * len(closes) + rows for rows, cols, _ in events.values()]
+                             or [np.array([], dtype=np.int64)])
+    drops = drop_events_table(closes, events)
+    recoveries = recovery_events_table(closes, anchors, drop_threshold, recovery_threshold,
+                                       min_days, max_days)
+    return drops, recoveries
+
+
+def same_day_drop_counts(closes: pd.DataFrame, threshold: float = -0.05) -> pd.Series:
+    """Number of tickers whose one-day return is at or below ``threshold`` on each date."""
+    hits = windowed_returns(closes.to_numpy(dtype=float), 1) <= threshold
+    return pd.Series(hits.sum(axis=1), index=closes.index, name='tickers_dropped')
@@ -0,0 +1,122 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from price_store import PriceStore, as_naive_utc
+
+
+class PriceArchive:
+    """Memory-mapped price history for a whole universe.
+
+    One ``.npy`` file per column (``Close.npy``, ``Volume.npy``, ...) holds a
+    tickers x dates matrix over a shared int64 date index, so each ticker's
+    series is contiguous on disk. Files are opened with ``mmap_mode='r'``:
+    nothing is parsed at startup and the OS pages in only the rows and
+    columns an analysis touches. Bars outside a ticker's listing are NaN.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._maps: Dict[str, np.ndarray] = {}
+        self.tickers: List[str] = [str(t) for t in self._load('tickers')]
+        self._rows = {t: i for i, t in enumerate(self.tickers)}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, f"{name}.npy")
+
+    def _load(self, name: str) -> np.ndarray:
+        if name not in self._maps:
+            self._maps[name] = np.load(self._path(name), mmap_mode='r')
+        return self._maps[name]
+
+    @classmethod
+    def write(cls, root: str, histories: Dict[str, pd.DataFrame], columns: Sequence[str] = ('Close',),
+              dtype: Union[str, np.dtype] = 'float64') -> 'PriceArchive':
+        """Build an archive from per-ticker OHLCV frames, one column at a time."""
+        os.makedirs(root, exist_ok=True)
+        histories = {t: h for t, h in histories.items() if not h.empty}
+        tickers = list(histories)
+        index = {t: pd.to_datetime(h.index).values.astype('datetime64[ns]') for t, h in histories.items()}
+        dates = np.unique(np.concatenate(list(index.values()) or [np.array([], dtype='datetime64[ns]')]))
+        rows = {t: np.searchsorted(dates, index[t]) for t in tickers}
+        bounds = np.array([[rows[t][0], rows[t][-1] + 1] for t in tickers], dtype=np.int64).reshape(-1, 2)
+
+        def save(name: str, values: np.ndarray):
+            # Replace whole files so open readers keep a consistent old copy
+            tmp = os.path.join(root, f".{name}.tmp.npy")
+            np.save(tmp, values)
+            os.replace(tmp, os.path.join(root, f"{name}.npy"))
+
+        for column in columns:
+            out = np.lib.format.open_memmap(os.path.join(root, f".{column}.tmp.npy"), mode='w+',
+                                            dtype=dtype, shape=(len(tickers), len(dates)))
+            for i, ticker in enumerate(tickers):
+                out[i] = np.nan
+                out[i, rows[ticker]] = histories[ticker][column].to_numpy(dtype=float)
+            out.flush()
+            del out
+            os.replace(os.path.join(root, f".{column}.tmp.npy"), os.path.join(root, f"{column}.npy"))
+        save('dates', dates.view(np.int64))
+        save('bounds', bounds)
+        save('tickers', np.array(tickers, dtype=str))
+        return cls(root)
+
+    @classmethod
+    def from_store(cls, root: str, store: PriceStore, tickers: Sequence[str], period: str = 'max',
+                   columns: Sequence[str] = ('Close',),
+                   dtype: Union[str, np.dtype] = 'float64') -> 'PriceArchive':
+        return cls.write(root, {t: store.get_history(t, period) for t in tickers}, columns, dtype)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._load('dates').view('datetime64[ns]')
+
+    @property
+    def columns(self) -> List[str]:
+        reserved = {'dates', 'bounds', 'tickers'}
+        return sorted(name[:-4] for name in os.listdir(self.root)
+                      if name.endswith('.npy') and not name.startswith('.') and name[:-4] not in reserved)
+
+    def column(self, name: str = 'Close') -> np.ndarray:
+        """The tickers x dates matrix for ``name``, memory-mapped."""
+        return self._load(name)
+
+    def listing(self, ticker: str) -> Tuple[int, int]:
+        lo, hi = self._load('bounds')[self._rows[ticker]]
+        return int(lo), int(hi)
+
+    def _start_row(self, start: Optional[datetime]) -> int:
+        if start is None:
+            return 0
+        return int(np.searchsorted(self.dates, as_naive_utc(start)))
+
+    def series(self, ticker: str, column: str = 'Close',
+               start: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """``ticker``'s own bars as (dates, values); views into the maps unless
+        the shared calendar has holes inside the listing."""
+        lo, hi = self.listing(ticker)
+        lo = max(lo, self._start_row(start))
+        dates = self.dates[lo:hi]
+        values = self.column(column)[self._rows[ticker], lo:hi]
+        present = ~np.isnan(values)
+        if not present.all():
+            dates, values = dates[present], values[present]
+        return dates, values
+
+    def panel(self, tickers: Optional[Sequence[str]] = None, column: str = 'Close',
+              start: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(dates, dates x tickers values) on the shared calendar. For all
+        tickers from the first date this is a Fortran-ordered view of the map,
+        the layout the recovery engines flatten column by column."""
+        lo = self._start_row(start)
+        matrix = self.column(column)
+        if tickers is not None:
+            matrix = matrix[[self._rows[t] for t in tickers]]
+        return self.dates[lo:], matrix[:, lo:].T
+
+    def frame(self, tickers: Optional[Sequence[str]] = None, column: str = 'Close',
+              start: Optional[datetime] = None) -> pd.DataFrame:
+        dates, values = self.panel(tickers, column, start)
+        return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name='Date'),
+                            columns=list(tickers) if tickers is not None else self.tickers)
@@ -0,0 +1,195 @@
+import os
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Union
+import numpy as np
+import pandas as pd
+from instrumentation import metrics, timed
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'ETF_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'etf-research')
+)
+
+_PERIOD_OFFSETS = {
+    'd': lambda n: pd.DateOffset(days=n),
+    'mo': lambda n: pd.DateOffset(months=n),
+    'y': lambda n: pd.DateOffset(years=n),
+}
+
+
+def period_start(period: str, now: Optional[datetime] = None) -> Optional[pd.Timestamp]:
+    """Translate a yfinance-style period ('5d', '6mo', '2y', 'ytd', 'max') to a start date."""
+    now = pd.Timestamp(now or datetime.now()).normalize()
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    for suffix in ('mo', 'd', 'y'):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return now - _PERIOD_OFFSETS[suffix](int(period[:-len(suffix)]))
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def as_naive_utc(dates) -> Union[np.datetime64, np.ndarray]:
+    """``dates`` as naive-UTC ``datetime64[ns]``, the layout every array index
+    here uses: a scalar for a scalar, an array for anything else. Tz-aware
+    values are converted to UTC first; naive ones are taken as UTC already."""
+    if np.ndim(dates) == 0:
+        ts = pd.Timestamp(dates)
+        if ts.tz is not None:
+            ts = ts.tz_convert('UTC').tz_localize(None)
+        return ts.to_datetime64().astype('datetime64[ns]')
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.values.astype('datetime64[ns]')
+
+
+def _as_index_time(ts: pd.Timestamp, index: pd.DatetimeIndex) -> pd.Timestamp:
+    if index.tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(index.tz)
+    if index.tz is None and ts.tzinfo is not None:
+        return ts.tz_localize(None)
+    return ts
+
+
+class DataSource(ABC):
+    """Provider of daily OHLCV history and ticker metadata."""
+
+    @abstractmethod
+    def history(self, ticker: str, period: Optional[str] = None,
+                start: Optional[str] = None) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def info(self, ticker: str) -> Dict:
+        ...
+
+
+class YahooDataSource(DataSource):
+    def __init__(self, ticker_factory: Optional[Callable] = None):
+        if ticker_factory is None:
+            import yfinance as yf
+            ticker_factory = yf.Ticker
+        self.ticker_factory = ticker_factory
+
+    def history(self, ticker: str, period: Optional[str] = None,
+                start: Optional[str] = None) -> pd.DataFrame:
+        etf = self.ticker_factory(ticker)
+        metrics.count('network.history')
+        with metrics.timer('network.history', ticker):
+            if start is not None:
+                data = etf.history(start=start)
+            else:
+                data = etf.history(period=period or '1y')
+        # Size of the parsed payload; the HTTP body itself isn't exposed by yfinance
+        metrics.add_bytes('history', data.memory_usage(index=True).sum())
+        return data
+
+    def info(self, ticker: str) -> Dict:
+        metrics.count('network.info')
+        with metrics.timer('network.info', ticker):
+            info = self.ticker_factory(ticker).info
+        metrics.add_bytes('info', len(json.dumps(info, default=str)))
+        return info
+
+
+class PriceStore:
+    """Parquet-backed per-ticker price history refreshed with delta downloads."""
+
+    def __init__(self, source: DataSource, root: Optional[str] = None,
+                 refresh_interval: timedelta = timedelta(hours=1)):
+        self.source = source
+        self.root = root or os.path.join(DEFAULT_CACHE_DIR, 'prices')
+        self.refresh_interval = refresh_interval
+        self._frames: Dict[str, pd.DataFrame] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _data_path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker}.parquet")
+
+    def _meta_path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker}.json")
+
+    def _read_meta(self, ticker: str) -> Dict:
+        try:
+            with open(self._meta_path(ticker)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, ticker: str, meta: Dict):
+        with open(self._meta_path(ticker), 'w') as f:
+            json.dump(meta, f)
+
+    def load(self, ticker: str) -> pd.DataFrame:
+        if ticker not in self._frames:
+            path = self._data_path(ticker)
+            with metrics.timer('store.load', ticker):
+                self._frames[ticker] = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+        return self._frames[ticker]
+
+    def _save(self, ticker: str, data: pd.DataFrame):
+        data.to_parquet(self._data_path(ticker))
+        self._frames[ticker] = data
+
+    @staticmethod
+    def _merge(stored: pd.DataFrame, fetched: pd.DataFrame) -> pd.DataFrame:
+        if stored.empty:
+            merged = fetched
+        elif fetched.empty:
+            return stored
+        else:
+            # Later downloads win so a partial intraday bar gets overwritten
+            merged = pd.concat([stored, fetched])
+            merged = merged[~merged.index.duplicated(keep='last')]
+        return merged.sort_index()
+
+    @timed('store.refresh', ticker_arg=1)
+    def refresh(self, ticker: str, period: str = '1y', force: bool = False) -> pd.DataFrame:
+        stored = self.load(ticker)
+        meta = self._read_meta(ticker)
+        now = datetime.now()
+        start = period_start(period, now)
+
+        covered_from = meta.get('covered_from')
+        if covered_from == 'max':
+            covered = True
+        elif covered_from is None:
+            covered = False
+        else:
+            covered = start is not None and start >= pd.Timestamp(covered_from)
+
+        if stored.empty or not covered:
+            metrics.count('store.full')
+            fetched = self.source.history(ticker, period=period)
+            if fetched.empty:
+                return stored
+            merged = self._merge(stored, fetched)
+            meta['covered_from'] = 'max' if start is None else str(
+                min(start, pd.Timestamp(covered_from)) if covered_from else start
+            )
+        else:
+            checked_at = meta.get('checked_at')
+            if not force and checked_at and now - datetime.fromisoformat(checked_at) < self.refresh_interval:
+                metrics.count('store.hit')
+                return stored
+            metrics.count('store.delta')
+            last_date = stored.index[-1]
+            fetched = self.source.history(ticker, start=last_date.strftime('%Y-%m-%d'))
+            merged = self._merge(stored, fetched)
+
+        meta['checked_at'] = now.isoformat()
+        self._save(ticker, merged)
+        self._write_meta(ticker, meta)
+        return merged
+
+    def get_history(self, ticker: str, period: str = '1y') -> pd.DataFrame:
+        data = self.refresh(ticker, period)
+        if data.empty:
+            return data
+        start = period_start(period)
+        if start is None:
+            return data
+        return data[data.index >= _as_index_time(start, data.index)]
@@ -0,0 +1,234 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+DAY = np.timedelta64(1, 'D')
+
+
+def buffer_append(buffer: np.ndarray, length: int, values: np.ndarray, owned: bool = True) -> np.ndarray:
+    """Write ``values`` after the first ``length`` entries of ``buffer``, growing it
+    by doubling when full so repeated appends cost amortized O(len(values)).
+    A buffer that isn't ``owned`` (the caller's array) is never written in place."""
+    end = length + len(values)
+    if not owned or end > len(buffer):
+        grown = np.empty(max(end, 2 * length), dtype=buffer.dtype)
+        grown[:length] = buffer[:length]
+        buffer = grown
+    buffer[length:end] = values
+    return buffer
+
+
+class RangeMax:
+    """Range maximum index answering max(values[lo:hi]) for many ranges at once in O(1) each.
+
+    A sparse table capped at ``BLOCK``-wide windows covers short ranges;
+    longer ones add the maxima of the whole blocks between their ends, held
+    in a nested index over one value per block. Memory stays linear in
+    ``len(values)`` (about ``LEVELS + 1`` copies) rather than n log n, and
+    the tables sit in growable buffers so ``extend`` costs amortized
+    O(len(values)).
+    """
+
+    LEVELS = 4
+    BLOCK = 1 << LEVELS
+
+    def __init__(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        self._buffers = [values]
+        self._lengths = [len(values)]
+        # The level-0 buffer starts out as the caller's array
+        self._owned = [False]
+        width = 1
+        while 2 * width <= min(len(values), self.BLOCK):
+            prev = self._buffers[-1]
+            self._buffers.append(np.fmax(prev[:-width], prev[width:]))
+            self._lengths.append(len(self._buffers[-1]))
+            self._owned.append(True)
+            width *= 2
+        self.blocks: Optional[RangeMax] = None
+        self._update_blocks()
+
+    @property
+    def levels(self) -> List[np.ndarray]:
+        return [buffer[:length] for buffer, length in zip(self._buffers, self._lengths)]
+
+    def _update_blocks(self):
+        # One value per whole block: the BLOCK-wide window starting on it
+        n_blocks = self._lengths[0] // self.BLOCK
+        if n_blocks == 0:
+            self.blocks = None
+            return
+        top = self._buffers[self.LEVELS]
+        have = len(self.blocks) if self.blocks is not None else 0
+        if self.blocks is None:
+            self.blocks = RangeMax(top[:n_blocks * self.BLOCK:self.BLOCK].copy())
+        elif n_blocks > have:
+            self.blocks.extend(top[have * self.BLOCK:n_blocks * self.BLOCK:self.BLOCK])
+
+    def __len__(self) -> int:
+        return self._lengths[0]
+
+    def extend(self, values: np.ndarray):
+        """Append values, filling in only the table entries they complete."""
+        values = np.asarray(values, dtype=float)
+        n = self._lengths[0] + len(values)
+        self._buffers[0] = buffer_append(self._buffers[0], self._lengths[0], values, self._owned[0])
+        self._lengths[0], self._owned[0] = n, True
+        width, k = 1, 1
+        while 2 * width <= min(n, self.BLOCK):
+            if k == len(self._buffers):
+                self._buffers.append(np.empty(0))
+                self._lengths.append(0)
+                self._owned.append(True)
+            prev = self._buffers[k - 1][:self._lengths[k - 1]]
+            have, need = self._lengths[k], n - 2 * width + 1
+            self._buffers[k] = buffer_append(self._buffers[k], have,
+                                             np.fmax(prev[have:need], prev[have + width:need + width]))
+            self._lengths[k] = need
+            width *= 2
+            k += 1
+        self._update_blocks()
+
+    def truncate(self, n: int):
+        """Drop everything from position ``n`` on."""
+        depth = sum(1 for k in range(len(self._buffers)) if k == 0 or (1 << k) <= n)
+        del self._buffers[depth:], self._lengths[depth:], self._owned[depth:]
+        self._lengths = [min(length, n - (1 << k) + 1) for k, length in enumerate(self._lengths)]
+        if self.blocks is not None and n // self.BLOCK:
+            self.blocks.truncate(n // self.BLOCK)
+        else:
+            self.blocks = None
+
+    def query(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        out = np.full(lo.shape, -np.inf)
+        valid = hi > lo
+        level = np.zeros(lo.shape, dtype=np.int64)
+        level[valid] = np.floor(np.log2(hi[valid] - lo[valid])).astype(np.int64)
+        short = valid & (level <= self.LEVELS)
+        levels = self.levels
+        for k in np.unique(level[short]):
+            sel = short & (level == k)
+            table = levels[k]
+            out[sel] = np.fmax(table[lo[sel]], table[hi[sel] - (1 << k)])
+
+        # Two or more blocks wide: a window at each end plus the whole blocks between
+        long = valid & ~short
+        if long.any():
+            lo, hi = lo[long], hi[long]
+            table = levels[self.LEVELS]
+            ends = np.fmax(table[lo], table[hi - self.BLOCK])
+            out[long] = np.fmax(ends, self.blocks.query(-(-lo // self.BLOCK), hi // self.BLOCK))
+        return out
+
+    def first_at_or_above(self, lo: np.ndarray, hi: np.ndarray, level: np.ndarray) -> np.ndarray:
+        """First index i in [lo, hi) with values[i] >= level, or -1 when there is none."""
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        level = np.broadcast_to(np.asarray(level, dtype=float), lo.shape)
+        left, right = lo.copy(), hi.copy()
+        active = left < right
+        # Binary search on the smallest prefix [lo, mid] whose max reaches the level
+        while active.any():
+            mid = (left[active] + right[active]) // 2
+            hit = self.query(lo[active], mid + 1) >= level[active]
+            right[active] = np.where(hit, mid, right[active])
+            left[active] = np.where(hit, left[active], mid + 1)
+            active = left < right
+        return np.where(left < hi, left, -1)
+
+
+def drawdown_episodes(prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """Split a series into peak-to-next-peak episodes and locate each episode's trough.
+
+    ``prices`` is a 1-D series or a 2-D date x ticker panel; panels are
+    flattened column by column so every index returned is a flat
+    (column-major) position. ``episode`` labels every bar;
+    ``peak_idx``/``trough_idx``/``drawdown`` are indexed by episode label.
+    """
+    prices = np.asarray(prices, dtype=float)
+    peak = np.fmax.accumulate(prices, axis=0)
+    at_peak = prices >= peak
+    # Leading NaNs belong to the first episode rather than an empty one, and
+    # each panel column starts its own episode
+    at_peak[0] = True
+    prices = prices.ravel(order='F')
+    at_peak = at_peak.ravel(order='F')
+    episode = np.cumsum(at_peak) - 1
+    starts = np.flatnonzero(at_peak)
+
+    troughs = np.fmin.reduceat(prices, starts)
+    is_trough = prices == troughs[episode]
+    first = np.flatnonzero(is_trough)
+    keep = np.ones(len(first), dtype=bool)
+    keep[1:] = episode[first][1:] != episode[first][:-1]
+    first = first[keep]
+    trough_idx = np.full(len(starts), -1, dtype=np.int64)
+    trough_idx[episode[first]] = first
+
+    peak_price = prices[starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = troughs / peak_price - 1
+    return {
+        'episode': episode,
+        'peak_idx': starts,
+        'trough_idx': trough_idx,
+        'drawdown': drawdown,
+    }
+
+
+def find_recovery_events(dates: np.ndarray, prices: np.ndarray, drop_threshold: float = -0.10,
+                         recovery_threshold: float = 0.15, min_days: int = 182,
+                         max_days: int = 365, anchors: Optional[np.ndarray] = None,
+                         episodes: Optional[Dict[str, np.ndarray]] = None,
+                         range_max: Optional[RangeMax] = None) -> Dict[str, np.ndarray]:
+    """Find peak-to-trough drops of at least ``drop_threshold`` that then rally by
+    ``recovery_threshold`` from the trough between ``min_days`` and ``max_days``
+    calendar days later.
+
+    ``prices`` may be a 2-D date x ticker panel sharing ``dates``; every
+    column is searched in the same batch and ``column`` in the result says
+    which one an event belongs to. ``anchors`` optionally restricts the
+    search to the episodes containing those (flat) bar indices, e.g.
+    detected drop days. ``episodes`` and ``range_max`` can be passed in to
+    reuse precomputed indexes.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    prices = np.asarray(prices, dtype=float)
+    n = len(prices)
+    empty = np.array([], dtype=np.int64)
+    if n == 0:
+        return {'column': empty, 'peak_idx': empty, 'trough_idx': empty, 'recovery_idx': empty,
+                'drawdown': np.array([]), 'recovery_return': np.array([])}
+
+    flat = prices.ravel(order='F')
+    if episodes is None:
+        episodes = drawdown_episodes(prices)
+    if range_max is None:
+        range_max = RangeMax(flat)
+
+    candidates = np.arange(len(episodes['peak_idx']))
+    if anchors is not None:
+        candidates = np.unique(episodes['episode'][np.asarray(anchors, dtype=np.int64)])
+    candidates = candidates[episodes['drawdown'][candidates] <= drop_threshold]
+
+    trough_flat = episodes['trough_idx'][candidates]
+    column, trough_idx = np.divmod(trough_flat, n)
+    trough_dates = dates[trough_idx]
+    lo = np.searchsorted(dates, trough_dates + min_days * DAY, side='left')
+    hi = np.searchsorted(dates, trough_dates + max_days * DAY, side='right')
+    lo = np.maximum(lo, trough_idx + 1)
+    # Ranges never leave the trough's own column of the flattened panel
+    recovery_flat = range_max.first_at_or_above(column * n + lo, column * n + hi,
+                                                flat[trough_flat] * (1 + recovery_threshold))
+
+    found = recovery_flat >= 0
+    candidates, trough_flat, recovery_flat = candidates[found], trough_flat[found], recovery_flat[found]
+    return {
+        'column': column[found],
+        'peak_idx': episodes['peak_idx'][candidates] % n,
+        'trough_idx': trough_flat % n,
+        'recovery_idx': recovery_flat % n,
+        'drawdown': episodes['drawdown'][candidates],
+        'recovery_return': flat[recovery_flat] / flat[trough_flat] - 1,
+    }
@@ -0,0 +1,306 @@
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from drop_detection import DEFAULT_HORIZONS
+from events import DropEvents, RecoveryEvents
+
+NS_PER_DAY = 86_400 * 10 ** 9
+
+# (ticker, date, close)
+Bar = Tuple[str, object, float]
+
+
+class BarSource(ABC):
+    """Yields micro-batches of bars in time order. A bar whose date repeats the
+    previous one for its ticker revises that bar (an intraday update)."""
+
+    @abstractmethod
+    def batches(self) -> Iterator[List[Bar]]:
+        ...
+
+
+class ReplayBarSource(BarSource):
+    """Replays a long-format Date/Ticker/Close file (CSV or Parquet), one
+    micro-batch per timestamp or ``batch_size`` rows at a time."""
+
+    def __init__(self, path: str, batch_size: Optional[int] = None):
+        self.path = path
+        self.batch_size = batch_size
+
+    def batches(self) -> Iterator[List[Bar]]:
+        if self.path.endswith('.parquet'):
+            bars = pd.read_parquet(self.path)
+        else:
+            bars = pd.read_csv(self.path, parse_dates=['Date'], float_precision='round_trip')
+        bars = bars.sort_values('Date', kind='stable')
+        rows = list(zip(bars['Ticker'], bars['Date'].values, bars['Close'].to_numpy(dtype=float)))
+        if self.batch_size:
+            for start in range(0, len(rows), self.batch_size):
+                yield rows[start:start + self.batch_size]
+            return
+        dates = bars['Date'].to_numpy()
+        bounds = np.flatnonzero(dates[1:] != dates[:-1]) + 1
+        for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+            yield rows[start:stop]
+
+
+def record_bars(histories: Dict[str, pd.DataFrame], path: str):
+    """Write per-ticker histories as a replay file for ``ReplayBarSource``."""
+    bars = pd.concat(
+        [pd.DataFrame({'Date': h.index, 'Ticker': t, 'Close': h['Close'].to_numpy()})
+         for t, h in histories.items()],
+        ignore_index=True
+    ).sort_values('Date', kind='stable')
+    if path.endswith('.parquet'):
+        bars.to_parquet(path, index=False)
+    else:
+        bars.to_csv(path, index=False)
+
+
+class StoreBarSource(BarSource):
+    """Polls the fetcher's price store with delta refreshes every ``interval``
+    seconds and yields bars that are new or revised since the last poll."""
+
+    def __init__(self, fetcher, tickers: Sequence[str], period: str = '5d',
+                 interval: float = 60.0, polls: Optional[int] = None):
+        self.fetcher = fetcher
+        self.tickers = list(tickers)
+        self.period = period
+        self.interval = interval
+        self.polls = polls
+        self._seen: Dict[str, Tuple[pd.Timestamp, float]] = {}
+
+    def _last_bar(self, data: pd.DataFrame) -> Optional[Tuple[pd.Timestamp, float]]:
+        return (data.index[-1], float(data['Close'].iloc[-1])) if not data.empty else None
+
+    def poll(self) -> List[Bar]:
+        for ticker in self.tickers:
+            if ticker not in self._seen:
+                self._seen[ticker] = self._last_bar(self.fetcher.store.load(ticker))
+        refreshed = self.fetcher.refresh_many(self.tickers, self.period, force=True)
+        bars = []
+        for ticker, data in refreshed.items():
+            seen = self._seen.get(ticker)
+            if seen is not None:
+                data = data[data.index >= seen[0]]
+                if len(data) and data.index[0] == seen[0] and data['Close'].iloc[0] == seen[1]:
+                    data = data.iloc[1:]
+            bars.extend(zip([ticker] * len(data), data.index, data['Close'].to_numpy(dtype=float)))
+            self._seen[ticker] = self._last_bar(data) or seen
+        bars.sort(key=lambda bar: bar[1])
+        return bars
+
+    def batches(self) -> Iterator[List[Bar]]:
+        count = 0
+        while self.polls is None or count < self.polls:
+            if count:
+                time.sleep(self.interval)
+            yield self.poll()
+            count += 1
+
+
+class _Episode:
+    """Peak-to-next-peak drawdown episode, as in ``recovery.drawdown_episodes``."""
+
+    __slots__ = ('peak_date', 'peak', 'trough_date', 'trough', 'trough_bar',
+                 'anchored', 'candidate', 'reported')
+
+    def __init__(self, date: int, price: float, bar: int):
+        self.peak_date = date
+        self.peak = price
+        self.reset_trough(date, price, bar)
+        self.anchored = False
+
+    def reset_trough(self, date: int, price: float, bar: int):
+        self.trough_date = date
+        self.trough = price
+        self.trough_bar = bar
+        # First qualifying rebound seen before the episode was anchored by a drop
+        self.candidate = None
+        self.reported = False
+
+
+class _TickerState:
+    __slots__ = ('closes', 'dates', 'bars', 'last_daily_hit', 'episode', 'pending',
+                 'open_date', 'open_close', 'emitted')
+
+    def __init__(self, depth: int):
+        self.closes = deque(maxlen=depth)
+        self.dates = deque(maxlen=depth)
+        self.bars = 0
+        self.last_daily_hit = -1
+        self.episode: Optional[_Episode] = None
+        # Closed episodes still inside their recovery window
+        self.pending: List[_Episode] = []
+        # The latest bar is provisional until a later date arrives or flush()
+        self.open_date: Optional[int] = None
+        self.open_close = 0.0
+        self.emitted = set()
+
+
+class StreamingDetector:
+    """Incremental drop and recovery alerts over a stream of bars.
+
+    Keeps a small state per ticker (the last ``max(horizons)`` closes, the
+    running peak and the drawdown episodes still waiting for a rebound), so
+    each bar costs O(1) regardless of history length. Drops follow
+    ``detect_drops`` and recoveries follow ``find_recovery_events``, except
+    that a recovery is reported against the trough known at the time; if
+    the episode later makes a lower trough, its recovery is reported as well.
+    """
+
+    def __init__(self, threshold: float = -0.05, horizons: Sequence[int] = DEFAULT_HORIZONS,
+                 drop_threshold: float = -0.10, recovery_threshold: float = 0.15,
+                 min_days: int = 182, max_days: int = 365):
+        self.threshold = threshold
+        self.horizons = tuple(horizons)
+        self.drop_threshold = drop_threshold
+        self.recovery_threshold = recovery_threshold
+        self.min_days = min_days * NS_PER_DAY
+        self.max_days = max_days * NS_PER_DAY
+        self.states: Dict[str, _TickerState] = {}
+
+    def _state(self, ticker: str) -> _TickerState:
+        state = self.states.get(ticker)
+        if state is None:
+            state = self.states[ticker] = _TickerState(max(self.horizons + (1,)))
+        return state
+
+    def _drop_hits(self, state: _TickerState, close: float) -> Tuple[bool, List[Tuple[int, float]]]:
+        n = len(state.closes)
+        daily_hit = n >= 1 and (close - state.closes[-1]) / state.closes[-1] <= self.threshold
+        hits = []
+        for k in self.horizons:
+            if n < k:
+                continue
+            change = (close - state.closes[-k]) / state.closes[-k]
+            if change > self.threshold:
+                continue
+            # A multi-day window that already holds a one-day drop was reported as daily
+            if k > 1 and (daily_hit or state.last_daily_hit > state.bars - k):
+                continue
+            hits.append((k, change))
+        return daily_hit, hits
+
+    def _rebounds(self, episode: _Episode, date: int, close: float, bar: int) -> bool:
+        return (bar > episode.trough_bar
+                and episode.trough_date + self.min_days <= date <= episode.trough_date + self.max_days
+                and close >= episode.trough * (1 + self.recovery_threshold))
+
+    def _evaluate(self, ticker: str, state: _TickerState, date: int, close: float,
+                  drops: Optional[list], recoveries: Optional[list]):
+        """Report what the bar at ``date`` shows so far, once per event."""
+        bar = state.bars
+        _, hits = self._drop_hits(state, close)
+        for k, change in hits:
+            if ('drop', k) not in state.emitted:
+                state.emitted.add(('drop', k))
+                if drops is not None:
+                    drops.append((ticker, k, state.dates[-k], date, state.closes[-k], close, change * 100))
+
+        episodes = state.pending + ([state.episode] if state.episode is not None else [])
+        for episode in episodes:
+            anchored = episode.anchored or (episode is state.episode and bool(hits))
+            if episode.reported or not anchored or episode.trough / episode.peak - 1 > self.drop_threshold:
+                continue
+            if episode.candidate is not None:
+                found = episode.candidate
+            elif self._rebounds(episode, date, close, bar):
+                found = (date, close, bar)
+            else:
+                continue
+            episode.reported = True
+            if recoveries is not None:
+                recovery_date, recovery_price, recovery_bar = found
+                recoveries.append((ticker, episode.peak_date, episode.trough_date, recovery_date,
+                                   episode.peak, episode.trough, recovery_price,
+                                   (episode.trough / episode.peak - 1) * 100,
+                                   (recovery_price / episode.trough - 1) * 100,
+                                   recovery_bar - episode.trough_bar))
+
+    def _commit(self, state: _TickerState):
+        """Fold the provisional bar into the rolling state."""
+        date, close, bar = state.open_date, state.open_close, state.bars
+        daily_hit, hits = self._drop_hits(state, close)
+        if daily_hit:
+            state.last_daily_hit = bar
+
+        episode = state.episode
+        if episode is not None and not episode.reported and episode.candidate is None \
+                and self._rebounds(episode, date, close, bar):
+            episode.candidate = (date, close, bar)
+        if episode is None or close >= episode.peak:
+            if episode is not None and episode.anchored and not episode.reported \
+                    and episode.trough / episode.peak - 1 <= self.drop_threshold:
+                state.pending.append(episode)
+            state.episode = _Episode(date, close, bar)
+        else:
+            if hits:
+                episode.anchored = True
+            if close < episode.trough:
+                episode.reset_trough(date, close, bar)
+
+        state.pending = [e for e in state.pending
+                         if not e.reported and date < e.trough_date + self.max_days]
+        state.closes.append(close)
+        state.dates.append(date)
+        state.bars += 1
+        state.open_date = None
+        state.emitted = set()
+
+    def _process(self, ticker: str, date, close: float, drops: Optional[list],
+                 recoveries: Optional[list]):
+        if close != close:
+            return
+        date = pd.Timestamp(date).value
+        state = self._state(ticker)
+        if state.open_date is not None:
+            if date < state.open_date:
+                return
+            if date > state.open_date:
+                self._commit(state)
+        state.open_date = date
+        state.open_close = float(close)
+        self._evaluate(ticker, state, date, float(close), drops, recoveries)
+
+    def warm(self, ticker: str, dates: Sequence, closes: Sequence[float]):
+        """Replay history into ``ticker``'s state without reporting anything."""
+        for date, close in zip(dates, closes):
+            self._process(ticker, date, close, None, None)
+
+    def warm_from(self, fetcher, tickers: Iterable[str], period: str = '2y'):
+        for ticker, hist in fetcher.fetch_many(tickers, period=period).items():
+            self.warm(ticker, hist.index, hist['Close'].to_numpy(dtype=float))
+
+    def update_many(self, bars: Iterable[Bar]) -> Tuple[DropEvents, RecoveryEvents]:
+        """Feed a micro-batch of bars and return the events they triggered."""
+        drops, recoveries = [], []
+        for ticker, date, close in bars:
+            self._process(ticker, date, close, drops, recoveries)
+        return _table(DropEvents, drops), _table(RecoveryEvents, recoveries)
+
+    def update(self, ticker: str, date, close: float) -> Tuple[DropEvents, RecoveryEvents]:
+        return self.update_many([(ticker, date, close)])
+
+    def flush(self):
+        """Treat every provisional bar as final, e.g. after the close."""
+        for state in self.states.values():
+            if state.open_date is not None:
+                self._commit(state)
+
+    def run(self, source: BarSource) -> Iterator[Tuple[DropEvents, RecoveryEvents]]:
+        for batch in source.batches():
+            yield self.update_many(batch)
+
+
+def _table(cls, rows: List[tuple]):
+    if not rows:
+        return cls.empty()
+    tickers = list(dict.fromkeys(row[0] for row in rows))
+    codes = {t: i for i, t in enumerate(tickers)}
+    columns = list(zip(*rows))
+    return cls(tickers, [codes[t] for t in columns[0]],
+               **dict(zip(cls.FIELDS, columns[1:])))
@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from recovery import DAY, RangeMax, drawdown_episodes
+
+_worker_state: Dict = {}
+
+
+class SweepResult:
+    """Results cube over (drop threshold, recovery threshold, window).
+
+    Every metric is an array shaped ``(len(drop_thresholds),
+    len(recovery_thresholds), len(windows))``.
+    """
+
+    METRICS = ('events', 'tickers', 'mean_recovery_percentage',
+               'mean_drop_percentage', 'mean_days_to_recover')
+
+    def __init__(self, drop_thresholds: Sequence[float], recovery_thresholds: Sequence[float],
+                 windows: Sequence[Tuple[int, int]], metrics: Dict[str, np.ndarray]):
+        self.drop_thresholds = list(drop_thresholds)
+        self.recovery_thresholds = list(recovery_thresholds)
+        self.windows = [tuple(w) for w in windows]
+        self.metrics = metrics
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        return self.metrics[metric]
+
+    def point(self, drop_threshold: float, recovery_threshold: float,
+              window: Tuple[int, int]) -> Dict[str, float]:
+        key = (self.drop_thresholds.index(drop_threshold),
+               self.recovery_thresholds.index(recovery_threshold),
+               self.windows.index(tuple(window)))
+        return {name: values[key].item() for name, values in self.metrics.items()}
+
+    def to_frame(self) -> pd.DataFrame:
+        index = pd.MultiIndex.from_product(
+            [self.drop_thresholds, self.recovery_thresholds, self.windows],
+            names=['drop_threshold', 'recovery_threshold', 'window']
+        )
+        return pd.DataFrame({name: values.ravel() for name, values in self.metrics.items()},
+                            index=index)
+
+
+def _prepare(dates: np.ndarray, prices: np.ndarray) -> Dict:
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    prices = np.asarray(prices, dtype=float)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    episodes = drawdown_episodes(prices)
+    valid = episodes['trough_idx'] >= 0
+    trough_flat = episodes['trough_idx'][valid]
+    column, trough_idx = np.divmod(trough_flat, len(prices))
+    flat = prices.ravel(order='F')
+    return {
+        'dates': dates,
+        'n': len(prices),
+        'n_columns': prices.shape[1],
+        'flat': flat,
+        'range_max': RangeMax(flat),
+        'drawdown': episodes['drawdown'][valid],
+        'column': column,
+        'trough_idx': trough_idx,
+        'trough_flat': trough_flat,
+    }
+
+
+def _search(state: Dict, recovery_threshold: float, window: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """First recovery position (-1 if none) and return for every episode at one grid point."""
+    dates, n, trough_idx = state['dates'], state['n'], state['trough_idx']
+    trough_dates = dates[trough_idx]
+    lo = np.searchsorted(dates, trough_dates + window[0] * DAY, side='left')
+    hi = np.searchsorted(dates, trough_dates + window[1] * DAY, side='right')
+    lo = np.maximum(lo, trough_idx + 1)
+    base = state['column'] * n
+    level = state['flat'][state['trough_flat']] * (1 + recovery_threshold)
+    recovery_flat = state['range_max'].first_at_or_above(base + lo, base + hi, level)
+    found = recovery_flat >= 0
+    days = np.where(found, recovery_flat - base - trough_idx, 0)
+    returns = np.where(found, state['flat'][recovery_flat] / state['flat'][state['trough_flat']] - 1, 0.0)
+    return np.where(found, days, -1), returns
+
+
+def _aggregate(state: Dict, drop_thresholds: np.ndarray, days: np.ndarray,
+               returns: np.ndarray) -> Dict[str, np.ndarray]:
+    found = days >= 0
+    # (drops x episodes) membership; every drop threshold is a mask over the same search
+    member = (state['drawdown'][None, :] <= drop_thresholds[:, None]) & found[None, :]
+    weights = member.astype(float)
+    events = member.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_recovery = weights @ returns / events * 100
+        mean_drop = weights @ np.nan_to_num(state['drawdown']) / events * 100
+        mean_days = weights @ np.maximum(days, 0) / events
+    per_ticker = np.zeros((len(drop_thresholds), state['n_columns']))
+    for d in range(len(drop_thresholds)):
+        per_ticker[d] = np.bincount(state['column'][member[d]], minlength=state['n_columns'])
+    return {
+        'events': events,
+        'tickers': (per_ticker > 0).sum(axis=1),
+        'mean_recovery_percentage': mean_recovery,
+        'mean_drop_percentage': mean_drop,
+        'mean_days_to_recover': mean_days,
+    }
+
+
+def _init_worker(dates: np.ndarray, prices: np.ndarray):
+    _worker_state.update(_prepare(dates, prices))
+
+
+def _run_points(points: List[Tuple[float, Tuple[int, int]]], drop_thresholds: np.ndarray) -> List[Dict]:
+    return [_aggregate(_worker_state, drop_thresholds, *_search(_worker_state, r, w))
+            for r, w in points]
+
+
+def sweep_recoveries(dates: np.ndarray, prices: np.ndarray, drop_thresholds: Sequence[float],
+                     recovery_thresholds: Sequence[float], windows: Sequence[Tuple[int, int]],
+                     processes: Optional[int] = None) -> SweepResult:
+    """Evaluate every (drop, recovery, window) combination over one price series or panel.
+
+    Drawdown episodes and the range-max index are built once; each
+    (recovery, window) pair is one batched search over all episodes, and
+    drop thresholds are masks over its result. With ``processes`` the
+    (recovery, window) pairs are spread over a process pool.
+    """
+    drops = np.asarray(drop_thresholds, dtype=float)
+    points = [(r, tuple(w)) for r in recovery_thresholds for w in windows]
+
+    if processes and processes > 1 and len(points) > 1:
+        chunks = [points[i::processes] for i in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(dates, prices)) as pool:
+            chunk_results = list(pool.map(_run_points, chunks, [drops] * len(chunks)))
+        # Undo the round-robin split
+        results = [None] * len(points)
+        for i, chunk in enumerate(chunk_results):
+            results[i::processes] = chunk
+    else:
+        state = _prepare(dates, prices)
+        results = [_aggregate(state, drops, *_search(state, r, w)) for r, w in points]
+
+    shape = (len(drops), len(recovery_thresholds), len(windows))
+    metrics = {}
+    for name in SweepResult.METRICS:
+        # results are ordered (recovery, window); each holds a vector over drops
+        stacked = np.stack([result[name] for result in results], axis=1)
+        metrics[name] = stacked.reshape(shape)
+    return SweepResult(drop_thresholds, recovery_thresholds, windows, metrics)
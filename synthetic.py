@@ -0,0 +1,85 @@
+import zlib
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from price_store import DataSource, period_start
+
+TRADING_DAYS = 252
+
+
+def ticker_seed(ticker: str, seed: int = 0) -> int:
+    return zlib.crc32(ticker.encode()) ^ seed
+
+
+def gbm_closes(n_bars: int, n_series: int = 1, seed: int = 0, mu: float = 0.07,
+               sigma: float = 0.18, crashes_per_year: float = 0.5,
+               slides_per_year: float = 1.0, start_price: float = 100.0) -> np.ndarray:
+    """Deterministic GBM closes (bars x series) with injected one-day crashes
+    and five-day slides so the drop detectors have something to find."""
+    rng = np.random.default_rng(seed)
+    dt = 1 / TRADING_DAYS
+    log_returns = rng.normal((mu - sigma ** 2 / 2) * dt, sigma * np.sqrt(dt), (n_bars, n_series))
+
+    crash = rng.random((n_bars, n_series)) < crashes_per_year * dt
+    log_returns[crash] = np.log1p(rng.uniform(-0.12, -0.05, crash.sum()))
+
+    slide_starts = np.argwhere(rng.random((n_bars, n_series)) < slides_per_year * dt)
+    for row, col in slide_starts:
+        log_returns[row:row + 5, col] = np.log1p(-0.02)
+
+    log_returns[0] = 0.0
+    return start_price * np.exp(np.cumsum(log_returns, axis=0))
+
+
+def synthetic_panel(n_tickers: int, years: float, seed: int = 0,
+                    end: Optional[datetime] = None) -> Tuple[pd.DatetimeIndex, Sequence[str], np.ndarray]:
+    n_bars = int(years * TRADING_DAYS)
+    dates = pd.bdate_range(end=pd.Timestamp(end or datetime.now()).normalize(), periods=n_bars,
+                           name='Date')
+    tickers = [f"SYN{i:04d}" for i in range(n_tickers)]
+    return dates, tickers, gbm_closes(n_bars, n_tickers, seed=seed)
+
+
+def ohlcv_frame(dates: pd.DatetimeIndex, closes: np.ndarray, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    spread = np.abs(rng.normal(0, 0.004, len(closes)))
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    return pd.DataFrame({
+        'Open': opens,
+        'High': np.maximum(opens, closes) * (1 + spread),
+        'Low': np.minimum(opens, closes) * (1 - spread),
+        'Close': closes,
+        'Volume': rng.integers(1e5, 1e7, len(closes)),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=dates)
+
+
+class SyntheticDataSource(DataSource):
+    """Offline DataSource serving a deterministic synthetic history per ticker."""
+
+    def __init__(self, years: float = 30, seed: int = 0, end: Optional[datetime] = None):
+        self.years = years
+        self.seed = seed
+        self.end = end
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    def _frame(self, ticker: str) -> pd.DataFrame:
+        if ticker not in self._frames:
+            n_bars = int(self.years * TRADING_DAYS)
+            dates = pd.bdate_range(end=pd.Timestamp(self.end or datetime.now()).normalize(),
+                                   periods=n_bars, name='Date')
+            seed = ticker_seed(ticker, self.seed)
+            self._frames[ticker] = ohlcv_frame(dates, gbm_closes(n_bars, seed=seed)[:, 0], seed)
+        return self._frames[ticker]
+
+    def history(self, ticker: str, period: Optional[str] = None,
+                start: Optional[str] = None) -> pd.DataFrame:
+        frame = self._frame(ticker)
+        since = pd.Timestamp(start) if start is not None else period_start(period or '1y')
+        return frame if since is None else frame[frame.index >= since]
+
+    def info(self, ticker: str) -> Dict:
+        rng = np.random.default_rng(ticker_seed(ticker, self.seed))
+        return {'totalAssets': float(rng.uniform(1e9, 5e11)), 'longName': f"{ticker} Synthetic ETF"}
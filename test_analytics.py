@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from analytics import DrawdownAnalytics, DrawdownStats
+from conftest import make_frame, random_walk
+
+
+def reference(dates, closes, windows=(5, 21, 63)):
+    # Straightforward per-bar loops
+    out = {name: [] for name in ('peak', 'drawdown', 'max_drawdown', 'days_under_water', 'days_to_recover')}
+    peak, worst, last_peak = -np.inf, 0.0, 0
+    for i, close in enumerate(closes):
+        if close >= peak:
+            peak, last_peak = close, i
+        worst = min(worst, close / peak - 1)
+        out['peak'].append(peak)
+        out['drawdown'].append(close / peak - 1)
+        out['max_drawdown'].append(worst)
+        out['days_under_water'].append((dates[i] - dates[last_peak]).days)
+        later = [j for j in range(i, len(closes)) if closes[j] >= peak]
+        out['days_to_recover'].append((dates[later[0]] - dates[i]).days if later else np.nan)
+    for k in windows:
+        out[f'worst_{k}d'] = [closes[i] / closes[max(0, i - k):i + 1].max() - 1 for i in range(len(closes))]
+    return out
+
+
+def test_stats_match_loops_and_incremental_updates():
+    frame = make_frame(pd.Timestamp('2025-06-30'), days=400, close=random_walk(400, seed=2, crashes=8))
+    dates, closes = frame.index, frame['Close'].to_numpy()
+    expected = reference(dates, closes)
+
+    full = DrawdownStats(dates.values, closes)
+    grown = DrawdownStats(dates.values[:150], closes[:150])
+    for lo, hi in [(150, 151), (151, 230), (230, 399), (399, 400)]:
+        grown.update(dates.values[lo:hi], closes[lo:hi])
+        grown.worst_drop(21)
+    saved = grown.to_frame()
+    # A revised last bar is replaced, not appended
+    grown.update(dates.values[-1:], closes[-1:] * 0.5)
+    assert saved['close'].iloc[-1] == closes[-1]
+    grown.update(dates.values[-1:], closes[-1:])
+
+    # Bar by bar, starting from stats reloaded off a frame
+    stepped = DrawdownStats.from_frame(DrawdownStats(dates.values[:50], closes[:50]).to_frame())
+    for i in range(50, 400):
+        stepped.update(dates.values[i:i + 1], closes[i:i + 1])
+
+    for stats in (full, grown, stepped):
+        assert len(stats) == 400
+        for name, values in expected.items():
+            np.testing.assert_allclose(stats[name], values, err_msg=name)
+
+    start = dates[100]
+    worst = np.argmin(expected['worst_21d'][100:]) + 100
+    assert grown.worst_drop(21, start=start) == (dates[worst], expected['worst_21d'][worst])
+    assert full.extreme('days_under_water', lowest=False)[1] == max(expected['days_under_water'])
+
+
+def test_analytics_cache_with_price_store(offline_fetcher):
+    now = pd.Timestamp.now().normalize()
+    full = make_frame(now, days=600, close=random_walk(600, seed=9, crashes=10))
+    frames = {'SPY': full.iloc[:-5]}
+    fetcher = offline_fetcher(frames)
+
+    analytics = DrawdownAnalytics(fetcher)
+    before = analytics.stats('SPY')
+    assert len(before) == 595
+
+    frames['SPY'] = full
+    fetcher.store.refresh('SPY', 'max', force=True)
+    reloaded = DrawdownAnalytics(fetcher)
+    after = reloaded.stats('SPY')
+    expected = DrawdownStats(full.index.values, full['Close'].to_numpy())
+    assert len(after) == 600
+    pd.testing.assert_frame_equal(after.to_frame(), expected.to_frame())
+
+    date, value = reloaded.worst_drop('SPY', 21, period='1y')
+    recent = expected.to_frame().loc[expected.to_frame().index >= now - pd.DateOffset(years=1), 'worst_21d']
+    assert value == recent.min() and date == recent.idxmin()
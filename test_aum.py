@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from aum import AUMSnapshots, month_ends, snapshot_aum
+from conftest import make_frame
+
+
+def random_snapshots(n_dates=40, n_tickers=300, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2015-01-01', periods=n_dates * 21, freq='B')[::21]
+    values = rng.lognormal(20, 2, (n_dates, n_tickers))
+    values[rng.random(values.shape) < 0.3] = np.nan
+    return AUMSnapshots(dates.values, [f'T{i:04d}' for i in range(n_tickers)], values)
+
+
+def test_top_k_is_point_in_time_and_matches_a_full_sort():
+    snapshots = random_snapshots()
+    queries = month_ends(snapshots.dates[0] - pd.Timedelta(days=40), snapshots.dates[-1])
+    top, aum = snapshots.top_k(10, queries)
+    known = snapshots.as_of(queries)
+    for i, date in enumerate(queries):
+        # Reference: forward-fill each ticker's last snapshot on or before the date, then sort
+        past = snapshots.dates <= date.to_datetime64()
+        frame = pd.DataFrame(snapshots.values[past], columns=snapshots.tickers).ffill()
+        latest = frame.iloc[-1].dropna() if len(frame) else pd.Series(dtype=float)
+        np.testing.assert_array_equal(known[i][~np.isnan(known[i])], latest.to_numpy())
+        expected = latest.sort_values(ascending=False).iloc[:10]
+        got = [snapshots.tickers[j] for j in top[i] if j >= 0]
+        assert got == expected.index.tolist()
+        np.testing.assert_array_equal(aum[i][:len(got)], expected.to_numpy())
+    # Before the first snapshot nothing is known
+    assert (top[0] == -1).all() and queries[0] < snapshots.dates[0]
+
+    members = snapshots.members(10, queries)
+    assert (members.sum(axis=1).to_numpy() == (top >= 0).sum(axis=1)).all()
+    ranks = snapshots.rankings(3, queries[-1:], tickers=snapshots.tickers[:50])
+    assert ranks['rank'].tolist() == [1, 2, 3] and set(ranks['ticker']) <= set(snapshots.tickers[:50])
+
+    stale = AUMSnapshots(np.array(['2020-01-31', '2020-06-30'], dtype='datetime64[ns]'), ['A', 'B'],
+                         np.array([[2.0, 1.0], [np.nan, 3.0]]))
+    assert stale.universe(2, '2021-01-01') == [('B', 3.0), ('A', 2.0)]
+    assert stale.universe(2, '2021-01-01', max_age=pd.Timedelta(days=300)) == [('B', 3.0)]
+
+
+def test_snapshots_are_recorded_in_bulk_and_persisted(offline_fetcher, tmp_path):
+    calls = []
+    tickers = ['AAA', 'BBB', 'CCC']
+    fetcher = offline_fetcher(make_frame('2024-06-28', days=300), calls,
+                              infos={'AAA': {'totalAssets': 5e9}, 'BBB': {'totalAssets': 9e9},
+                                     'CCC': {'totalAssets': 0}})
+    path = str(tmp_path / 'aum.parquet')
+    # The cache only knows today's AUM, so a past date needs its own values
+    with pytest.raises(ValueError):
+        snapshot_aum(fetcher, tickers, date=pd.Timestamp('2024-05-31'), path=path)
+    snapshot_aum(fetcher, tickers, date=pd.Timestamp('2024-05-31'), path=path,
+                 aum={'AAA': 4e9, 'BBB': 8e9})
+    snapshots = snapshot_aum(fetcher, tickers, path=path)
+    assert sorted(c[0] for c in calls if c[1] == 'info') == ['AAA', 'BBB', 'CCC']
+
+    loaded = AUMSnapshots.load(path)
+    assert len(loaded) == 2 and loaded.tickers == ['AAA', 'BBB']
+    pd.testing.assert_frame_equal(loaded.to_frame(), snapshots.to_frame())
+    assert loaded.universe(5, '2024-06-01') == [('BBB', 8e9), ('AAA', 4e9)]
+    assert loaded.universe(5, pd.Timestamp.now()) == [('BBB', 9e9), ('AAA', 5e9)]
+
+    closes = pd.DataFrame({'AAA': [50.0, 100.0], 'BBB': [30.0, 60.0]},
+                          index=pd.to_datetime(['2024-01-31', '2024-02-29']))
+    backfilled = AUMSnapshots.from_prices(closes, {'AAA': 5e9, 'BBB': 9e9}).merge(loaded)
+    assert backfilled.universe(1, '2024-01-31') == [('BBB', 4.5e9)]
+    assert fetcher.get_top_etfs_by_market_cap(1, universe=tickers) == [('BBB', 9e9)]
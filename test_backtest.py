@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtest import backtest_drops, backtest_trades
+from etf_analyzer import ETFAnalyzer
+from etf_data_fetcher import ETFDataFetcher
+from execution import analyze_universe
+from metadata_cache import MetadataCache
+from panel import fill_listings
+from price_store import PriceStore
+from synthetic import SyntheticDataSource, gbm_closes
+
+
+def reference_trades(closes, drops, threshold, holding, stop, lag=1):
+    # One trade at a time: the per-trade loop the engine replaces
+    closes = fill_listings(closes)
+    frame = drops.to_frame()
+    worst = frame.groupby(['ticker', 'end_date'], observed=True)['drop_percentage'].min()
+    trades = []
+    for (ticker, end_date), drop in worst.items():
+        if drop / 100 > threshold:
+            continue
+        series = closes[ticker].dropna()
+        entry = series.index.get_loc(end_date) + lag
+        if entry >= len(series):
+            continue
+        price = series.iloc[entry]
+        exit_at, stopped = min(entry + holding, len(series) - 1), False
+        for i in range(entry + 1, exit_at + 1):
+            if stop is not None and series.iloc[i] <= price * (1 + stop):
+                exit_at, stopped = i, True
+                break
+        low = series.iloc[entry:exit_at + 1].min()
+        trades.append((series.iloc[exit_at] / price - 1, min(low / price - 1, 0), stopped, exit_at - entry))
+    return trades
+
+
+def test_backtest_matches_per_trade_simulation():
+    n = 1500
+    dates = pd.bdate_range('2015-01-01', periods=n)
+    prices = gbm_closes(n, 4, seed=9)
+    prices[:300, 1] = np.nan  # listed later
+    prices[-200:, 2] = np.nan  # delisted
+    closes = pd.DataFrame(prices, index=dates, columns=['AAA', 'BBB', 'CCC', 'DDD'])
+    series = {t: (dates.values[closes[t].notna().to_numpy()], closes[t].dropna().to_numpy())
+              for t in closes}
+    drops, _ = analyze_universe(series, horizons=(1, 5))
+
+    thresholds, holdings, stops = [-0.05, -0.08, -0.10], [1, 10, 60, 400], [None, -0.05, -0.15]
+    result = backtest_drops(closes, drops, thresholds, holdings, stops)
+    assert result['trades'].shape == (3, 4, 3)
+    for t in thresholds:
+        for h in holdings:
+            for s in stops:
+                trades = reference_trades(closes, drops, t, h, s)
+                point = result.point(t, h, s)
+                assert point['trades'] == len(trades)
+                returns, drawdowns, stopped, bars = map(np.array, zip(*trades))
+                np.testing.assert_allclose(point['mean_return_percentage'], returns.mean() * 100)
+                np.testing.assert_allclose(point['worst_return_percentage'], returns.min() * 100)
+                np.testing.assert_allclose(point['hit_rate'], (returns > 0).mean() * 100)
+                np.testing.assert_allclose(point['max_drawdown_percentage'], drawdowns.min() * 100)
+                np.testing.assert_allclose(point['mean_drawdown_percentage'], drawdowns.mean() * 100)
+                np.testing.assert_allclose(point['stop_rate'], stopped.mean() * 100)
+                np.testing.assert_allclose(point['mean_bars_held'], bars.mean())
+
+    ledger = backtest_trades(closes, drops, -0.08, 60, -0.05)
+    assert len(ledger) == result.point(-0.08, 60, -0.05)['trades']
+    assert (ledger['exit_date'] > ledger['entry_date']).all()
+    assert (ledger.loc[ledger['stopped'], 'return_percentage'] <= -5).all()
+    assert result.best(min_trades=5)['trades'] >= 5
+
+
+def test_analyzer_backtests_its_last_scan(tmp_path):
+    source = SyntheticDataSource(years=10)
+    fetcher = ETFDataFetcher(data_source=source, store=PriceStore(source, root=str(tmp_path / 'prices')),
+                             metadata=MetadataCache(source, root=str(tmp_path / 'metadata')))
+    analyzer = ETFAnalyzer(fetcher)
+    analyzer.scan([f'T{i}' for i in range(5)], period='max')
+    result = analyzer.backtest(np.linspace(-0.15, -0.05, 11), range(1, 121, 7), [None, -0.1, -0.2])
+    frame = result.to_frame()
+    assert len(frame) == 11 * 18 * 3
+    # Looser entry thresholds only add trades
+    assert (np.diff(result['trades'], axis=0) >= 0).all()
+    assert frame['trades'].max() == len(np.unique(analyzer.drops.ticker_codes.astype(np.int64) * 10 ** 12
+                                                  + analyzer.drops.end_date // 10 ** 9))
+
+    analyzer.price_history = {}
+    with pytest.raises(ValueError):
+        analyzer.backtest([-0.05], [5])
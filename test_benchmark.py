@@ -0,0 +1,38 @@
+import json
+import numpy as np
+from benchmark import compare, main, run_scale
+from synthetic import SyntheticDataSource, gbm_closes
+
+
+def test_synthetic_data_is_deterministic_with_crashes():
+    a = gbm_closes(2520, 3, seed=1)
+    np.testing.assert_array_equal(a, gbm_closes(2520, 3, seed=1))
+    daily = a[1:] / a[:-1] - 1
+    assert (daily <= -0.05).any(axis=0).all()
+
+    source = SyntheticDataSource(years=2)
+    assert source.history('SPY', period='1y').equals(SyntheticDataSource(years=2).history('SPY', period='1y'))
+    assert source.info('SPY') == SyntheticDataSource().info('SPY')
+
+
+def test_run_scale_reports_every_stage():
+    results = run_scale(3, 2, repeat=1, memory=True, chart_tickers=1)
+    assert set(results) == {'find_price_drops', 'universe_scan', 'backtest', 'recovery_engine',
+                            'generate_report', 'charts'}
+    assert results['find_price_drops']['items'] == 3 * 504
+    for stage in results.values():
+        assert stage['seconds'] > 0 and stage['throughput'] > 0 and stage['peak_mb'] >= 0
+
+
+def test_baseline_roundtrip_flags_regressions(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    assert main(['--scale', '2x1', '--repeat', '1', '--no-memory', '--save', str(baseline)]) == 0
+    saved = json.loads(baseline.read_text())
+    assert compare(saved, saved) == []
+
+    slower = json.loads(baseline.read_text())
+    slower['scales']['2x1']['charts']['seconds'] = saved['scales']['2x1']['charts']['seconds'] * 2
+    assert compare(slower, saved) == [
+        f"2x1 charts: {slower['scales']['2x1']['charts']['seconds']:.3f}s vs "
+        f"baseline {saved['scales']['2x1']['charts']['seconds']:.3f}s"
+    ]
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import pandas as pd
+from cli import build_fetcher, main, read_tickers
+from etf_analyzer import ETFAnalyzer
+
+
+def test_cli_exports_events_in_chunks(tmp_path, capsys):
+    tickers = ['AAA', 'BBB', 'CCC']
+    out = tmp_path / 'out'
+    args = ['--tickers', *tickers, '--source', 'synthetic', '--cache-dir', str(tmp_path / 'cache'),
+            '--period', '10y', '--out', str(out), '--chunk-size', '1', '--executor', 'threads',
+            '--workers', '2']
+    assert main(args + ['--format', 'parquet', '--metrics']) == 0
+    assert main(args + ['--format', 'csv', '--no-report']) == 0
+
+    expected = ETFAnalyzer(build_fetcher('synthetic', str(tmp_path / 'cache')))
+    expected.scan(tickers, period='10y')
+    assert len(expected.results) > 1 and len(expected.drops) > 1
+
+    recoveries = pd.read_parquet(out / 'recoveries.parquet')
+    pd.testing.assert_frame_equal(recoveries, expected.results, check_categorical=False)
+    drops = pd.read_csv(out / 'drops.csv', parse_dates=['start_date', 'end_date'],
+                        float_precision='round_trip')
+    assert len(drops) == len(expected.drops)
+    assert drops['drop_percentage'].tolist() == expected.drops.to_frame()['drop_percentage'].tolist()
+    # Everything after the generation timestamp in the header
+    report, expected_report = (out / 'report.txt').read_text(), expected.generate_report()
+    assert report[report.index('CRITERIA'):] == expected_report[expected_report.index('CRITERIA'):]
+    assert (out / 'metrics.json').exists()
+    assert not (out / 'charts').exists()
+
+
+def test_cli_imports_plotting_only_for_charts(tmp_path):
+    loaded = subprocess.run(
+        [sys.executable, '-c', "import sys, cli; print(sorted(m for m in ('plotly', 'streamlit', "
+                               "'yfinance') if m in sys.modules))"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert loaded.stdout.strip() == '[]'
+
+    tickers_file = tmp_path / 'tickers.txt'
+    tickers_file.write_text("# universe\nAAA, BBB\n\nCCC\n")
+    assert read_tickers(str(tickers_file)) == ['AAA', 'BBB', 'CCC']
+    out = tmp_path / 'out'
+    assert main(['--tickers-file', str(tickers_file), '--source', 'synthetic', '--period', '10y',
+                 '--cache-dir', str(tmp_path / 'cache'), '--out', str(out), '--charts']) == 0
+    charts = sorted(os.listdir(out / 'charts'))
+    assert 'summary.html' in charts and len(charts) > 1
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from downsample import ZoomPyramid, lttb_indices, minmax_indices
+from etf_analyzer import ETFAnalyzer
+from etf_data_fetcher import ETFDataFetcher
+from metadata_cache import MetadataCache
+from price_store import PriceStore
+from synthetic import SyntheticDataSource, gbm_closes
+
+
+def test_downsampling_keeps_extremes_and_requested_points():
+    values = gbm_closes(7560, seed=4)[:, 0]
+    dates = pd.bdate_range('1995-01-02', periods=len(values)).values
+    keep = np.array([17, 5000, 7001])
+    for idx in (minmax_indices(values, 500, keep), lttb_indices(dates.view(np.int64), values, 500, keep)):
+        assert len(idx) <= 500 + len(keep) + 2
+        assert (np.diff(idx) > 0).all()
+        assert {0, len(values) - 1, *keep} <= set(idx)
+    idx = minmax_indices(values, 500)
+    assert values[idx].min() == values.min() and values[idx].max() == values.max()
+
+    pyramid = ZoomPyramid.build(dates, values)
+    rng = np.random.default_rng(0)
+    windows = np.sort(rng.integers(0, len(values), (20, 2)), axis=1) + [0, 1]
+    for lo, hi in [(0, len(values)), (1, 7000), *windows.tolist()]:
+        idx = pyramid.select(lo, hi, 200, keep)
+        assert idx[0] == lo and idx[-1] == hi - 1
+        assert len(idx) <= max(hi - lo, 200 + 4 + len(keep) + 2)
+        assert values[idx].min() == values[lo:hi].min() and values[idx].max() == values[lo:hi].max()
+        assert set(keep[(keep >= lo) & (keep < hi)]) <= set(idx)
+
+
+def test_pyramid_is_stored_beside_prices_and_rebuilt_on_change(tmp_path):
+    values = gbm_closes(3000, seed=2)[:, 0]
+    dates = pd.bdate_range('2010-01-04', periods=len(values)).values
+    path = str(tmp_path / 'AAA.lod.npz')
+    ZoomPyramid.build(dates, values).save(path)
+    loaded = ZoomPyramid.load(path)
+    assert loaded.matches(dates, values)
+    np.testing.assert_array_equal(loaded.select(100, 2900, 300), ZoomPyramid.build(dates, values).select(100, 2900, 300))
+    revised = values.copy()
+    revised[-1] *= 1.01
+    assert not loaded.matches(dates, revised)
+
+
+def test_recovery_chart_is_downsampled_around_events(tmp_path):
+    source = SyntheticDataSource(years=30)
+    fetcher = ETFDataFetcher(data_source=source, store=PriceStore(source, root=str(tmp_path / 'prices')),
+                             metadata=MetadataCache(source, root=str(tmp_path / 'metadata')))
+    analyzer = ETFAnalyzer(fetcher)
+    analyzer.scan(['AAA', 'BBB'], period='max')
+    ticker = analyzer.results['ticker'].iloc[0]
+    closes = analyzer.price_history[ticker]
+    assert len(closes) > 7000
+
+    for method in ('minmax', 'lttb'):
+        fig = analyzer.create_recovery_chart(ticker, max_points=600, method=method)
+        price = fig.data[0]
+        shown = pd.DatetimeIndex(price.x)
+        events = analyzer.events_for(ticker)
+        drops = analyzer.drops.for_ticker(ticker).to_frame()
+        kept = set(events['drop_date']) | set(events['recovery_date']) | set(events['peak_date']) \
+            | set(drops['start_date']) | set(drops['end_date'])
+        assert len(shown) <= 600 + len(kept) + 2 < len(closes)
+        for col, frame in (('drop_date', events), ('recovery_date', events), ('peak_date', events),
+                           ('start_date', drops), ('end_date', drops)):
+            assert set(frame[col]) <= set(shown)
+    assert (tmp_path / 'prices' / f'{ticker}.lod.npz').exists()
+
+    window = analyzer.create_recovery_chart(ticker, max_points=600, start=closes.index[-500],
+                                            end=closes.index[-101])
+    shown = pd.DatetimeIndex(window.data[0].x)
+    assert shown[0] == closes.index[-500] and shown[-1] == closes.index[-101]
+    assert len(shown) == 400
+    assert window.layout.title.text.endswith(
+        f"({closes.index[-500]:%Y-%m-%d} to {closes.index[-101]:%Y-%m-%d})")
+
+    summary = analyzer.create_summary_chart()
+    assert len(analyzer.results) <= 1000 or summary.data[2].type == 'scattergl'
@@ -1,21 +1,40 @@
+import os
+import tempfile
 from etf_data_fetcher import ETFDataFetcher
 from etf_analyzer import ETFAnalyzer
+from metadata_cache import MetadataCache
+from price_store import PriceStore
+from synthetic import SyntheticDataSource
+import numpy as np
 import pandas as pd
+from conftest import make_frame
+
+def make_fetcher(root: str) -> ETFDataFetcher:
+    # Set ETF_LIVE_TESTS=1 to run against Yahoo Finance instead of synthetic data
+    if os.environ.get('ETF_LIVE_TESTS'):
+        return ETFDataFetcher()
+    source = SyntheticDataSource(years=3)
+    return ETFDataFetcher(data_source=source,
+                          store=PriceStore(source, root=os.path.join(root, 'prices')),
+                          metadata=MetadataCache(source, root=os.path.join(root, 'metadata')))
 
 def test_basic_functionality():
+    with tempfile.TemporaryDirectory() as root:
+        run_basic_functionality(make_fetcher(root))
+
+def run_basic_functionality(fetcher: ETFDataFetcher):
     print("Testing ETF Recovery Analyzer...")
     print("=" * 50)
     
-    fetcher = ETFDataFetcher()
-    
     print("\n1. Testing top ETFs by market cap...")
     top_etfs = fetcher.get_top_etfs_by_market_cap(10)
     print(f"Found {len(top_etfs)} ETFs")
     for ticker, market_cap in top_etfs[:5]:
         print(f"  {ticker}: ${market_cap/1e9:.2f}B")
+    assert len(top_etfs) == 10
     
     print("\n2. Testing price drop detection for SPY...")
-    drops = fetcher.find_price_drops('SPY', threshold=-0.10, lookback_days=730)
+    drops = fetcher.find_price_drops('SPY', threshold=-0.05, period="2y")
     print(f"Found {len(drops)} significant drops for SPY")
     
     if drops:
@@ -52,6 +71,84 @@ def test_basic_functionality():
     print("Testing complete!")
     return True
 
+def sawtooth_frames(tickers):
+    # Repeated 20% slides followed by slow rallies give several recovery events per ticker
+    cycle = np.concatenate([np.linspace(100, 80, 20), np.linspace(80, 100, 180)])
+    close = np.tile(cycle, 3)[:520] * np.linspace(1, 1.02, 520)
+    return {t: make_frame(pd.Timestamp.now(), days=len(close), close=close * (i + 1))
+            for i, t in enumerate(tickers)}
+
+
+def test_recovery_chart_uses_loaded_prices(offline_fetcher):
+    calls = []
+    tickers = ETFDataFetcher.TOP_ETFS
+    fetcher = offline_fetcher(sawtooth_frames(tickers), calls,
+                              infos={t: {'totalAssets': 1e9} for t in tickers})
+    analyzer = ETFAnalyzer(fetcher)
+    results = analyzer.analyze_top_etfs()
+    assert not results.empty
+
+    calls.clear()
+    ticker = results['ticker'].iloc[0]
+    events = analyzer.events_for(ticker)
+    fig = analyzer.create_recovery_chart(ticker)
+    assert calls == []
+    assert len(fig.data) == 2
+    segments = fig.data[1]
+    assert len(segments.x) == 3 * len(events)
+    assert segments.text[0].startswith('Drop:') and segments.text[1].startswith('Recovery:')
+
+
+def reference_detail_lines(df):
+    # The original iterrows() formatting of the detailed section
+    report = []
+    for _, row in df.sort_values('recovery_percentage', ascending=False).iterrows():
+        report.append(f"\n{row['ticker']}:")
+        report.append(f"  Drop Date: {row['drop_date'].strftime('%Y-%m-%d')}")
+        report.append(f"  Recovery Date: {row['recovery_date'].strftime('%Y-%m-%d')}")
+        report.append(f"  Original Drop: {row['original_drop_percentage']:.2f}%")
+        report.append(f"  Recovery: {row['recovery_percentage']:.2f}%")
+        report.append(f"  Days to Recover: {row['days_to_recover']} days")
+        report.append(f"  Bottom Price: ${row['bottom_price']:.2f}")
+        report.append(f"  Recovery Price: ${row['recovery_price']:.2f}")
+    return report
+
+
+def analyzed(offline_fetcher):
+    tickers = ETFDataFetcher.TOP_ETFS
+    fetcher = offline_fetcher(sawtooth_frames(tickers),
+                              infos={t: {'totalAssets': 1e9 * (i + 1)} for i, t in enumerate(tickers)})
+    analyzer = ETFAnalyzer(fetcher)
+    analyzer.analyze_top_etfs()
+    return analyzer
+
+
+def test_vectorized_report_matches_row_formatting(offline_fetcher):
+    analyzer = analyzed(offline_fetcher)
+    report = analyzer.generate_report()
+    header, _, details = report.partition("-" * 80 + "\n")
+    assert "TOP PERFORMERS" in header
+    assert details.split("\n") == "\n".join(reference_detail_lines(analyzer.results)).split("\n")
+    # Chunking must not change the text
+    assert "".join(analyzer.iter_report(chunk_size=3)) == report
+
+
+def test_write_report_streams_every_format(offline_fetcher, tmp_path):
+    analyzer = analyzed(offline_fetcher)
+    analyzer.write_report(str(tmp_path / 'report.txt'), chunk_size=4)
+    assert (tmp_path / 'report.txt').read_text() == analyzer.generate_report()
+
+    analyzer.write_report(str(tmp_path / 'events.csv'), fmt='csv', chunk_size=4)
+    csv = pd.read_csv(tmp_path / 'events.csv')
+    assert len(csv) == len(analyzer.results)
+    assert list(csv.columns) == list(analyzer.results.columns)
+
+    analyzer.write_report(str(tmp_path / 'events.parquet'), fmt='parquet', chunk_size=4)
+    parquet = pd.read_parquet(tmp_path / 'events.parquet')
+    pd.testing.assert_frame_equal(parquet, analyzer.results.reset_index(drop=True),
+                                  check_dtype=False)
+
+
 if __name__ == "__main__":
     try:
         test_basic_functionality()
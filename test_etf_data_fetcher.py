@@ -0,0 +1,145 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_frame, random_walk
+from drop_detection import detect_drops
+from etf_data_fetcher import run_batch
+
+
+def test_run_batch_bounds_concurrency():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            active.append(item)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(item)
+        return item.lower()
+
+    results = run_batch(work, [f"T{i}" for i in range(12)], max_workers=3)
+    assert list(results.items()) == [(f"T{i}", f"t{i}") for i in range(12)]
+    assert max(peak) <= 3
+
+
+def test_run_batch_retries_failures_and_timeouts():
+    attempts = {}
+
+    def flaky(item):
+        attempts[item] = attempts.get(item, 0) + 1
+        if item == 'SLOW' and attempts[item] == 1:
+            time.sleep(0.5)
+        if item == 'FLAKY' and attempts[item] < 3:
+            raise ConnectionError("reset")
+        if item == 'DEAD':
+            raise ConnectionError("gone")
+        return attempts[item]
+
+    results = run_batch(flaky, ['SLOW', 'FLAKY', 'DEAD', 'OK'], max_workers=4,
+                        timeout=0.1, retries=3, backoff=0.01)
+    assert results == {'SLOW': 2, 'FLAKY': 3, 'OK': 1}
+    assert attempts['DEAD'] == 3
+
+
+def test_run_batch_timeouts_start_when_attempts_run():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            active.append(item)
+            peak.append(len(active))
+        time.sleep(0.25 if item.startswith('HANG') else 0.01)
+        with lock:
+            active.remove(item)
+        return item
+
+    # Hung calls hold their threads past the timeout; queued items must not
+    # be charged for that wait, nor run on top of the hung threads
+    results = run_batch(work, ['HANG1', 'HANG2', 'A', 'B'], max_workers=2,
+                        timeout=0.1, retries=4, backoff=0.01)
+    assert results == {'A': 'A', 'B': 'B'}
+    assert max(peak) <= 2
+
+
+def test_run_batch_gives_up_when_every_worker_is_stuck():
+    release = threading.Event()
+
+    def work(item):
+        if item.startswith('HANG'):
+            release.wait()
+        return item
+
+    started = time.monotonic()
+    try:
+        results = run_batch(work, ['HANG1', 'HANG2', 'A', 'B'], max_workers=2,
+                            timeout=0.1, retries=2, backoff=0.01)
+    finally:
+        release.set()
+    assert results == {}
+    assert time.monotonic() - started < 2
+
+
+def reference_price_drops(ticker, data, threshold):
+    # The original pure-Python loops, kept as the oracle for the vectorized detector
+    drops = []
+    data = data.reset_index()
+    prices = data['Close'].values
+    dates = pd.to_datetime(data['Date']).values
+    for i in range(1, len(prices)):
+        daily_change = (prices[i] - prices[i-1]) / prices[i-1]
+        if daily_change <= threshold:
+            drops.append({
+                'ticker': ticker,
+                'type': 'Daily',
+                'drop_date': pd.Timestamp(dates[i]),
+                'previous_close': prices[i-1],
+                'current_close': prices[i],
+                'drop_percentage': daily_change * 100,
+                'day_of_week': pd.Timestamp(dates[i]).strftime('%A')
+            })
+    for i in range(5, len(prices)):
+        weekly_change = (prices[i] - prices[i-5]) / prices[i-5]
+        if weekly_change <= threshold:
+            is_daily_drop = False
+            for j in range(i-4, i+1):
+                if j > 0 and (prices[j] - prices[j-1]) / prices[j-1] <= threshold:
+                    is_daily_drop = True
+                    break
+            if not is_daily_drop:
+                drops.append({
+                    'ticker': ticker,
+                    'type': 'Weekly',
+                    'drop_start_date': pd.Timestamp(dates[i-5]),
+                    'drop_end_date': pd.Timestamp(dates[i]),
+                    'start_price': prices[i-5],
+                    'end_price': prices[i],
+                    'drop_percentage': weekly_change * 100
+                })
+    return drops
+
+
+@pytest.mark.parametrize('seed,threshold', [(0, -0.05), (1, -0.03), (2, -0.10)])
+def test_find_price_drops_matches_reference_loops(offline_fetcher, seed, threshold):
+    frame = make_frame(pd.Timestamp.now(), days=260, close=random_walk(260, seed=seed, crashes=8))
+    fetcher = offline_fetcher(frame)
+
+    expected = reference_price_drops('SPY', fetcher.store.get_history('SPY', '1y'), threshold)
+    assert expected
+    assert fetcher.find_price_drops('SPY', threshold=threshold) == expected
+
+
+def test_detect_drops_multiple_horizons():
+    prices = np.array([100, 99, 98, 97, 96, 95, 94, 93, 92, 91, 80, 81], dtype=float)
+    events = detect_drops(prices, threshold=-0.05, horizons=(1, 5, 10))
+    assert list(events[1][0]) == [10]
+    # The 5-bar windows ending at bars 5-9 qualify; anything spanning bar 10 is suppressed
+    assert list(events[5][0]) == [5, 6, 7, 8, 9]
+    assert list(events[10][0]) == []
+    np.testing.assert_allclose(events[5][1], (prices[5:10] - prices[0:5]) / prices[0:5])
@@ -0,0 +1,63 @@
+import copy
+import pickle
+import numpy as np
+import pandas as pd
+from conftest import PARAMS, make_universe, random_walk
+from drop_detection import detect_drops_panel
+from events import DropEvents, RecoveryEvents
+
+
+def sample_drops():
+    dates = pd.bdate_range('2024-01-01', periods=300).values
+    closes = np.column_stack([random_walk(300, seed=s, crashes=8) for s in (1, 2)])
+    return DropEvents.from_detection(['AAA', 'BBB'], dates, closes, detect_drops_panel(closes))
+
+
+def test_columns_are_compact_and_typed():
+    drops = sample_drops()
+    assert len(drops) > 0
+    assert drops.ticker_codes.dtype == np.int8
+    assert drops.start_date.dtype == np.int64
+    assert drops.nbytes == len(drops) * (1 + 2 + 8 * 5)
+
+
+def test_frame_and_arrow_share_memory():
+    drops = sample_drops()
+    frame = drops.to_frame()
+    assert np.shares_memory(frame['end_date'].values, drops.end_date)
+    assert np.shares_memory(frame['drop_percentage'].values, drops.drop_percentage)
+    assert np.shares_memory(frame['ticker'].cat.codes.values, drops.ticker_codes)
+    assert list(frame['type'].unique()) == ['Daily', 'Weekly']
+
+    table = drops.to_arrow()
+    assert table.column('end_date').chunk(0).buffers()[1].address == drops.end_date.ctypes.data
+    pd.testing.assert_series_equal(table.column('end_date').to_pandas(), frame['end_date'])
+    assert table.column('ticker').to_pylist() == list(frame['ticker'])
+
+
+def test_records_and_concat():
+    drops = sample_drops()
+    event = drops[-1]
+    assert event.ticker == 'BBB'
+    assert isinstance(event.end_date, pd.Timestamp)
+    assert event.type in ('Daily', 'Weekly')
+    assert event.as_dict()['drop_percentage'] == drops.drop_percentage[-1]
+    assert not hasattr(event, '__dict__')
+    for clone in (copy.copy(event), copy.deepcopy(event), pickle.loads(pickle.dumps(event))):
+        assert clone.as_dict() == event.as_dict()
+
+    merged = DropEvents.concat([drops.for_ticker('BBB'), drops.for_ticker('AAA')])
+    assert merged.tickers == ['AAA', 'BBB']
+    assert sorted(r.ticker for r in merged) == sorted(r.ticker for r in drops)
+    assert pickle.loads(pickle.dumps(merged)).to_dicts() == merged.to_dicts()
+
+
+def test_fetcher_event_tables_match_dicts(offline_fetcher):
+    fetcher = offline_fetcher(make_universe()['AAA'])
+    drops = fetcher.drop_events('SPY', period='2y')
+    legacy = fetcher.find_price_drops('SPY', period='2y')
+    assert [d.get('drop_date', d.get('drop_end_date')) for d in legacy] == list(pd.DatetimeIndex(drops.dates('end_date')))
+
+    recoveries = fetcher.recovery_events('SPY', drops, **PARAMS)
+    assert isinstance(recoveries, RecoveryEvents) and recoveries
+    assert recoveries.to_dicts() == fetcher.find_recoveries('SPY', legacy, **PARAMS)
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import PARAMS, make_frame, random_walk
+from etf_analyzer import ETFAnalyzer
+from execution import _shards, analyze_universe, history_series
+
+
+def universe(n=12):
+    now = pd.Timestamp.now()
+    return {f"T{i:02d}": make_frame(now, days=200 + 40 * i,
+                                    close=random_walk(200 + 40 * i, seed=i, crashes=12))
+            for i in range(n)}
+
+
+@pytest.mark.parametrize('executor', ['threads', 'processes'])
+def test_executors_match_serial(executor):
+    series = history_series(universe())
+    drops, recoveries = analyze_universe(series, 'serial', **PARAMS)
+    got_drops, got_recoveries = analyze_universe(series, executor, workers=3, **PARAMS)
+    assert len(drops) and len(recoveries)
+    assert got_drops.to_dicts() == drops.to_dicts()
+    assert got_recoveries.to_dicts() == recoveries.to_dicts()
+
+
+def test_custom_executor_and_per_ticker_equivalence(offline_fetcher):
+    frames = universe(4)
+    fetcher = offline_fetcher(frames)
+    with ThreadPoolExecutor(2) as pool:
+        drops, recoveries = analyze_universe(history_series(frames), pool, workers=2, **PARAMS)
+    for ticker in frames:
+        expected = fetcher.drop_events(ticker, period='max')
+        assert drops.for_ticker(ticker).to_dicts() == expected.to_dicts()
+        assert (recoveries.for_ticker(ticker).to_dicts()
+                == fetcher.recovery_events(ticker, expected, period='max', **PARAMS).to_dicts())
+
+
+def test_shards_balance_bars():
+    sizes = np.array([100, 100, 100, 100, 400, 400])
+    shards = _shards(sizes, 3)
+    assert shards[0][0] == 0 and shards[-1][1] == len(sizes)
+    assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+    assert max(sizes[lo:hi].sum() for lo, hi in shards) <= 500
+
+
+def test_analyzer_scan_on_processes(offline_fetcher):
+    frames = universe(6)
+    infos = {t: {'totalAssets': 1e9 * (i + 1)} for i, t in enumerate(frames)}
+    fetcher = offline_fetcher(frames, infos=infos)
+    serial = ETFAnalyzer(fetcher).scan(list(frames), **PARAMS)
+    parallel = ETFAnalyzer(fetcher, executor='processes', workers=2).scan(list(frames), **PARAMS)
+    assert not serial.empty
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert (serial.loc[serial['ticker'] == 'T01', 'market_cap'] == 2e9).all()
@@ -0,0 +1,63 @@
+import time
+import pandas as pd
+import pytest
+from conftest import make_frame, random_walk
+from etf_analyzer import ETFAnalyzer
+from instrumentation import Metrics, metrics, timed
+
+
+def test_fetcher_and_analyzer_report_into_metrics(offline_fetcher):
+    metrics.reset()
+    frames = {t: make_frame(pd.Timestamp.now(), days=300, close=random_walk(300, seed=i, crashes=8))
+              for i, t in enumerate(['AAA', 'BBB'])}
+    fetcher = offline_fetcher(frames)
+    analyzer = ETFAnalyzer(fetcher)
+    analyzer.scan(['AAA', 'BBB'])
+    analyzer.scan(['AAA', 'BBB'])
+    analyzer.create_recovery_chart('AAA')
+
+    snapshot = metrics.snapshot()
+    counters = snapshot['counters']
+    assert counters['network.history'] == 2 and counters['store.full'] == 2
+    assert counters['store.hit'] == 2
+    assert counters['metadata.miss'] == 2 and counters['metadata.hit'] == 2
+    assert snapshot['bytes']['history'] > 0 and snapshot['bytes']['info'] > 0
+    assert {'fetch', 'analyze', 'detect', 'recover', 'chart.recovery'} <= set(snapshot['stages'])
+
+    per_ticker = metrics.ticker_frame()
+    assert set(per_ticker.loc[per_ticker['stage'] == 'detect', 'ticker']) == {'AAA', 'BBB'}
+    assert per_ticker.loc[per_ticker['stage'] == 'chart.recovery', 'ticker'].tolist() == ['AAA']
+
+
+def test_timers_and_decorator():
+    local = Metrics()
+    with local.timer('sleep', 'SPY'):
+        time.sleep(0.01)
+    local.count('calls', 2)
+    stages = local.stage_frame()
+    assert stages.loc[0, 'stage'] == 'sleep' and stages.loc[0, 'total_s'] >= 0.01
+    assert local.snapshot()['counters'] == {'calls': 2}
+
+    @timed('decorated', ticker_arg=0)
+    def work(ticker):
+        return ticker.lower()
+
+    metrics.reset()
+    assert work('QQQ') == 'qqq'
+    assert metrics.ticker_frame()[['stage', 'ticker']].values.tolist() == [['decorated', 'QQQ']]
+
+
+@pytest.mark.parametrize('mode', ['cprofile', 'tracemalloc'])
+def test_profile_hook(mode):
+    local = Metrics()
+    with local.profile(mode, top=5):
+        sum(x * x for x in range(10000))
+    with local.profile(None):
+        pass
+    assert len(local.profiles) == 1 and local.profiles[0][0] == mode
+    assert local.profiles[0][1]
+
+    for _ in range(Metrics.MAX_PROFILES):
+        with local.profile(mode, top=1):
+            pass
+    assert len(local.profiles) == Metrics.MAX_PROFILES
@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from conftest import make_frame
+from etf_data_fetcher import ETFDataFetcher
+from metadata_cache import MetadataCache
+from price_store import DataSource
+
+
+class CountingSource(DataSource):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def history(self, ticker, period=None, start=None):
+        return pd.DataFrame()
+
+    def info(self, ticker):
+        with self.lock:
+            self.calls.append(ticker)
+        time.sleep(self.delay)
+        return {'totalAssets': 1e9 * len(self.calls), 'longName': f'{ticker} Fund'}
+
+
+def age_cache(cache, ticker, days):
+    entry = cache._lookup(ticker)
+    for field in entry:
+        entry[field][1] = (datetime.now() - timedelta(days=days)).isoformat()
+
+
+def test_fields_expire_on_their_own_ttl(tmp_path):
+    source = CountingSource()
+    cache = MetadataCache(source, root=str(tmp_path))
+    assert cache.get('SPY', ['totalAssets']) == {'totalAssets': 1e9}
+    assert cache.get('SPY', ['longName']) == {'longName': 'SPY Fund'}
+    assert source.calls == ['SPY']
+
+    # Two days on, AUM is stale but the fund name never expires
+    age_cache(cache, 'SPY', days=2)
+    assert cache.get('SPY', ['longName']) == {'longName': 'SPY Fund'}
+    assert len(source.calls) == 1
+    assert cache.get('SPY', ['totalAssets']) == {'totalAssets': 2e9}
+    assert len(source.calls) == 2
+
+
+def test_disk_store_survives_restart_and_lru_evicts(tmp_path):
+    source = CountingSource()
+    cache = MetadataCache(source, root=str(tmp_path), max_entries=2)
+    for ticker in ['SPY', 'QQQ', 'VTI']:
+        cache.get(ticker, ['totalAssets'])
+    assert list(cache._memory) == ['QQQ', 'VTI']
+
+    reopened = MetadataCache(source, root=str(tmp_path))
+    assert reopened.get('SPY', ['totalAssets']) == {'totalAssets': 1e9}
+    assert len(source.calls) == 3
+
+
+def test_missing_fields_are_not_refetched(tmp_path):
+    source = CountingSource()
+    cache = MetadataCache(source, root=str(tmp_path))
+    assert cache.get('GLD', ['yield']) == {}
+    assert cache.get('GLD', ['yield']) == {}
+    assert source.calls == ['GLD']
+
+
+def test_concurrent_misses_share_one_upstream_call(tmp_path):
+    source = CountingSource(delay=0.1)
+    cache = MetadataCache(source, root=str(tmp_path))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('VOO', ['totalAssets'])))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert source.calls == ['VOO']
+    assert results == [{'totalAssets': 1e9}] * 8
+
+
+def test_fetcher_history_has_no_market_cap_column(offline_fetcher):
+    calls = []
+    infos = {t: {'totalAssets': (i + 1) * 1e9} for i, t in enumerate(ETFDataFetcher.TOP_ETFS)}
+    fetcher = offline_fetcher(make_frame(pd.Timestamp.now()), calls, infos=infos)
+    hist = fetcher.fetch_etf_data('SPY')
+    assert 'MarketCap' not in hist.columns
+    assert not [c for c in calls if c[1] == 'info']
+
+    top = fetcher.get_top_etfs_by_market_cap(3)
+    assert top == [('VXUS', 20e9), ('VNQ', 19e9), ('VB', 18e9)]
+    fetcher.get_top_etfs_by_market_cap(3)
+    assert fetcher.get_market_cap('SPY') == 1e9
+    assert len([c for c in calls if c[1] == 'info']) == len(ETFDataFetcher.TOP_ETFS)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from conftest import PARAMS, make_universe
+from etf_analyzer import ETFAnalyzer
+from panel import align_closes
+
+
+def universe_fetcher(offline_fetcher):
+    # CCC is listed later than the others, so its panel column starts with NaNs
+    frames = make_universe()
+    infos = {t: {'totalAssets': (i + 1) * 1e9} for i, t in enumerate(frames)}
+    return offline_fetcher(frames, infos=infos)
+
+
+def test_panel_matches_per_ticker_analysis(offline_fetcher):
+    fetcher = universe_fetcher(offline_fetcher)
+    analyzer = ETFAnalyzer(fetcher)
+    results = analyzer.analyze_panel(['AAA', 'BBB', 'CCC'], **PARAMS)
+
+    expected = []
+    for ticker in ['AAA', 'BBB', 'CCC']:
+        drops = fetcher.find_price_drops(ticker, period='2y')
+        for event in fetcher.find_recoveries(ticker, drops, **PARAMS):
+            expected.append((ticker, event['drop_date'], event['recovery_date'],
+                             event['days_to_recover']))
+    got = [(t, pd.Timestamp(d), pd.Timestamp(r), n) for t, d, r, n in
+           results[['ticker', 'drop_date', 'recovery_date', 'days_to_recover']].itertuples(index=False)]
+    assert expected
+    assert got == expected
+    assert (results.loc[results['ticker'] == 'BBB', 'market_cap'] == 2e9).all()
+
+    drop_counts = analyzer.panel_drops.groupby('ticker', observed=False).size()
+    for ticker in ['AAA', 'BBB', 'CCC']:
+        assert drop_counts[ticker] == len(fetcher.find_price_drops(ticker, period='2y'))
+
+
+def test_align_closes_fills_only_inside_listing():
+    dates = pd.bdate_range('2024-01-01', periods=6, name='Date')
+    a = pd.DataFrame({'Close': [1.0, 2, 3, 4, 5, 6]}, index=dates)
+    b = pd.DataFrame({'Close': [10.0, 11, 12]}, index=dates[[1, 3, 4]])
+    closes = align_closes({'A': a, 'B': b})
+    assert np.isnan(closes['B'].iloc[0]) and np.isnan(closes['B'].iloc[5])
+    assert closes['B'].iloc[2] == 10.0
+
+
+def test_same_day_drops_counts_tickers(offline_fetcher):
+    analyzer = ETFAnalyzer(universe_fetcher(offline_fetcher))
+    analyzer.analyze_panel(['AAA', 'BBB', 'CCC'])
+    counts = analyzer.same_day_drops(-0.05)
+    returns = analyzer.price_panel.pct_change()
+    assert counts.sum() == (returns <= -0.05).to_numpy().sum()
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from aum import AUMSnapshots
+from conftest import PARAMS, make_source, make_universe
+from etf_analyzer import ETFAnalyzer
+from etf_data_fetcher import ETFDataFetcher
+from metadata_cache import MetadataCache
+from price_archive import PriceArchive
+from price_store import PriceStore
+
+
+def universe():
+    frames = make_universe()
+    # A ticker with its own holidays leaves holes in the shared calendar
+    frames['DDD'] = frames['BBB'].drop(frames['BBB'].index[[100, 101, 250]])
+    return frames
+
+
+def test_series_are_views_of_the_store_history(offline_fetcher, tmp_path):
+    frames = universe()
+    fetcher = offline_fetcher(frames)
+    archive = PriceArchive.from_store(str(tmp_path / 'archive'), fetcher.store, list(frames),
+                                      columns=('Close', 'Volume'))
+    reopened = PriceArchive(str(tmp_path / 'archive'))
+    assert reopened.tickers == list(frames)
+    assert reopened.columns == ['Close', 'Volume']
+    assert len(reopened.dates) == 520
+
+    for ticker, frame in frames.items():
+        dates, closes = reopened.series(ticker)
+        np.testing.assert_array_equal(dates, frame.index.values)
+        np.testing.assert_array_equal(closes, frame['Close'].to_numpy())
+    dates, closes = reopened.series('AAA', start=frames['AAA'].index[-10])
+    assert len(closes) == 10
+    assert np.shares_memory(closes, reopened.column('Close'))
+
+    dates, panel = archive.panel()
+    assert panel.shape == (520, 4) and panel.flags.f_contiguous
+    assert np.isnan(panel[:220, 2]).all() and np.isnan(panel[100, 3])
+
+
+def test_float32_archive(tmp_path):
+    frames = universe()
+    archive = PriceArchive.write(str(tmp_path / 'f32'), frames, dtype='float32')
+    assert archive.column().dtype == np.float32
+    np.testing.assert_allclose(archive.series('CCC')[1], frames['CCC']['Close'], rtol=1e-6)
+    frame = archive.frame(['AAA', 'CCC'])
+    assert list(frame.columns) == ['AAA', 'CCC'] and frame.index.name == 'Date'
+
+
+def test_scan_archive_matches_scan(offline_fetcher, tmp_path):
+    frames = universe()
+    calls = []
+    fetcher = offline_fetcher(frames, calls)
+    expected = ETFAnalyzer(fetcher).scan(list(frames), period='max', **PARAMS)
+    archive = PriceArchive.from_store(str(tmp_path / 'archive'), fetcher.store, list(frames))
+    aum = AUMSnapshots(archive.dates[:1], list(frames), np.full((1, len(frames)), 1e9))
+
+    assert not expected.empty
+    calls.clear()
+    for executor in ('serial', 'processes'):
+        analyzer = ETFAnalyzer(fetcher, executor=executor, workers=2)
+        pd.testing.assert_frame_equal(analyzer.scan_archive(archive, market_caps=aum, **PARAMS), expected)
+    # Without market caps the scan stays offline
+    offline = ETFAnalyzer(fetcher).scan_archive(archive, **PARAMS)
+    assert offline['market_cap'].isna().all()
+    pd.testing.assert_frame_equal(offline.drop(columns='market_cap'), expected.drop(columns='market_cap'))
+    assert calls == []
+
+
+def test_archive_scan_charts_and_backtests_without_the_store(tmp_path):
+    frames = universe()
+    archive = PriceArchive.write(str(tmp_path / 'archive'), frames)
+    calls = []
+    source = make_source(frames, calls)
+    # A cold store: any read through it would have to download
+    fetcher = ETFDataFetcher(data_source=source, store=PriceStore(source, root=str(tmp_path / 'prices')),
+                             metadata=MetadataCache(source, root=str(tmp_path / 'metadata')))
+    analyzer = ETFAnalyzer(fetcher)
+    analyzer.scan_archive(archive, **PARAMS)
+    for ticker in frames:
+        figure = analyzer.create_recovery_chart(ticker, max_points=10 ** 6)
+        np.testing.assert_array_equal(figure.data[0].y, archive.series(ticker)[1])
+    assert analyzer.backtest([-0.05], [5])['trades'].item() > 0
+    assert calls == []
@@ -0,0 +1,68 @@
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from price_store import PriceStore, as_naive_utc, period_start
+from conftest import make_frame, make_source
+
+
+def test_incremental_refresh_downloads_only_new_bars(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    full = make_frame(today)
+    calls = []
+    frame = full.iloc[:-5]
+    store = PriceStore(make_source(frame, calls), root=str(tmp_path),
+                       refresh_interval=timedelta(0))
+
+    first = store.get_history('SPY', '1y')
+    assert calls == [('SPY', '1y', None)]
+    assert first.index[-1] == frame.index[-1]
+
+    # New bars arrive upstream; only the tail after the stored date is requested
+    calls.clear()
+    store.source = make_source(full, calls)
+    second = store.get_history('SPY', '1y')
+    assert calls == [('SPY', None, frame.index[-1].strftime('%Y-%m-%d'))]
+    assert second.index[-1] == full.index[-1]
+    assert second.index.is_unique
+
+
+def test_shorter_period_is_served_from_disk(tmp_path):
+    calls = []
+    frame = make_frame(pd.Timestamp.now())
+    source = make_source(frame, calls)
+    PriceStore(source, root=str(tmp_path)).get_history('QQQ', '2y')
+
+    calls.clear()
+    store = PriceStore(source, root=str(tmp_path))
+    one_year = store.get_history('QQQ', '1y')
+    assert calls == []
+    assert one_year.index[0] >= period_start('1y')
+    assert len(one_year) < len(store.load('QQQ'))
+
+
+def test_longer_period_triggers_backfill(tmp_path):
+    calls = []
+    store = PriceStore(make_source(make_frame(pd.Timestamp.now()), calls), root=str(tmp_path))
+    store.get_history('VTI', '1y')
+    store.get_history('VTI', '2y')
+    assert [c[1] for c in calls] == ['1y', '2y']
+    store.get_history('VTI', '1y')
+    assert len(calls) == 2
+
+
+def test_fetcher_reads_through_store(offline_fetcher):
+    calls = []
+    fetcher = offline_fetcher(make_frame(pd.Timestamp.now()), calls)
+    fetcher.fetch_etf_data('VOO', period='2y')
+    fetcher.find_price_drops('VOO')
+    assert len([c for c in calls if c[1] is not None]) == 1
+
+
+def test_as_naive_utc_converts_scalars_and_arrays():
+    eastern = pd.date_range('2024-03-08 16:00', periods=3, freq='D', tz='America/New_York')
+    expected = np.array(['2024-03-08T21:00', '2024-03-09T21:00', '2024-03-10T20:00'], dtype='datetime64[ns]')
+    np.testing.assert_array_equal(as_naive_utc(eastern), expected)
+    np.testing.assert_array_equal(as_naive_utc(pd.Series(eastern)), expected)
+    assert as_naive_utc(eastern[2]) == expected[2]
+    assert as_naive_utc('2024-03-10') == np.datetime64('2024-03-10', 'ns')
+    assert as_naive_utc(eastern[2]).dtype == as_naive_utc(eastern).dtype == np.dtype('datetime64[ns]')
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import make_frame, random_walk
+from recovery import RangeMax, drawdown_episodes, find_recovery_events
+
+
+def brute_force_recoveries(dates, prices, drop_threshold, recovery_threshold, min_days, max_days):
+    events = []
+    peak_idx = 0
+    i = 1
+    n = len(prices)
+    while i <= n:
+        # Episode runs from the peak until the price first gets back to it
+        end = peak_idx + 1
+        while end < n and prices[end] < prices[peak_idx]:
+            end += 1
+        trough = peak_idx + int(np.argmin(prices[peak_idx:end]))
+        drawdown = prices[trough] / prices[peak_idx] - 1
+        if drawdown <= drop_threshold:
+            target = prices[trough] * (1 + recovery_threshold)
+            for j in range(trough + 1, n):
+                age = (dates[j] - dates[trough]) / np.timedelta64(1, 'D')
+                if min_days <= age <= max_days and prices[j] >= target:
+                    events.append((peak_idx, trough, j))
+                    break
+        peak_idx = end
+        i = end + 1
+    return events
+
+
+def test_range_max_first_at_or_above_matches_scan():
+    rng = np.random.default_rng(7)
+    values = rng.normal(size=500)
+    table = RangeMax(values)
+    lo = rng.integers(0, 500, 300)
+    hi = np.minimum(lo + rng.integers(0, 120, 300), 500)
+    level = rng.normal(1.0, 0.5, 300)
+
+    expected = []
+    for a, b, t in zip(lo, hi, level):
+        hits = np.flatnonzero(values[a:b] >= t)
+        expected.append(a + hits[0] if len(hits) else -1)
+    np.testing.assert_array_equal(table.first_at_or_above(lo, hi, level), expected)
+    np.testing.assert_allclose(table.query(lo[hi > lo], hi[hi > lo]),
+                               [values[a:b].max() for a, b in zip(lo, hi) if b > a])
+
+
+def test_range_max_stays_linear_and_extends_like_a_rebuild():
+    rng = np.random.default_rng(8)
+    values = rng.normal(size=5000)
+    values[rng.random(5000) < 0.05] = np.nan
+
+    def entries(table):
+        return sum(map(len, table.levels)) + (entries(table.blocks) if table.blocks else 0)
+
+    grown = RangeMax(values[:7])
+    for cut in (300, 290, 1200, 5000):
+        if cut < len(grown.levels[0]):
+            grown.truncate(cut)
+        else:
+            grown.extend(values[len(grown.levels[0]):cut])
+    assert entries(grown) <= (RangeMax.LEVELS + 2) * len(values)
+
+    lo = rng.integers(0, 5000, 400)
+    hi = np.minimum(lo + rng.integers(1, 3000, 400), 5000)
+    expected = [np.nanmax(values[a:b]) if not np.isnan(values[a:b]).all() else np.nan
+                for a, b in zip(lo, hi)]
+    np.testing.assert_array_equal(grown.query(lo, hi), expected)
+    np.testing.assert_array_equal(RangeMax(values).query(lo, hi), expected)
+
+
+def test_find_recovery_events_matches_brute_force():
+    total = 0
+    for seed in range(5):
+        prices = random_walk(1500, seed=seed, crashes=20)
+        dates = pd.bdate_range('2015-01-01', periods=len(prices)).values
+        for params in [(-0.10, 0.15, 182, 365), (-0.05, 0.05, 0, 90), (-0.20, 0.30, 30, 730)]:
+            events = find_recovery_events(dates, prices, *params)
+            got = list(zip(events['peak_idx'], events['trough_idx'], events['recovery_idx']))
+            assert got == brute_force_recoveries(dates, prices, *params)
+            total += len(got)
+    assert total >= 10
+
+
+def test_drawdown_episodes_tracks_peak_and_trough():
+    prices = np.array([10, 12, 9, 8, 11, 13, 12, 13, 14], dtype=float)
+    episodes = drawdown_episodes(prices)
+    assert list(episodes['peak_idx']) == [0, 1, 5, 7, 8]
+    assert list(episodes['trough_idx']) == [0, 3, 6, 7, 8]
+    np.testing.assert_allclose(episodes['drawdown'][1], 8 / 12 - 1)
+
+
+def test_fetcher_find_recoveries(offline_fetcher):
+    close = np.concatenate([np.linspace(100, 120, 60), np.linspace(120, 90, 20),
+                            np.linspace(90, 112, 240), np.full(200, 112.0)])
+    fetcher = offline_fetcher(make_frame(pd.Timestamp.now(), days=len(close), close=close))
+
+    drops = fetcher.find_price_drops('SPY', threshold=-0.05, period='2y')
+    assert drops
+    recoveries = fetcher.find_recoveries('SPY', drops)
+    assert len(recoveries) == 1
+    event = recoveries[0]
+    assert event['bottom_price'] == 90
+    assert event['original_drop_percentage'] == (90 / 120 - 1) * 100
+    assert event['recovery_percentage'] >= 15
+    assert (event['recovery_date'] - event['drop_date']).days >= 182
+
+
+# NumPy only warns (for now) when it parses tz-aware datetimes
+@pytest.mark.filterwarnings('error::DeprecationWarning')
+def test_fetcher_ignores_drops_outside_the_window(offline_fetcher):
+    close = np.concatenate([np.linspace(100, 120, 60), np.linspace(120, 90, 20),
+                            np.linspace(90, 112, 240), np.full(200, 112.0)])
+    fetcher = offline_fetcher(make_frame(pd.Timestamp.now(), days=len(close), close=close))
+    dates = fetcher.fetch_etf_data('SPY', period='2y').index
+    # Before the window, and a weekend inside it: neither is a bar, so neither anchors an episode
+    stray = [{'drop_date': pd.Timestamp('2015-03-02')},
+             {'drop_date': dates[70].normalize() - pd.Timedelta(days=dates[70].weekday() + 1)}]
+    assert fetcher.find_recoveries('SPY', stray) == []
+    assert len(fetcher.find_recoveries('SPY', stray + [{'drop_date': dates[70]}])) == 1
+    # The same bar given in exchange time still anchors it
+    eastern = pd.Timestamp(dates[70]).tz_localize('UTC').tz_convert('America/New_York')
+    assert len(fetcher.find_recoveries('SPY', [{'drop_date': eastern}])) == 1
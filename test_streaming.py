@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from conftest import PARAMS, make_frame, make_universe, random_walk
+from drop_detection import detect_drops
+from streaming import ReplayBarSource, StoreBarSource, StreamingDetector, record_bars
+
+
+def replay(frames, tmp_path, name='bars.csv', **kwargs):
+    path = str(tmp_path / name)
+    record_bars(frames, path)
+    detector = StreamingDetector(horizons=(1, 5, 21), **PARAMS)
+    drops, recoveries = [], []
+    for new_drops, new_recoveries in detector.run(ReplayBarSource(path, **kwargs)):
+        drops.extend(new_drops.to_dicts())
+        recoveries.extend(new_recoveries.to_dicts())
+    return detector, drops, recoveries
+
+
+def test_replay_matches_batch_detection(tmp_path, offline_fetcher):
+    frames = make_universe(pd.Timestamp('2025-06-30'))
+    detector, drops, recoveries = replay(frames, tmp_path)
+    fetcher = offline_fetcher(frames)
+
+    total = 0
+    for ticker, frame in frames.items():
+        closes = frame['Close'].to_numpy()
+        expected = sorted((int(i), k) for k, (idx, _) in detect_drops(closes, horizons=(1, 5, 21)).items()
+                          for i in idx)
+        got = sorted((frame.index.get_loc(d['end_date']), d['horizon'])
+                     for d in drops if d['ticker'] == ticker)
+        assert got == expected
+
+        batch = fetcher.recovery_events(ticker, fetcher.drop_events(ticker, period='max', horizons=(1, 5, 21)),
+                                        period='max', **PARAMS).to_dicts()
+        streamed = [r for r in recoveries if r['ticker'] == ticker]
+        total += len(batch)
+        for event in batch:
+            assert event in streamed
+        # Anything else was reported against a trough the episode later undercut
+        for event in streamed:
+            if event not in batch:
+                after = frame['Close'][frame.index > event['drop_date']]
+                new_peak = after >= event['peak_price']
+                episode = after[:new_peak.idxmax()] if new_peak.any() else after
+                assert episode.min() < event['bottom_price']
+        # Rolling state stays bounded by the longest horizon
+        assert len(detector.states[ticker].closes) == 21
+    assert total
+
+
+def test_micro_batches_do_not_change_events(tmp_path):
+    frames = make_universe(pd.Timestamp('2025-06-30'))
+    _, by_date, rec_by_date = replay(frames, tmp_path)
+    _, chunked, rec_chunked = replay(frames, tmp_path, name='bars.parquet', batch_size=97)
+    assert sorted(map(str, by_date)) == sorted(map(str, chunked))
+    assert sorted(map(str, rec_by_date)) == sorted(map(str, rec_chunked))
+
+
+def test_intraday_revisions_alert_once():
+    detector = StreamingDetector()
+    dates = pd.bdate_range('2025-01-01', periods=30)
+    detector.warm('SPY', dates[:-1], np.linspace(100, 110, 29))
+
+    drops, _ = detector.update('SPY', dates[-1], 108.0)
+    assert not drops
+    drops, _ = detector.update('SPY', dates[-1], 103.0)
+    assert [(e.type, e.end_price) for e in drops] == [('Daily', 103.0)]
+    drops, _ = detector.update('SPY', dates[-1], 102.0)
+    assert not drops
+
+    detector.flush()
+    assert detector.states['SPY'].closes[-1] == 102.0
+    assert detector.states['SPY'].last_daily_hit == 29
+
+
+def test_store_source_yields_only_new_bars(offline_fetcher):
+    now = pd.Timestamp.now().normalize()
+    full = make_frame(now, days=300, close=random_walk(300, seed=1))
+    frames = {'SPY': full.iloc[:-3]}
+    fetcher = offline_fetcher(frames)
+
+    detector = StreamingDetector()
+    detector.warm_from(fetcher, ['SPY'])
+    source = StoreBarSource(fetcher, ['SPY'], polls=2, interval=0)
+
+    frames['SPY'] = full
+    batches = list(source.batches())
+    assert [d for _, d, _ in batches[0]] == list(full.index[-3:])
+    assert batches[1] == []
+    assert detector.states['SPY'].open_date == pd.Timestamp(full.index[-4]).value
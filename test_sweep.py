@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from conftest import random_walk
+from recovery import find_recovery_events
+from sweep import sweep_recoveries
+
+DROPS = [-0.05, -0.10, -0.20]
+RECOVERIES = [0.05, 0.15]
+WINDOWS = [(0, 90), (182, 365)]
+
+
+def make_panel():
+    prices = np.column_stack([random_walk(1500, seed=s, crashes=20) for s in range(4)])
+    prices[:200, 3] = np.nan
+    return pd.bdate_range('2015-01-01', periods=1500).values, prices
+
+
+def test_sweep_matches_direct_search_at_every_grid_point():
+    dates, prices = make_panel()
+    result = sweep_recoveries(dates, prices, DROPS, RECOVERIES, WINDOWS)
+    assert result['events'].shape == (3, 2, 2)
+    assert result['events'].sum() > 0
+
+    for d, drop in enumerate(DROPS):
+        for r, rec in enumerate(RECOVERIES):
+            for w, window in enumerate(WINDOWS):
+                events = find_recovery_events(dates, prices, drop, rec, *window)
+                assert result['events'][d, r, w] == len(events['trough_idx'])
+                assert result['tickers'][d, r, w] == len(np.unique(events['column']))
+                if len(events['trough_idx']):
+                    np.testing.assert_allclose(result['mean_recovery_percentage'][d, r, w],
+                                               events['recovery_return'].mean() * 100)
+                    np.testing.assert_allclose(result['mean_days_to_recover'][d, r, w],
+                                               (events['recovery_idx'] - events['trough_idx']).mean())
+
+
+def test_process_pool_matches_serial():
+    dates, prices = make_panel()
+    serial = sweep_recoveries(dates, prices, DROPS, RECOVERIES, WINDOWS)
+    pooled = sweep_recoveries(dates, prices, DROPS, RECOVERIES, WINDOWS, processes=2)
+    pd.testing.assert_frame_equal(serial.to_frame(), pooled.to_frame())
+    assert serial.point(-0.10, 0.15, (182, 365))['events'] == serial['events'][1, 1, 1]